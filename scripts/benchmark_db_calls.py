@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+Usage: python scripts/benchmark_db_calls.py [--calls N] [--url URL]
+Times N sequential inventory reads (get_plate) made the old way, with a fresh
+requests.get per call and the config file re-read each time, against the
+pooled Db client. Without --url a local HTTP/1.1 keep-alive server answering
+with a small JSON body stands in for the galago API.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+import requests
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from tools.toolbox import inventory  # noqa: E402
+from tools.toolbox.db import CONFIG_FILE, Db  # noqa: E402
+
+BODY = json.dumps({"id": 1, "name": "plate_1", "plate_type": "96 well"}).encode()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes, avoid the delayed-ACK stall
+    disable_nagle_algorithm = True
+
+    def do_GET(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+def unpooled_get_plate(plate_id: int) -> object:
+    # What Db.get_by_id_or_name used to do on every call
+    api_url = Db._api_url
+    if CONFIG_FILE.exists():
+        with open(CONFIG_FILE, "r") as f:
+            api_url = json.load(f).get("api_url") or api_url
+    return requests.get(f"{api_url}/plates/{plate_id}").json()
+
+
+def run(name: str, call: Callable[[int], object], calls: int) -> float:
+    call(0)  # warm up
+    timings = []
+    for i in range(calls):
+        start = time.perf_counter()
+        call(i)
+        timings.append(time.perf_counter() - start)
+    total = sum(timings)
+    print(
+        f"{name:<10} total {total * 1000:8.1f} ms   "
+        f"mean {statistics.mean(timings) * 1000:6.2f} ms   "
+        f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1] * 1000:6.2f} ms"
+    )
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--url", help="Benchmark against a running galago API instead of a local stub")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        Db._api_url = args.url
+    else:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        Db._api_url = f"http://127.0.0.1:{server.server_address[1]}/api"
+    # Keep the user's api_config.json out of the comparison
+    Db._api_url_cache = None
+    if CONFIG_FILE.exists() and not args.url:
+        print(f"Note: {CONFIG_FILE} exists, point it at the stub or pass --url")
+
+    print(f"{args.calls} sequential get_plate calls against {Db.get_api_url()}")
+    before = run("before", unpooled_get_plate, args.calls)
+    after = run("after", inventory.get_plate, args.calls)
+    print(f"speedup    {before / after:.1f}x")
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+Usage: python scripts/benchmark_tool_startup.py [tool ...] [--runs N]
+Measures the import time and resident memory of a tool server's gRPC layer
+(base_server plus the tool's generated protos) with the full tool_base_pb2
+and with the tool's slim variant. Each measurement runs in a fresh interpreter.
+Build the protos first with `bin/make proto`.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from tools.slim_protos import TOOL_BASE_PROTO, slim_module_path, tools_in_tool_base  # noqa: E402
+
+CHILD = """
+import importlib, json, sys, time
+start = time.perf_counter()
+import tools.base_server
+importlib.import_module("tools.grpc_interfaces.%s_pb2")
+elapsed = time.perf_counter() - start
+import psutil
+from tools.grpc_interfaces import tool_base_pb2
+print(json.dumps({
+    "seconds": elapsed,
+    "rss": psutil.Process().memory_info().rss,
+    "commands": len(tool_base_pb2.Command.DESCRIPTOR.fields),
+}))
+"""
+
+
+def measure(tool: str, slim: bool) -> dict:
+    env = os.environ.copy()
+    env["PYTHONPATH"] = ROOT_DIR + (os.pathsep + env["PYTHONPATH"] if env.get("PYTHONPATH") else "")
+    if slim:
+        env["GALAGO_PROTO_TOOL"] = tool
+        env.pop("GALAGO_FULL_PROTOS", None)
+    else:
+        env["GALAGO_FULL_PROTOS"] = "1"
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD % tool], env=env, capture_output=True, text=True, check=True
+    )
+    sample: dict = json.loads(result.stdout.strip().splitlines()[-1])
+    return sample
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tools", nargs="*", help="Tools to measure, defaults to all")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per configuration")
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT_DIR, "interfaces", TOOL_BASE_PROTO)) as f:
+        tools = args.tools or tools_in_tool_base(f.read())
+
+    print(f"{'tool':<16}{'full ms':>10}{'slim ms':>10}{'full MB':>10}{'slim MB':>10}{'oneof':>8}")
+    for tool in tools:
+        if not os.path.exists(slim_module_path(tool)):
+            print(f"{tool:<16} no slim module, run `python -m tools.slim_protos`")
+            continue
+        row = {}
+        for slim in (False, True):
+            runs = [measure(tool, slim) for _ in range(args.runs)]
+            row[slim] = (
+                statistics.median(r["seconds"] for r in runs) * 1000,
+                statistics.median(r["rss"] for r in runs) / (1024 * 1024),
+                runs[0]["commands"],
+            )
+        print(
+            f"{tool:<16}{row[False][0]:>10.1f}{row[True][0]:>10.1f}"
+            f"{row[False][1]:>10.1f}{row[True][1]:>10.1f}{row[False][2]:>4}->{row[True][2]:<3}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,8 @@ import sys
 # grep -oP "__version__ = ['\"]([^'\"]+)" tools/version.py
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from tools.version import __version__
+from tools.slim_protos import build_slim_protos
+from tools.tool_manifest import build_manifest
 
 
 base = None
@@ -77,6 +79,12 @@ class BuildProtobuf(_build_py):
                 check=True,
             )
 
+        # Per-tool tool_base_pb2 variants so tool servers only load their own messages
+        build_slim_protos(proto_src, os.path.join(grpc_interfaces_output_dir, "slim"))
+
+        # Lets `galago --list`/`--info` work without importing every tool server
+        build_manifest()
+
         super().run()
 
 def readme() -> str:
@@ -134,7 +142,9 @@ setup(
                             'bravo/deps/*.dll',
                             'minihub/deps/*.dll',
                             "favicon.ico",
-                            'grpc_interfaces/*.py'],
+                            "tool_manifest.json",
+                            'grpc_interfaces/*.py',
+                            'grpc_interfaces/slim/*.py'],
                             # Add static web assets to the root package
                                 '': [
                                 'index.html',
@@ -1,16 +1,35 @@
+import hashlib
+import json
 import os
+import threading
 from os.path import  dirname
 from pydantic import BaseModel
 from typing import Optional, Any
 from datetime import date , time 
 import logging 
 import typing as t
-from tools.toolbox.workcell import get_all_workcells
-from tools.toolbox.db import Db
+
+if t.TYPE_CHECKING:
+    from tools.toolbox.db import Db
 
 ROOT_DIRECTORY = dirname(dirname(os.path.realpath(__file__)))
 
-db = Db()
+# Created on first use, importing Db pulls in requests
+_db: Optional["Db"] = None
+_db_lock = threading.Lock()
+
+def get_db() -> "Db":
+    global _db
+    with _db_lock:
+        if _db is None:
+            from tools.toolbox.db import Db
+            _db = Db()
+        return _db
+
+def __getattr__(name: str) -> Any:
+    if name == "db":
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 class Tool(BaseModel):
     id: int
@@ -27,6 +46,24 @@ class WorkcellConfig(BaseModel):
     location: Optional[str] = None
     tools: list[Tool] = []
 
+def diff_tools(old: WorkcellConfig, new: WorkcellConfig) -> tuple[list[Tool], list[Tool], list[Tool]]:
+    """
+    Compare the tools of two workcell configs by name.
+
+    Returns:
+        (added, removed, changed) where changed holds the new version of tools
+        whose type or port differ
+    """
+    old_tools = {tool.name: tool for tool in old.tools}
+    new_tools = {tool.name: tool for tool in new.tools}
+    added = [tool for name, tool in new_tools.items() if name not in old_tools]
+    removed = [tool for name, tool in old_tools.items() if name not in new_tools]
+    changed = [
+        tool for name, tool in new_tools.items()
+        if name in old_tools and (tool.type, tool.port) != (old_tools[name].type, old_tools[name].port)
+    ]
+    return added, removed, changed
+
 class AppConfig(BaseModel):
     workcell:str
     data_folder:Optional[str]
@@ -40,14 +77,19 @@ class AppConfig(BaseModel):
 
 
 def get_workcell(id:int) -> Any:
-    response = db.get_by_id_or_name(id, "workcells")
+    response = get_db().get_by_id_or_name(id, "workcells")
     return response
 
 def get_selected_workcell() -> Any:
-    workcell = db.get_data("settings/workcell").get("value")
+    workcell = get_db().get_data("settings/workcell").get("value")
     return workcell
 
 class Config():
+    # (workcell name, version, parsed config) of the last load, shared by all
+    # instances so a reload that finds nothing changed skips parsing
+    _loaded: Optional[tuple[Optional[str], str, WorkcellConfig]] = None
+    _load_lock = threading.Lock()
+
     def __init__(self) -> None:
         self.workcell_config : Optional[WorkcellConfig] = None
         self.workcell_config_file  : str = ""
@@ -64,28 +106,64 @@ class Config():
             return serial
         return obj.__dict__
     
-    def load_workcell_config(self)-> None:
-        #Ping the database to check if connection is established
-        workcells = None
-        selected_workcell = None
-        db_is_up = db.ping(1)
-        if not db_is_up:
-            logging.error("Can't establish connection to galago api.")
-            logging.warning("Galago api container might be down. "
-                            "No instrument tools will be launched.")
-            self.workcell_config = WorkcellConfig()
-            return None
-        else:
-            selected_workcell = get_selected_workcell()
-            workcells = get_all_workcells()
-            if workcells is None or selected_workcell is None:
-                logging.error("No workcells or tools found in the database")
-                self.workcell_config = WorkcellConfig()
+    def load_workcell_config(self) -> bool:
+        """
+        Load the selected workcell and its tools. Only that workcell is fetched,
+        and it is only parsed again when its ETag (or content) changed since the
+        last load by any Config in this process.
+
+        Returns:
+            True if the loaded workcell differs from the previous load
+        """
+        import requests
+
+        with Config._load_lock:
+            selected_workcell = None
+            try:
+                selected_workcell = get_selected_workcell()
+                workcell = self._fetch_workcell(selected_workcell) if selected_workcell else None
+            except requests.exceptions.RequestException as e:
+                # Db already tried the local replica
+                logging.error(f"Can't establish connection to galago api: {e}")
+                if Config._loaded is not None:
+                    # Keep the tools we know about running through API restarts
+                    self.workcell_config = Config._loaded[2]
+                    return False
+                logging.warning("Galago api container might be down. "
+                                "No instrument tools will be launched.")
+                workcell = None
+            if workcell is None:
+                if selected_workcell is not None:
+                    logging.error("No workcells or tools found in the database")
+                workcell = (None, "", WorkcellConfig())
+            name, version, workcell_config = workcell
+            previous = Config._loaded
+            changed = previous is None or previous[:2] != (name, version)
+            Config._loaded = workcell
+            self.workcell_config = workcell_config
+            return changed
+
+    def _fetch_workcell(self, name: str) -> Optional[tuple[Optional[str], str, WorkcellConfig]]:
+        loaded = Config._loaded
+        headers = {}
+        if loaded is not None and loaded[0] == name and loaded[1].startswith(('"', 'W/')):
+            headers["If-None-Match"] = loaded[1]
+        response = get_db().request("GET", f"workcells/{name}", headers=headers)
+        if response.status_code == 304 and loaded is not None:
+            return loaded
+        if response.status_code != 200:
+            # Older APIs only look workcells up by id, fall back to the list
+            from tools.toolbox.workcell import get_all_workcells
+            workcells = get_all_workcells() or []
+            data = next((w for w in workcells if w.get("name") == name), None)
+            if data is None:
                 return None
-            selected_workcell_config = [workcell for workcell 
-                                        in workcells if 
-                                        workcell.get("name") == selected_workcell][0]
-            if selected_workcell:
-                self.workcell_config = WorkcellConfig.parse_obj(selected_workcell_config)
-        return None
+            body = json.dumps(data, sort_keys=True).encode()
+            version = hashlib.sha1(body).hexdigest()
+        else:
+            data = response.json()
+            version = response.headers.get("ETag") or hashlib.sha1(response.content).hexdigest()
+        if loaded is not None and loaded[:2] == (name, version):
+            return loaded
+        return name, version, WorkcellConfig.parse_obj(data)
     
\ No newline at end of file
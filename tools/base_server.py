@@ -4,12 +4,19 @@ import typing as t
 import os
 from concurrent import futures
 import time
+import threading
 import grpc
 from google.protobuf import message
-from tools.grpc_interfaces import tool_base_pb2, tool_driver_pb2_grpc, tool_driver_pb2
 from typing import Optional
 import logging.handlers
 from grpc_reflection.v1alpha import reflection
+from tools import slim_protos
+
+# Load only this tool's Command/Config descriptors when a slim build exists.
+# This has to happen before anything imports tool_base_pb2.
+slim_protos.install()
+
+from tools.grpc_interfaces import tool_base_pb2, tool_driver_pb2_grpc, tool_driver_pb2  # noqa: E402
 
 if sys.platform == 'win32':
     import ctypes
@@ -24,6 +31,9 @@ logging.basicConfig(
     datefmt='%Y-%m-%d %H:%M:%S', 
 )
 
+# gRPC context of the command running on each server thread, see isCancelled
+_rpc = threading.local()
+
 
 class ABCToolDriver:
     """
@@ -220,6 +230,11 @@ class ToolServer(tool_driver_pb2_grpc.ToolDriverServicer):
 
         return command, None, None
 
+    def isCancelled(self) -> bool:
+        """True once the caller of the command running on this thread cancelled it or went away."""
+        context = getattr(_rpc, "context", None)
+        return context is not None and not context.is_active()
+
     def ExecuteCommand(
         self, request: tool_base_pb2.Command, context: grpc.ServicerContext
     ) -> tool_base_pb2.ExecuteCommandReply:
@@ -239,6 +254,7 @@ class ToolServer(tool_driver_pb2_grpc.ToolDriverServicer):
                 logging.debug("Setting tool to BUSY")
                 self.setStatus(tool_base_pb2.BUSY)
                 logging.info(f"Running command {command.__class__.__name__}")
+                _rpc.context = context
                 response = self._dispatchCommand(command)
                 logged_response = str(response)
                 logged_response = (logged_response[:100] + '...') if len(logged_response) > 100 else logged_response
@@ -251,6 +267,7 @@ class ToolServer(tool_driver_pb2_grpc.ToolDriverServicer):
                     response=tool_base_pb2.DRIVER_ERROR, error_message=str(e)
                 )
             finally:
+                _rpc.context = None
                 self.setStatus(tool_base_pb2.READY)
                 # logging.info(f"Setting {self.toolId} to READY")
         return tool_base_pb2.ExecuteCommandReply(response=tool_base_pb2.SUCCESS)
@@ -61,6 +61,38 @@ def launch_web_only() -> int:
         print(f"Failed to start web server: {e}")
         return 1
 
+STARTUP_MODULES = ["tools.cli", "tools.web_server", "tools.launch_tools"]
+
+def profile_startup(modules: list[str] = STARTUP_MODULES, top: int = 10) -> None:
+    """Print an import-time breakdown for each module, measured in a fresh interpreter"""
+    for module in modules:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+        )
+        rows: list[tuple[int, int, str]] = []
+        for line in result.stderr.splitlines():
+            # Lines look like "import time:  self [us] | cumulative | imported package"
+            parts = line[len("import time:"):].split("|")
+            if not line.startswith("import time:") or len(parts) != 3 or not parts[0].strip().isdigit():
+                continue
+            name = parts[2].strip()
+            if name == "site":
+                # Everything before this was imported by interpreter startup
+                rows.clear()
+                continue
+            rows.append((int(parts[0]), int(parts[1]), name))
+        total_us = next((cumulative for _, cumulative, name in rows if name == module), None)
+        if result.returncode != 0 or total_us is None:
+            print(f"{module}: failed to import")
+            continue
+        print(f"\n{module}: {total_us / 1000:.1f} ms total")
+        print(f"{'self [ms]':>10} {'cumulative [ms]':>16}  module")
+        slowest = sorted((r for r in rows if r[2] != module), key=lambda r: r[1], reverse=True)
+        for self_us, cumulative_us, name in slowest[:top]:
+            print(f"{self_us / 1000:>10.1f} {cumulative_us / 1000:>16.1f}  {name}")
+
 def main() -> None:
     """Main entry point for Galago Tools Manager CLI"""
     
@@ -78,6 +110,7 @@ def main() -> None:
     parser.add_argument("--legacy", action="store_true", help="Launch legacy app.")
     parser.add_argument("--list", action="store_true", help="List available tools")
     parser.add_argument("--info", metavar="TOOL", help="Get information about a specific tool")
+    parser.add_argument("--profile-startup", action="store_true", help="Print an import-time breakdown of the launchers")
     
     # Parse known arguments and get the remaining arguments (if any)
     known, remaining = parser.parse_known_args()
@@ -94,7 +127,10 @@ def main() -> None:
     sys.argv = [sys.argv[0]] + remaining
     
     # Handle legacy modes
-    if known.console:
+    if known.profile_startup:
+        profile_startup()
+        sys.exit(0)
+    elif known.console:
         from tools.launch_console import main as launch_console_main
         sys.exit(launch_console_main())
     elif known.legacy:
@@ -11,16 +11,17 @@ import tkinter as tk
 from tkinter import messagebox
 from tkinter import ttk
 import time
+import queue
 import argparse
 from os.path import join, dirname
-from typing import Optional, Any, Callable, Tuple
+from typing import Optional, Any, Callable
 from tkinter.scrolledtext import ScrolledText
 from tools.utils import get_shell_command 
+from tools.log_store import LogEntry, LogStore, search_entries
 import appdirs  # type: ignore
 from tools import __version__ as galago_version
-import requests
-from packaging import version
 from tools.utils import get_local_ip
+from tools.update_check import get_cached_update_status, start_update_check
 
 # Configuration flags
 USE_APP_DATA_DIR = True  # Set to False for local development/testing
@@ -34,7 +35,15 @@ ROOT_DIR = dirname(dirname(os.path.realpath(__file__)))
 LOG_TIME = int(time.time())
 TOOLS_32BITS = ["vcode","bravo","hig_centrifuge","plateloc","vspin"]
 
-LOCAL_IP = get_local_ip()
+# Log viewer limits. The text widget keeps at most MAX_LOG_LINES lines and,
+# once exceeded, drops the oldest LOG_TRIM_LINES in a single delete.
+MAX_LOG_LINES = 5000
+LOG_TRIM_LINES = 500
+MAX_LOG_READ_BYTES = 256 * 1024  # Per file, per tick
+LOG_RENDER_CHUNK = 1000  # Lines inserted or search matches tagged per UI callback
+
+LOG_TYPE_TAGS = ("error", "warning", "success", "header", "url", "highlight", "info")
+LOG_TYPE_LEVELS = {"error": "ERROR", "warning": "WARNING"}
 
 logging.basicConfig(
     level=logging.DEBUG,
@@ -47,33 +56,6 @@ sys.path = [
     if not any(sub in p.lower() for sub in ["anaconda3", "miniconda", "mamba"])
 ]
 
-def check_for_updates() -> Tuple[bool, str, str]:
-    """
-    Check if there's a newer version of galago-tools on PyPI
-    
-    Returns:
-        Tuple[bool, str, str]: (update_available, current_version, latest_version)
-    """
-    try:
-        current_version = galago_version
-        response = requests.get("https://pypi.org/pypi/galago-tools/json", timeout=3)
-        if response.status_code == 200:
-            data = response.json()
-            latest_version = data["info"]["version"]
-            
-            # Compare versions using packaging.version for proper semantic versioning comparison
-            if version.parse(latest_version) > version.parse(current_version):
-                logging.info(f"Update available: {current_version} -> {latest_version}")
-                return True, current_version, latest_version
-            else:
-                logging.info(f"Using latest version: {current_version}")
-                return False, current_version, latest_version
-    except Exception as e:
-        logging.warning(f"Failed to check for updates: {str(e)}")
-    
-    # Return default values if the check fails
-    return False, galago_version, galago_version
-
 class UpdateNotifier(tk.Toplevel):
     """Simple window to notify the user about available updates"""
     
@@ -155,8 +137,6 @@ class UpdateNotifier(tk.Toplevel):
         self.geometry(f"+{x}+{y}")
 
 
-UPDATE_AVAILABLE, CURRENT_VERSION, LATEST_VERSION = check_for_updates()
-
 class ToolsManager():
 
     def __init__(self, app_root:tk.Tk, config:Config) -> None:
@@ -242,6 +222,21 @@ class ToolsManager():
         self.log_files_modified_times = {}
         self.log_files_last_read_positions = {}
 
+        # Parsed log history; the widget shows view_entries, one line each
+        self.log_store = LogStore()
+        self.view_entries : list[LogEntry] = []
+        self.view_queue : list[LogEntry] = []
+        self.view_lock = threading.Lock()
+        self.view_trimmed = 0
+        self.flush_scheduled = False
+        # Results from worker threads, applied on the UI thread each tick
+        self.ui_tasks : queue.Queue[Callable[[], None]] = queue.Queue()
+        self.search_matches : list[tuple[int, int, int]] = []
+        self.search_index = -1
+        self.search_generation = 0
+        self.filter_generation = 0
+        self.filter_type = "ALL"
+
         self.output_text = ScrolledText(self.right_frame, state='disabled', wrap='word', bg='#1e1e1e', fg='#d4d4d4', font=('Consolas', 10))
         self.output_text.pack(fill=tk.BOTH, expand=True)
         self.output_text.tag_config('error', foreground='#f44747') 
@@ -251,12 +246,11 @@ class ToolsManager():
         self.output_text.tag_config('header', foreground='#569cd6', font=('Consolas', 10, 'bold'))
         self.output_text.tag_config('url', foreground='#ce9178', underline=True)
         self.output_text.tag_config('highlight', background='#264f78', foreground='#ffffff')
+        self.output_text.tag_config('search', background='yellow', foreground='black')
+        self.output_text.tag_config('search_current', background='#ff8c00', foreground='black')
 
         self.update_interval = 100
-        self.update_log_text()
-        
-        # Enhanced greeting message
-        self.display_startup_message()
+        self.root.after(self.update_interval, self.update_log_text)
         
         # Add search and filter features
         self.search_frame = ttk.Frame(self.right_frame)
@@ -264,8 +258,15 @@ class ToolsManager():
 
         self.search_entry = ttk.Entry(self.search_frame)
         self.search_entry.pack(side=tk.LEFT, expand=True, fill=tk.X)
+        self.search_entry.bind("<Return>", self.search_logs)
         self.search_button = ttk.Button(self.search_frame, text="Search", command=self.search_logs)
         self.search_button.pack(side=tk.LEFT)
+        self.prev_button = ttk.Button(self.search_frame, text="▲", width=3, command=self.previous_match)
+        self.prev_button.pack(side=tk.LEFT)
+        self.next_button = ttk.Button(self.search_frame, text="▼", width=3, command=self.next_match)
+        self.next_button.pack(side=tk.LEFT)
+        self.match_label = ttk.Label(self.search_frame, text="", width=10)
+        self.match_label.pack(side=tk.LEFT, padx=(5, 0))
 
         self.filter_var = tk.StringVar(value="ALL")
         self.filter_menu = ttk.OptionMenu(self.search_frame, self.filter_var, "ALL", "ALL", "INFO", "DEBUG", "WARNING", "ERROR", command=self.filter_logs)
@@ -273,6 +274,9 @@ class ToolsManager():
         
         self.clear_button = ttk.Button(self.search_frame, text="Clear Logs", command=self.clear_logs)
         self.clear_button.pack(side=tk.LEFT, padx=(5, 0))
+
+        # Enhanced greeting message
+        self.display_startup_message()
         
 
     def display_startup_message(self) -> None:
@@ -286,19 +290,21 @@ class ToolsManager():
         
         # Version and system info
         self.log_text(f"📦 Version: {galago_version}", "info")
-        if UPDATE_AVAILABLE:
-            self.log_text(f"    A new version ({LATEST_VERSION}) is available!", "warning")
-            self.log_text("    Upgrade using: pip install --upgrade galago-tools", "info")
-            self.show_update_notification(CURRENT_VERSION, LATEST_VERSION)
+        cached_update = get_cached_update_status()
+        if cached_update is not None and cached_update[0]:
+            self.notify_update(*cached_update)
+        else:
+            # Runs off the UI thread; the result is applied on the next log tick
+            start_update_check(lambda *result: self.ui_tasks.put(lambda: self.notify_update(*result)))
         self.log_text(f"\n⏰ Started: {current_time}\n", "info")
         self.log_text(f"🆔 Session: {LOG_TIME}\n", "info")
         self.log_text(f"💻 Platform: {os.name}\n", "info")
         
         # URLs and important info
         self.log_text("📂 URLs:", "header")
-        self.log_url("   Tool Server Ip: ", "info", f"{LOCAL_IP}", "url")
+        self.log_url("   Tool Server Ip: ", "info", f"{get_local_ip()}", "url")
         self.log_url("   Galago Web Local: ", "info", "http://localhost:3010/", "url")
-        self.log_url("   Galago Web On network: ", "info", f"http://{LOCAL_IP}:3010/", "url")
+        self.log_url("   Galago Web On network: ", "info", f"http://{get_local_ip()}:3010/", "url")
         self.log_text(f"   Logs Directory: {self.log_folder}\n", "info")
         
         # Status message
@@ -308,6 +314,13 @@ class ToolsManager():
         self.log_text("")
 
 
+    def notify_update(self, update_available: bool, current_version: str, latest_version: str) -> None:
+        if not update_available:
+            return
+        self.log_text(f"    A new version ({latest_version}) is available!", "warning")
+        self.log_text("    Upgrade using: pip install --upgrade galago-tools", "info")
+        self.show_update_notification(current_version, latest_version)
+
     def show_update_notification(self, current_version: str, latest_version: str) -> None:
         """Show a notification window about available updates"""
         UpdateNotifier(self.root, current_version, latest_version)
@@ -356,131 +369,199 @@ class ToolsManager():
     def load_tools(self) -> None:
         self.config.load_workcell_config()
  
-    def read_last_lines(self, filename:str, lines:int=100) -> list[str]:
+    def read_new_lines(self, filename:str) -> list[str]:
+        """Return complete lines appended to a log file since the last read."""
+        offset = self.log_files_last_read_positions.get(filename, 0)
+        size = os.path.getsize(filename)
+        if size < offset:
+            # File was truncated or recreated, start over
+            offset = 0
+        if size == offset:
+            return []
         with open(filename, 'rb') as f:
-            f.seek(0, os.SEEK_END)
-            end_position = f.tell()
-            buffer_size = 1024
-            blocks = -1
-            data = []
-            while end_position > 0 and len(data) < lines:
-                if end_position - buffer_size > 0:
-                    f.seek(blocks * buffer_size, os.SEEK_END)
+            f.seek(offset)
+            data = f.read(MAX_LOG_READ_BYTES)
+        # Hold back a trailing partial line until the writer finishes it
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            if len(data) < MAX_LOG_READ_BYTES:
+                return []
+            end = len(data)
+        self.log_files_last_read_positions[filename] = offset + end
+        return data[:end].decode('utf-8', errors='replace').splitlines()
+
+    def trim_output(self) -> None:
+        """Drop the oldest lines once the widget exceeds MAX_LOG_LINES."""
+        if len(self.view_entries) > MAX_LOG_LINES:
+            excess = len(self.view_entries) - MAX_LOG_LINES + LOG_TRIM_LINES
+            self.output_text.delete("1.0", f"{excess + 1}.0")
+            del self.view_entries[:excess]
+            self.view_trimmed += excess
+
+    def queue_entries(self, entries: list[LogEntry]) -> None:
+        with self.view_lock:
+            self.view_queue.extend(e for e in entries if e.matches_level(self.filter_type))
+
+    def flush_view(self) -> None:
+        """Insert up to LOG_RENDER_CHUNK queued entries with a single Text.insert."""
+        with self.view_lock:
+            entries = self.view_queue[:LOG_RENDER_CHUNK]
+            del self.view_queue[:LOG_RENDER_CHUNK]
+            remaining = len(self.view_queue)
+        if entries:
+            batch : list[Any] = []
+            for entry in entries:
+                if entry.url_start >= 0:
+                    batch.extend((entry.text[:entry.url_start], entry.tag, entry.text[entry.url_start:] + "\n", "url"))
                 else:
-                    f.seek(0, os.SEEK_SET)
-                data.extend(f.readlines())
-                end_position -= buffer_size
-                blocks -= 1
-            return [line.decode('utf-8') for line in data[-lines:]]
-            
-    def update_log_text(self) -> None:
-        try:
+                    batch.extend((entry.text + "\n", entry.tag))
+            at_bottom = self.output_text.yview()[1] >= 1.0
             self.output_text.config(state='normal')
-            current_scroll = self.output_text.yview()
-            for file_name, update_time in self.log_files_modified_times.items():
-                last_updated = os.path.getmtime(file_name)
-                if update_time is None or last_updated != update_time:
-                    last_lines = self.read_last_lines(file_name, 100)
-                    self.log_files_modified_times[file_name] = last_updated
-                    filter_type = self.filter_var.get()
-                    for line in last_lines:
-                        if filter_type == "ALL" or f"| {filter_type} |" in line:
-                            if "| ERROR |" in line:
-                                self.log_text(line.strip(), "error")
-                            elif "| WARNING |" in line:
-                                self.log_text(line.strip(), "warning")
-                            else:
-                                self.log_text(line.strip())
-            
-            if current_scroll == (0.0, 1.0):  # Only scroll to the bottom if at the bottom
+            # Tk accepts alternating text/tag pairs, so one insert covers the whole chunk
+            self.output_text.insert(tk.END, *batch)
+            self.view_entries.extend(entries)
+            self.trim_output()
+            self.output_text.config(state='disabled')
+            if at_bottom:  # Only scroll to the bottom if already at the bottom
                 self.output_text.see(tk.END)
+        if remaining and not self.flush_scheduled:
+            # Keep re-renders moving between ticks without blocking the event loop
+            self.flush_scheduled = True
+            self.root.after(1, self._scheduled_flush)
 
-            self.output_text.config(state='disabled')
-        except FileNotFoundError:
-            self.output_text.config(state='disabled')
+    def _scheduled_flush(self) -> None:
+        self.flush_scheduled = False
+        self.flush_view()
+
+    def update_log_text(self) -> None:
+        try:
+            while not self.ui_tasks.empty():
+                self.ui_tasks.get_nowait()()
+            for file_name in list(self.log_files_modified_times.keys()):
+                # Compare sizes rather than mtimes, which can be too coarse to notice quick appends
+                try:
+                    new_lines = self.read_new_lines(file_name)
+                except FileNotFoundError:
+                    continue
+                if new_lines:
+                    source = os.path.splitext(os.path.basename(file_name))[0]
+                    self.queue_entries(self.log_store.add_lines(source, [line.rstrip() for line in new_lines]))
+            self.flush_view()
         except Exception:
             self.output_text.config(state='disabled')
         self.root.after(self.update_interval, self.update_log_text)
 
-
-    def search_logs(self) -> None:
-        """Search for text in the logs and highlight matches"""
+    def search_logs(self, *args: Any) -> None:
+        """Search the displayed logs in a worker thread and highlight matches"""
         search_term = self.search_entry.get().strip()
-        
-        # Clear previous search highlights
-        try:
-            self.output_text.tag_remove("search", "1.0", tk.END)
-        except tk.TclError:
-            pass
-        
+        self.search_generation += 1
+        self.search_matches = []
+        self.search_index = -1
+        self.output_text.tag_remove("search", "1.0", tk.END)
+        self.output_text.tag_remove("search_current", "1.0", tk.END)
         if not search_term:
             return
-        
-        try:
-            self.output_text.config(state='normal')
-            
-            all_text = self.output_text.get("1.0", tk.END)
-            search_term_lower = search_term.lower()
-            
-            start_index = 0
-            matches = []
-            
-            while True:
-                pos = all_text.lower().find(search_term_lower, start_index)
-                if pos == -1:
-                    break
-                matches.append((pos, pos + len(search_term)))
-                start_index = pos + 1
-            
-            for start_pos, end_pos in matches:
-                try:
-                    # Convert to line.char format
-                    start_tk = f"1.0+{start_pos}c"
-                    end_tk = f"1.0+{end_pos}c"
-                    self.output_text.tag_add("search", start_tk, end_tk)
-                except ValueError:
-                    logging.warning(f"Failed to convert position {start_pos} to line.char format")
-                    # Skip this match if position conversion fails
-                    continue
-            
-            # Configure highlighting
-            self.output_text.tag_config("search", background="yellow", foreground="black")
-            
-            # Scroll to first match if any found
-            if matches:
-                first_pos = f"1.0+{matches[0][0]}c"
-                self.output_text.see(first_pos)
-            
-        except Exception as e:
-            logging.info(f"Search failed: {str(e)}")
-            # If anything fails, just skip the search silently
-            pass
-        finally:
-            # Always restore disabled state
-            self.output_text.config(state='disabled')
+
+        generation = self.search_generation
+        snapshot = list(self.view_entries)
+        trimmed = self.view_trimmed
+
+        def worker() -> None:
+            try:
+                matches = search_entries(snapshot, search_term)
+            except Exception as e:
+                logging.info(f"Search failed: {str(e)}")
+                return
+            # Store absolute line numbers so later trims can be accounted for
+            found = [(trimmed + index + 1, start, end) for index, start, end in matches]
+            self.ui_tasks.put(lambda: self._apply_search(generation, found))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _widget_line(self, absolute_line: int) -> int:
+        return absolute_line - self.view_trimmed
+
+    def _apply_search(self, generation: int, matches: list[tuple[int, int, int]], start: int = 0) -> None:
+        """Tag search matches LOG_RENDER_CHUNK at a time so large result sets don't stall the UI."""
+        if generation != self.search_generation:
+            return
+        if start == 0:
+            self.search_matches = matches
+            if not matches:
+                self.match_label.config(text="0/0")
+        ranges = []
+        for line, col_start, col_end in matches[start:start + LOG_RENDER_CHUNK]:
+            widget_line = self._widget_line(line)
+            if widget_line >= 1:
+                ranges.extend((f"{widget_line}.{col_start}", f"{widget_line}.{col_end}"))
+        if ranges:
+            self.output_text.tag_add("search", *ranges)
+        if start == 0 and matches:
+            self.goto_match(1)
+        if start + LOG_RENDER_CHUNK < len(matches):
+            self.root.after(1, lambda: self._apply_search(generation, matches, start + LOG_RENDER_CHUNK))
+
+    def goto_match(self, step: int) -> None:
+        """Move the current search match forward (step=1) or backward (step=-1)."""
+        if not self.search_matches:
+            return
+        self.search_index = (self.search_index + step) % len(self.search_matches)
+        # Skip matches whose lines have been trimmed out of the widget
+        for _ in range(len(self.search_matches)):
+            line, col_start, col_end = self.search_matches[self.search_index]
+            if self._widget_line(line) >= 1:
+                break
+            self.search_index = (self.search_index + step) % len(self.search_matches)
+        else:
+            return
+        widget_line = self._widget_line(line)
+        self.output_text.tag_remove("search_current", "1.0", tk.END)
+        self.output_text.tag_add("search_current", f"{widget_line}.{col_start}", f"{widget_line}.{col_end}")
+        self.output_text.see(f"{widget_line}.{col_start}")
+        self.match_label.config(text=f"{self.search_index + 1}/{len(self.search_matches)}")
+
+    def next_match(self) -> None:
+        self.goto_match(1)
+
+    def previous_match(self) -> None:
+        self.goto_match(-1)
 
     def filter_logs(self, *args: Any) -> None:
+        """Rebuild the view from the log store for the selected level in a worker thread"""
         filter_type = self.filter_var.get()
-        
-        # Clear existing items in the Text widget
+        self.filter_type = filter_type
+        self.filter_generation += 1
+        generation = self.filter_generation
+
+        def worker() -> None:
+            entries = self.log_store.filter(filter_type, limit=MAX_LOG_LINES)
+            self.ui_tasks.put(lambda: self._apply_filter(generation, filter_type, entries))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _apply_filter(self, generation: int, filter_type: str, entries: list[LogEntry]) -> None:
+        if generation != self.filter_generation:
+            return
+        last_seq = entries[-1].seq if entries else -1
+        # Pick up anything stored while the worker was running
+        entries.extend(self.log_store.filter(filter_type, after_seq=last_seq))
+        self._reset_view(entries)
+        self.flush_view()
+
+    def _reset_view(self, entries: list[LogEntry]) -> None:
+        """Empty the view and queue `entries` for it, dropping searches still running"""
+        self.search_generation += 1
+        self.search_matches = []
+        self.search_index = -1
+        self.match_label.config(text="")
+        self.output_text.config(state='normal')
         self.output_text.delete("1.0", tk.END)
-        
-        for file_name in self.log_files_modified_times.keys():
-            try:
-                with open(file_name, 'r') as file:
-                    for line in file:
-                        if filter_type == "ALL" or f"| {filter_type} |" in line:
-                            if "| ERROR |" in line:
-                                self.log_text(line.strip(), "error")
-                            elif "| WARNING |" in line:
-                                self.log_text(line.strip(), "warning")
-                            else:
-                                self.log_text(line.strip())
-            except Exception as e:
-                # Insert error as a new line in the Text widget
-                current_time = time.strftime('%Y-%m-%d %H:%M:%S')
-                self.output_text.insert(tk.END, f"{current_time} | ERROR | Failed to read log file: {str(e)}\n", ('error',))
-    
+        self.output_text.config(state='disabled')
+        self.view_entries = []
+        self.view_trimmed = 0
+        with self.view_lock:
+            self.view_queue = entries
+
     def __del__(self) -> None:
         self.kill_all_processes()
     
@@ -517,6 +598,7 @@ class ToolsManager():
                      process = subprocess.Popen(cmd, shell=use_shell,universal_newlines=True)
                 self.server_processes[tool_name] = process
                 self.log_files_modified_times[output_file] = os.path.getmtime(output_file)
+                self.log_files_last_read_positions[output_file] = 0
             else:
                 self.log_text(f"Port {port} for {tool_name} is already occupied. kill process if you want to use this tool", "warning")
                 logging.warning(f"Port {port} for {tool_name} is already occupied")
@@ -538,57 +620,21 @@ class ToolsManager():
 
     def log_url(self, prefix: str, prefix_type: str, url: str, url_type: str) -> None:
         """For combining labels with URLs"""
-        self.output_text.config(state='normal')
-        
-        # Insert prefix with its style
-        if prefix_type == "error":
-            self.output_text.insert(tk.END, prefix, ('error',))
-        elif prefix_type == "warning":  
-            self.output_text.insert(tk.END, prefix, ('warning',))
-        elif prefix_type == "success":
-            self.output_text.insert(tk.END, prefix, ('success',))
-        elif prefix_type == "header":
-            self.output_text.insert(tk.END, prefix, ('header',))
-        elif prefix_type == "info":
-            self.output_text.insert(tk.END, prefix, ('info',))
-        else:
-            self.output_text.insert(tk.END, prefix)
-            
-        # Insert URL with its style
-        if url_type == "url":
-            self.output_text.insert(tk.END, url, ('url',))
-        else:
-            self.output_text.insert(tk.END, url)
-            
-        # Add newline
-        self.output_text.insert(tk.END, "\n")
-            
-        self.output_text.config(state='disabled')
-        self.output_text.see(tk.END)
+        entry = self.log_store.add(
+            "manager",
+            prefix + url,
+            LOG_TYPE_LEVELS.get(prefix_type, "INFO"),
+            prefix_type if prefix_type in LOG_TYPE_TAGS else "",
+            len(prefix) if url_type == "url" else -1,
+        )
+        self.queue_entries([entry])
 
     def log_text(self, text: str, log_type: str = "info") -> None:
         """Enhanced log_text method with better styling"""
-        self.output_text.config(state='normal')
-        
-        if log_type == "error":
-            self.output_text.insert(tk.END, text + "\n", ('error',))
-        elif log_type == "warning":  
-            self.output_text.insert(tk.END, text + "\n", ('warning',))
-        elif log_type == "success":
-            self.output_text.insert(tk.END, text + "\n", ('success',))
-        elif log_type == "header":
-            self.output_text.insert(tk.END, text + "\n", ('header',))
-        elif log_type == "url":
-            self.output_text.insert(tk.END, text + "\n", ('url',))
-        elif log_type == "highlight":
-            self.output_text.insert(tk.END, text + "\n", ('highlight',))
-        elif log_type == "info":
-            self.output_text.insert(tk.END, text + "\n", ('info',))
-        else:
-            self.output_text.insert(tk.END, text + "\n")
-            
-        self.output_text.config(state='disabled')
-        self.output_text.see(tk.END)
+        # Queued rather than inserted directly, this may be called off the UI thread
+        tag = log_type if log_type in LOG_TYPE_TAGS else ""
+        level = LOG_TYPE_LEVELS.get(log_type, "INFO")
+        self.queue_entries([self.log_store.add("manager", line, level, tag) for line in text.split("\n")])
 
     def populate_tool_buttons(self) -> None:
         left_width = 300  # Initial width of the left frame
@@ -710,9 +756,10 @@ class ToolsManager():
         
     def clear_logs(self) -> None:
         """Clear all logs from the output text widget"""
-        self.output_text.config(state='normal')
-        self.output_text.delete("1.0", tk.END)
-        self.output_text.config(state='disabled')
+        self.log_store.clear()
+        # A filter still running would bring back the cleared entries
+        self.filter_generation += 1
+        self._reset_view([])
 
 
 def main() -> int:
@@ -749,9 +796,9 @@ def main() -> int:
         print(f"💻 Platform: {os.name}")
         print("")
         print("📂 URLs:")
-        print(f"   Tool Server Ip: {LOCAL_IP}")
+        print(f"   Tool Server Ip: {get_local_ip()}")
         print("   Galago Web Local: http://localhost:3010/")
-        print(f"   Galago Web On network: http://{LOCAL_IP}:3010/")
+        print(f"   Galago Web On network: http://{get_local_ip()}:3010/")
         print("")
         print("✅ Manager initialized successfully")
         print("🔄 Starting tool servers...")
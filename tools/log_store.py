@@ -0,0 +1,126 @@
+"""In-memory store of parsed tool log lines backing the Tk log viewer."""
+
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+
+def fold_case(text: str) -> str:
+    """
+    Lower-case text without changing its length, so offsets found in the
+    result are columns of text. Characters whose lower case is longer, such
+    as 'İ', are kept as they are.
+    """
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+
+@dataclass
+class LogEntry:
+    seq: int
+    source: str
+    timestamp: str
+    level: str
+    text: str
+    tag: str = ""
+    url_start: int = -1  # Offset where a clickable-looking url starts, -1 if none
+    lowered: str = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        # Cached once so searches never lower-case the same text twice
+        self.lowered = fold_case(self.text)
+
+    def matches_level(self, level: str) -> bool:
+        return level == "ALL" or self.level == level
+
+
+def parse_log_line(line: str) -> tuple[str, Optional[str]]:
+    """
+    Split a line written with the '%(asctime)s | %(levelname)s | %(message)s'
+    format into (timestamp, level). Lines that don't follow the format, such as
+    traceback continuations, return a level of None.
+    """
+    parts = line.split(" | ", 2)
+    if len(parts) == 3 and parts[1].strip() in LOG_LEVELS:
+        return parts[0].strip(), parts[1].strip()
+    return "", None
+
+
+class LogStore:
+    """
+    Thread-safe, bounded store of log entries. The UI thread appends entries
+    as log files grow while worker threads filter and search snapshots.
+    """
+
+    def __init__(self, max_entries: int = 50000) -> None:
+        self._entries: deque[LogEntry] = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+        self._next_seq = 0
+        self._last_level: dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, source: str, text: str, level: str, tag: str = "", url_start: int = -1) -> LogEntry:
+        with self._lock:
+            entry = LogEntry(self._next_seq, source, "", level, text, tag, url_start)
+            self._next_seq += 1
+            self._entries.append(entry)
+            return entry
+
+    def add_lines(self, source: str, lines: Iterable[str]) -> list[LogEntry]:
+        """Parse and store raw log lines. Continuation lines inherit the previous level."""
+        added = []
+        with self._lock:
+            for line in lines:
+                timestamp, level = parse_log_line(line)
+                if level is None:
+                    level = self._last_level.get(source, "INFO")
+                else:
+                    self._last_level[source] = level
+                tag = "error" if level in ("ERROR", "CRITICAL") else "warning" if level == "WARNING" else ""
+                entry = LogEntry(self._next_seq, source, timestamp, level, line, tag)
+                self._next_seq += 1
+                self._entries.append(entry)
+                added.append(entry)
+        return added
+
+    def filter(self, level: str, after_seq: int = -1, limit: Optional[int] = None) -> list[LogEntry]:
+        """Return entries at the given level (or 'ALL') newer than after_seq, keeping the last `limit`."""
+        with self._lock:
+            entries = list(self._entries)
+        result = [e for e in entries if e.seq > after_seq and e.matches_level(level)]
+        if limit is not None and len(result) > limit:
+            result = result[-limit:]
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._last_level.clear()
+
+
+def search_entries(entries: list[LogEntry], term: str) -> list[tuple[int, int, int]]:
+    """
+    Case-insensitive search over a list of entries.
+
+    Returns:
+        list of (entry index, start column, end column) for every match
+    """
+    term = fold_case(term)
+    if not term:
+        return []
+    size = len(term)
+    matches = []
+    for index, entry in enumerate(entries):
+        lowered = entry.lowered
+        pos = lowered.find(term)
+        while pos != -1:
+            matches.append((index, pos, pos + size))
+            pos = lowered.find(term, pos + size)
+    return matches
@@ -1,11 +1,15 @@
 import logging
 from tools.base_server import ABCToolDriver
 import requests
-import time
-from typing import Optional 
-from PIL import Image
-import io
-import os 
+from typing import Any, Optional 
+
+from tools.opentrons2.image_store import ImageStore, TimeLapse
+from tools.opentrons2.run_monitor import ProgressCallback, RunMonitor, RunProgress
+from tools.opentrons2.protocol_cache import ProtocolCache, VARIABLES_PARAMETER, protocol_hash, variables_csv
+
+
+class DataFilesUnsupported(Exception):
+    """The robot software predates runtime parameter files."""
 
 class Ot2Driver(ABCToolDriver):
     def __init__(self, robot_ip: str, robot_port: int = 31950) -> None:
@@ -13,13 +17,29 @@ class Ot2Driver(ABCToolDriver):
         self.robot_port: int = robot_port
 
         self.run_id: Optional[str] = None
+        self.protocol_cache = ProtocolCache(f"{robot_ip}:{robot_port}")
+        # Unknown until the first runtime parameter file is uploaded
+        self.supports_data_files: Optional[bool] = None
 
         self.base_url = f"http://{robot_ip}:{robot_port}"
         self.headers = {"Opentrons-Version": "2"}
+        # Keeps the connection to the robot open between requests
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+
+        # Called as a run makes progress, see RunMonitor
+        self.on_progress: Optional[ProgressCallback] = None
+        self.run_progress: Optional[RunProgress] = None
+        self._command_counts: dict[str, int] = {}
+
+        self._camera_session = requests.Session()
+        self._camera_session.headers.update(self.headers)
+        self._image_stores: dict[str, ImageStore] = {}
+        self.time_lapse: Optional[TimeLapse] = None
 
     def ping(self) -> None:
         """Test connection to the OT-2 robot."""
-        response = requests.get(
+        response = self.session.get(
             url=f"{self.base_url}/health",
             headers=self.headers,
         )
@@ -33,7 +53,7 @@ class Ot2Driver(ABCToolDriver):
         """Toggle the OT-2 deck lights on/off."""
         try:
             # Get current light status
-            light_status_response = requests.get(
+            light_status_response = self.session.get(
                 url=f"{self.base_url}/robot/lights",
                 headers=self.headers,
             )
@@ -44,7 +64,7 @@ class Ot2Driver(ABCToolDriver):
             logging.info(f"Current light status: {'ON' if light_status else 'OFF'}")
 
             # Toggle light status
-            toggle_light_response = requests.post(
+            toggle_light_response = self.session.post(
                 url=f"{self.base_url}/robot/lights",
                 headers=self.headers,
                 json={"on": not light_status}
@@ -59,48 +79,98 @@ class Ot2Driver(ABCToolDriver):
             logging.error(f"Error toggling lights: {e}")
             raise
 
+    def get_protocol_ids(self) -> set[str]:
+        """Ids of the protocols stored on the robot."""
+        response = self.session.get(
+            url=f"{self.base_url}/protocols",
+            headers=self.headers,
+            timeout=30,
+        )
+        if not response.ok:
+            raise Exception(f"Failed to list protocols: {response.text}")
+        return {protocol["id"] for protocol in response.json().get("data", [])}
+
+    def upload_protocol(self, protocol_text: str) -> str:
+        """Upload a protocol, which makes the robot analyze it. Returns its protocolId."""
+        upload_response = self.session.post(
+            url=f"{self.base_url}/protocols",
+            files={
+                "files": ('protocol.py', protocol_text.encode("utf-8"), "text/x-python-script"),
+            },
+            headers=self.headers,
+        )
+
+        if not upload_response.ok:
+            raise Exception(f"Protocol upload failed: {upload_response.text}")
+
+        try:
+            protocol_id: str = upload_response.json()['data']['id']
+            logging.info(f"Protocol uploaded with ID: {protocol_id}")
+        except KeyError:
+            raise Exception(f"Invalid upload response format: {upload_response.text}")
+        return protocol_id
+
+    def ensure_protocol(self, protocol_text: str) -> str:
+        """The protocolId of this protocol on the robot, uploading it only if it isn't there yet."""
+        digest = protocol_hash(protocol_text)
+        protocol_id = self.protocol_cache.get(digest)
+        if protocol_id is not None:
+            protocol_ids = self.get_protocol_ids()
+            self.protocol_cache.retain(protocol_ids)
+            if protocol_id in protocol_ids:
+                logging.info(f"Reusing uploaded protocol {protocol_id}")
+                return protocol_id
+        protocol_id = self.upload_protocol(protocol_text)
+        self.protocol_cache.put(digest, protocol_id)
+        return protocol_id
+
+    def upload_data_file(self, content: str, file_name: str = "variables.csv") -> str:
+        """Upload a runtime parameter file. Returns its id."""
+        response = self.session.post(
+            url=f"{self.base_url}/dataFiles",
+            files={"file": (file_name, content.encode("utf-8"), "text/csv")},
+            headers=self.headers,
+        )
+        if response.status_code in (404, 405):
+            self.supports_data_files = False
+            raise DataFilesUnsupported("Robot software doesn't support runtime parameter files")
+        if not response.ok:
+            raise Exception(f"Data file upload failed: {response.text}")
+        self.supports_data_files = True
+        file_id: str = response.json()['data']['id']
+        return file_id
+
+    def delete_data_file(self, file_id: str) -> None:
+        response = self.session.delete(url=f"{self.base_url}/dataFiles/{file_id}", headers=self.headers)
+        if not response.ok:
+            logging.warning(f"Failed to delete data file {file_id}: {response.text}")
+
+    def create_run(self, protocol_id: str, parameter_files: Optional[dict[str, str]] = None) -> str:
+        """Create a run of an uploaded protocol, with runtime parameter files by parameter name."""
+        data: dict[str, Any] = {"protocolId": protocol_id}
+        if parameter_files:
+            data["runTimeParameterFiles"] = parameter_files
+        create_run_response = self.session.post(
+            url=f"{self.base_url}/runs",
+            json={"data": data},
+            headers=self.headers,
+        )
+
+        if not create_run_response.ok:
+            raise Exception(f"Failed to create run: {create_run_response.text}")
+
+        run_id: str = create_run_response.json()['data']['id']
+        self.run_id = run_id
+        logging.info(f'Created run with ID: {self.run_id}')
+        return run_id
+
     def upload_and_schedule_protocol(self, protocol_file: str) -> str:
-        """Upload protocol file and create a scheduled run."""
+        """Upload protocol file (unless the robot already has it) and create a scheduled run."""
         try:
-            # Upload protocol
-            with open(protocol_file, 'rb') as f:
-                upload_response = requests.post(
-                    url=f"{self.base_url}/protocols",
-                    files={
-                        "files": ('protocol.py', f, "text/x-python-script"),
-                    },
-                    headers=self.headers,
-                )
-            
-            if not upload_response.ok:
-                raise Exception(f"Protocol upload failed: {upload_response.text}")
-                
-            try:
-                protocol_id = upload_response.json()['data']['id']
-                logging.info(f"Protocol uploaded with ID: {protocol_id}")
-            except KeyError:
-                raise Exception(f"Invalid upload response format: {upload_response.text}")
-
-            # Create a run for the protocol
-            create_run_response = requests.post(
-                url=f"{self.base_url}/runs",
-                json={
-                    "data": {
-                        "protocolId": protocol_id
-                    }
-                },
-                headers=self.headers,
-            )
-            
-            if not create_run_response.ok:
-                raise Exception(f"Failed to create run: {create_run_response.text}")
-                
-            run_id: str = create_run_response.json()['data']['id']
-            self.run_id = run_id
-            logging.info(f'Created run with ID: {self.run_id}')
-            
-            return run_id
-            
+            with open(protocol_file, 'r', encoding='utf-8') as f:
+                protocol_text = f.read()
+            return self.create_run(self.ensure_protocol(protocol_text))
+
         except Exception as e:
             logging.error(f"Error uploading and scheduling protocol: {e}")
             raise
@@ -108,7 +178,7 @@ class Ot2Driver(ABCToolDriver):
     def start_run(self, run_id: str) -> None:
         """Start a scheduled protocol run."""
         try:
-            start_response = requests.post(
+            start_response = self.session.post(
                 url=f"{self.base_url}/runs/{run_id}/actions",
                 headers=self.headers,
                 json={"data": {"actionType": "play"}}
@@ -129,7 +199,7 @@ class Ot2Driver(ABCToolDriver):
             return
             
         try:
-            pause_response = requests.post(
+            pause_response = self.session.post(
                 url=f"{self.base_url}/runs/{self.run_id}/actions",
                 headers=self.headers,
                 json={"data": {"actionType": "pause"}}
@@ -150,7 +220,7 @@ class Ot2Driver(ABCToolDriver):
             return
             
         try:
-            resume_response = requests.post(
+            resume_response = self.session.post(
                 url=f"{self.base_url}/runs/{self.run_id}/actions",
                 headers=self.headers,
                 json={"data": {"actionType": "play"}}
@@ -172,7 +242,7 @@ class Ot2Driver(ABCToolDriver):
             
         try:
             # Stop the run
-            stop_response = requests.post(
+            stop_response = self.session.post(
                 url=f"{self.base_url}/runs/{self.run_id}/actions",
                 headers=self.headers,
                 json={"data": {"actionType": "stop"}}
@@ -181,7 +251,7 @@ class Ot2Driver(ABCToolDriver):
                 raise Exception(f"Failed to stop run: {stop_response.text}")
             
             # Delete the run
-            delete_response = requests.delete(
+            delete_response = self.session.delete(
                 url=f"{self.base_url}/runs/{self.run_id}",
                 headers=self.headers,
             )
@@ -199,7 +269,7 @@ class Ot2Driver(ABCToolDriver):
     def get_run_status(self, run_id: str) -> dict:
         """Get the current status of a protocol run."""
         try:
-            response = requests.get(
+            response = self.session.get(
                 url=f"{self.base_url}/runs/{run_id}",
                 headers=self.headers,
                 timeout=30
@@ -213,32 +283,39 @@ class Ot2Driver(ABCToolDriver):
             logging.error(f"Error getting run status for {run_id}: {e}")
             raise
 
-    def wait_for_completion(self, run_id: str, timeout: int = 1800) -> None:
-        """Wait for a protocol run to complete."""
-        start_time = time.time()
-        
-        while time.time() - start_time < timeout:
-            try:
-                run_data = self.get_run_status(run_id)
-                status = run_data['data']['status']
-                
-                logging.info(f"Run {run_id} status: {status}")
-                
-                if status == 'succeeded':
-                    logging.info(f"Run {run_id} completed successfully")
-                    return
-                elif status in ['stopped', 'failed', 'blocked-by-open-door']:
-                    raise Exception(f"Run {run_id} failed with status: {status}")
-                
-                time.sleep(2)  # Check every 2 seconds
-                
-            except Exception as e:
-                if "failed with status" in str(e):
-                    raise  # Re-raise status failures
-                logging.warning(f"Error checking run status: {e}")
-                time.sleep(5)  # Wait longer on communication errors
-        
-        raise TimeoutError(f"Run {run_id} did not complete within {timeout} seconds")
+    def protocol_command_count(self, protocol_id: str) -> Optional[int]:
+        """Number of commands in the protocol's analysis, if it has completed."""
+        if protocol_id in self._command_counts:
+            return self._command_counts[protocol_id]
+        try:
+            protocol = self.session.get(url=f"{self.base_url}/protocols/{protocol_id}", timeout=30)
+            protocol.raise_for_status()
+            analyses = protocol.json()["data"].get("analysisSummaries", [])
+            if not analyses or analyses[-1].get("status") != "completed":
+                return None
+            analysis = self.session.get(
+                url=f"{self.base_url}/protocols/{protocol_id}/analyses/{analyses[-1]['id']}",
+                timeout=30,
+            )
+            analysis.raise_for_status()
+            count = len(analysis.json()["data"].get("commands", []))
+        except Exception as e:
+            logging.warning(f"Could not get the analysis of protocol {protocol_id}: {e}")
+            return None
+        self._command_counts[protocol_id] = count
+        return count
+
+    def wait_for_completion(self, run_id: str, timeout: int = 1800, protocol_id: Optional[str] = None) -> None:
+        """Wait for a protocol run to complete, reporting its progress to on_progress."""
+        total = self.protocol_command_count(protocol_id) if protocol_id else None
+
+        def on_progress(progress: RunProgress) -> None:
+            self.run_progress = progress
+            logging.info(str(progress))
+            if self.on_progress is not None:
+                self.on_progress(progress)
+
+        RunMonitor(self.session, self.base_url, run_id, total, on_progress).wait(timeout)
 
     def start_protocol(self, protocol_file: str, wait_for_completion: bool = True) -> None:
         """
@@ -248,63 +325,102 @@ class Ot2Driver(ABCToolDriver):
             protocol_file: Path to the Python protocol file
             wait_for_completion: Whether to wait for the protocol to finish
         """
+        logging.info(f"Starting protocol: {protocol_file}")
+        with open(protocol_file, 'r', encoding='utf-8') as f:
+            protocol_text = f.read()
+        self.run_protocol(protocol_text, wait_for_completion=wait_for_completion)
+
+    def run_protocol(
+        self,
+        protocol_text: str,
+        variables: Optional[dict[str, Any]] = None,
+        wait_for_completion: bool = True,
+    ) -> None:
+        """
+        Execute a protocol on the OT-2, reusing the uploaded copy if the robot has one.
+
+        Args:
+            protocol_text: Protocol source
+            variables: Sent as the runtime parameter file of a protocol made by
+                stable_protocol(). Raises DataFilesUnsupported if the robot can't take it.
+            wait_for_completion: Whether to wait for the protocol to finish
+        """
+        data_file_id = None
         try:
-            logging.info(f"Starting protocol: {protocol_file}")
-            
-            # Upload and schedule the protocol
-            run_id = self.upload_and_schedule_protocol(protocol_file)
-            
+            parameter_files = None
+            if variables is not None:
+                data_file_id = self.upload_data_file(variables_csv(variables))
+                parameter_files = {VARIABLES_PARAMETER: data_file_id}
+
+            protocol_id = self.ensure_protocol(protocol_text)
+            run_id = self.create_run(protocol_id, parameter_files)
+
             # Start the run
             self.start_run(run_id)
             
             # Wait for completion if requested
             if wait_for_completion:
-                self.wait_for_completion(run_id)
+                self.wait_for_completion(run_id, protocol_id=protocol_id)
                 
             logging.info("Protocol execution completed successfully")
             
+        except DataFilesUnsupported:
+            raise
         except Exception as e:
             logging.error(f"Error executing protocol: {e}")
             raise
+        finally:
+            if data_file_id is not None and wait_for_completion:
+                self.delete_data_file(data_file_id)
     
+    def capture_picture(self) -> bytes:
+        """Take a picture with the OT-2 camera. Returns the JPEG as the robot sent it."""
+        # Own session, so time-lapse pictures can be taken while a run is monitored
+        response = self._camera_session.post(url=f"{self.base_url}/camera/picture", timeout=30)
+        if not response.ok:
+            raise Exception(f"Failed to take picture: {response.text}")
+        content: bytes = response.content
+        return content
+
+    def image_store(self, directory: str) -> ImageStore:
+        if directory not in self._image_stores:
+            self._image_stores[directory] = ImageStore(directory)
+        return self._image_stores[directory]
+
     def take_picture(self, name: str, directory: str) -> str:
         """
         Take a picture using the OT-2 camera and save it to the specified location.
         
         Args:
             name: Filename for the image
-            directory: Directory to save the image
+            directory: Directory to save the image, in a folder per day
             
         Returns:
-            Full path to the saved image file
+            Full path to the saved image file. The rotated copy and thumbnail
+            are written in the background, see ImageStore.
         """
         try:
-            # Take picture via API
-            response = requests.post(
-                url=f"{self.base_url}/camera/picture",
-                headers=self.headers,
-            )
-            if not response.ok:
-                raise Exception(f"Failed to take picture: {response.text}")
-            
-            # Process and save the image
-            image = Image.open(io.BytesIO(response.content))
-            rotated_image = image.rotate(180)  # OT-2 camera is upside down
-            
-            # Ensure directory exists
-            os.makedirs(directory, exist_ok=True)
-            
-            # Save image
-            file_path = os.path.join(directory, name)
-            rotated_image.save(file_path, format="JPEG")
-            
-            logging.info(f"Picture saved: {file_path}")
-            return file_path
+            return self.image_store(directory).save(name, self.capture_picture())
             
         except Exception as e:
             logging.error(f"Error taking picture: {e}")
             raise
 
+    def start_time_lapse(
+        self, directory: str, interval: float, prefix: str = "timelapse", count: Optional[int] = None
+    ) -> TimeLapse:
+        """Take a picture every `interval` seconds in the background until stopped."""
+        self.stop_time_lapse()
+        logging.info(f"Starting time-lapse every {interval}s in {directory}")
+        self.time_lapse = TimeLapse(self.capture_picture, self.image_store(directory), interval, prefix, count)
+        return self.time_lapse.start()
+
+    def stop_time_lapse(self) -> None:
+        if self.time_lapse is not None:
+            self.time_lapse.stop()
+            logging.info(f"Time-lapse stopped after {self.time_lapse.taken} pictures")
+            self.time_lapse = None
+
     def close(self) -> None:
         """Clean up resources and cancel any running protocols."""
         try:
@@ -312,4 +428,7 @@ class Ot2Driver(ABCToolDriver):
                 logging.info("Cleaning up active run on close")
                 self.cancel_protocol()
         except Exception as e:
-            logging.warning(f"Error during cleanup: {e}")
\ No newline at end of file
+            logging.warning(f"Error during cleanup: {e}")
+        self.stop_time_lapse()
+        self.session.close()
+        self._camera_session.close()
\ No newline at end of file
@@ -0,0 +1,238 @@
+"""
+Storage for OT-2 camera pictures.
+
+The OT-2 camera is mounted upside down. Pictures are saved as the bytes the
+robot sent, with an EXIF orientation tag telling viewers to turn them, so
+saving costs no decoding and no recompression. A rotated copy and a thumbnail
+are made afterwards on a small pool of worker threads.
+
+Pictures are stored in one folder per day, <root>/<YYYY-MM-DD>/, next to an
+index.jsonl the store appends to as pictures and their copies are written.
+Listing a day reads the index instead of listing and sorting the folder.
+"""
+
+import json
+import logging
+import os
+import struct
+import threading
+import time
+from concurrent import futures
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+from PIL import Image
+
+IMAGE_WORKERS = 2
+THUMBNAIL_SIZE = (320, 240)
+ROTATED_QUALITY = 95
+INDEX_FILE = "index.jsonl"
+ROTATED_DIR = "rotated"
+THUMBNAIL_DIR = "thumbnails"
+
+# EXIF orientation 3: rotate 180 degrees
+ROTATE_180 = 3
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="galago-images")
+        return _executor
+
+
+def _segments(jpeg: bytes) -> list[tuple[int, int]]:
+    """(marker, offset) of the header segments of a JPEG, up to the image data."""
+    segments = []
+    offset = 2
+    while offset + 4 <= len(jpeg) and jpeg[offset] == 0xFF:
+        marker = jpeg[offset + 1]
+        if marker == 0xDA:  # Start of scan
+            break
+        segments.append((marker, offset))
+        offset += 2 + struct.unpack(">H", jpeg[offset + 2:offset + 4])[0]
+    return segments
+
+
+def with_orientation(jpeg: bytes, orientation: int = ROTATE_180) -> bytes:
+    """
+    The JPEG with an EXIF orientation tag added, without touching the image
+    data. Pictures that aren't JPEGs or already carry EXIF are returned as is.
+    """
+    if not jpeg.startswith(b"\xff\xd8"):
+        return jpeg
+    segments = _segments(jpeg)
+    if any(marker == 0xE1 and jpeg[offset + 4:offset + 10] == b"Exif\x00\x00" for marker, offset in segments):
+        return jpeg
+    # Big endian TIFF header and a single IFD holding the orientation
+    exif = (
+        b"Exif\x00\x00"
+        + b"MM\x00\x2a\x00\x00\x00\x08"
+        + struct.pack(">H", 1)
+        + struct.pack(">HHIHH", 0x0112, 3, 1, orientation, 0)
+        + struct.pack(">I", 0)
+    )
+    app1 = b"\xff\xe1" + struct.pack(">H", len(exif) + 2) + exif
+    # After the JFIF header when there is one
+    insert_at = 2
+    if segments and segments[0][0] == 0xE0:
+        insert_at += 2 + struct.unpack(">H", jpeg[4:6])[0]
+    return jpeg[:insert_at] + app1 + jpeg[insert_at:]
+
+
+def _write_atomic(path: Path, content: bytes) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+class ImageStore:
+    def __init__(self, root: Union[str, Path], rotate: bool = True) -> None:
+        self.root = Path(root)
+        self.rotate = rotate
+        self._lock = threading.Lock()
+        # date -> name -> index entry
+        self._indexes: dict[str, dict[str, dict[str, Any]]] = {}
+        self._pending: set[Future] = set()
+
+    def day_dir(self, date: str) -> Path:
+        return self.root / date
+
+    def save(self, name: str, content: bytes, taken_at: Optional[datetime] = None) -> str:
+        """Store a picture and queue its copies. Returns the picture's path."""
+        taken_at = taken_at or datetime.now()
+        date = taken_at.strftime("%Y-%m-%d")
+        directory = self.day_dir(date)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / Path(name).name
+        _write_atomic(path, with_orientation(content) if self.rotate else content)
+        self._append(date, {"name": path.name, "taken_at": taken_at.isoformat(), "bytes": len(content)})
+
+        future = _get_executor().submit(self._make_copies, date, path)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        logging.info(f"Picture saved: {path}")
+        return str(path)
+
+    def _done(self, future: Future) -> None:
+        with self._lock:
+            self._pending.discard(future)
+        error = future.exception()
+        if error is not None:
+            logging.warning(f"Failed to process picture: {error}")
+
+    def _make_copies(self, date: str, path: Path) -> None:
+        with Image.open(path) as image:
+            image.load()
+        if self.rotate:
+            image = image.transpose(Image.Transpose.ROTATE_180)
+            rotated = path.parent / ROTATED_DIR / path.name
+            rotated.parent.mkdir(exist_ok=True)
+            image.save(rotated, format="JPEG", quality=ROTATED_QUALITY)
+        image.thumbnail(THUMBNAIL_SIZE)
+        thumbnail = path.parent / THUMBNAIL_DIR / path.name
+        thumbnail.parent.mkdir(exist_ok=True)
+        image.convert("RGB").save(thumbnail, format="JPEG")
+        update = {"name": path.name, "thumbnail": f"{THUMBNAIL_DIR}/{path.name}"}
+        if self.rotate:
+            update["rotated"] = f"{ROTATED_DIR}/{path.name}"
+        self._append(date, update)
+
+    def _load_index(self, date: str) -> dict[str, dict[str, Any]]:
+        """Entries of a day by name, in the order pictures were taken. Call with the lock held."""
+        if date in self._indexes:
+            return self._indexes[date]
+        entries: dict[str, dict[str, Any]] = {}
+        try:
+            with open(self.day_dir(date) / INDEX_FILE, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        update = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash
+                        continue
+                    entries.setdefault(update["name"], {}).update(update)
+        except OSError:
+            pass
+        self._indexes[date] = entries
+        return entries
+
+    def _append(self, date: str, update: dict[str, Any]) -> None:
+        with self._lock:
+            entries = self._load_index(date)
+            entries.setdefault(update["name"], {}).update(update)
+            with open(self.day_dir(date) / INDEX_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(update) + "\n")
+
+    def list_images(self, date: str) -> list[dict[str, Any]]:
+        """Index entries of the pictures taken on a day (YYYY-MM-DD), oldest first."""
+        with self._lock:
+            return [dict(entry) for entry in self._load_index(date).values()]
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Wait for the copies queued so far to be written."""
+        with self._lock:
+            pending = set(self._pending)
+        _, not_done = futures.wait(pending, timeout)
+        if not_done:
+            raise TimeoutError(f"{len(not_done)} pictures still being processed")
+
+
+class TimeLapse:
+    """Takes a picture every `interval` seconds on a thread of its own."""
+
+    def __init__(
+        self,
+        capture: Callable[[], bytes],
+        store: ImageStore,
+        interval: float,
+        prefix: str = "timelapse",
+        count: Optional[int] = None,
+    ) -> None:
+        self.capture = capture
+        self.store = store
+        self.interval = interval
+        self.prefix = prefix
+        self.count = count
+        self.taken = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="galago-timelapse")
+
+    def start(self) -> "TimeLapse":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.interval + 30)
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def _run(self) -> None:
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            taken_at = datetime.now()
+            try:
+                self.store.save(f"{self.prefix}_{taken_at:%H%M%S_%f}.jpg", self.capture(), taken_at)
+                self.taken += 1
+                if self.count is not None and self.taken >= self.count:
+                    break
+            except Exception as e:
+                logging.warning(f"Time-lapse picture failed: {e}")
+            # On a fixed schedule, skipping pictures the camera was too slow for
+            next_at += self.interval
+            now = time.monotonic()
+            if next_at < now:
+                next_at += (now - next_at) // self.interval * self.interval + self.interval
+            self._stop.wait(next_at - now)
@@ -0,0 +1,171 @@
+"""
+Reuse of protocols already uploaded to an OT-2.
+
+Uploading a protocol makes the robot analyze it, which takes tens of seconds,
+so protocols are uploaded once per content hash and later runs are created
+against the cached protocolId. The cache is kept per robot in
+DATA_DIR/ot2_protocols.json and checked against the robot's /protocols list
+before use, since the robot may have deleted protocols since.
+
+For the cache to hit across runs with different variables, the protocol text
+must not change with them. stable_protocol() wraps a script so its variables
+are read from a CSV runtime parameter file instead of being written into the
+text. That needs apiLevel 2.20 (robot software 8.0), and the variables are
+only set once run() is called, so scripts that use them at module level, or
+define their own runtime parameters, keep having them injected.
+"""
+
+import ast
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+import appdirs  # type: ignore
+
+APP_NAME = "galago"
+APP_AUTHOR = "sciencecorp"
+PROTOCOL_CACHE_FILE = Path(appdirs.user_data_dir(APP_NAME, APP_AUTHOR)) / "ot2_protocols.json"
+VARIABLES_PARAMETER = "galago_variables"
+MIN_STABLE_API_LEVEL = (2, 20)
+
+_STABLE_SUFFIX = f'''
+
+# Added by galago: variables arrive with each run in the {VARIABLES_PARAMETER}
+# CSV runtime parameter (name, JSON value), so this text stays the same.
+def add_parameters(parameters):
+    parameters.add_csv_file(
+        variable_name="{VARIABLES_PARAMETER}",
+        display_name="Galago variables",
+        description="Variables for this run",
+    )
+
+
+_galago_run = run
+
+
+def run(protocol):
+    import csv as _csv
+    import io as _io
+    import json as _json
+
+    try:
+        contents = protocol.params.{VARIABLES_PARAMETER}.contents
+    except Exception:
+        # No file during analysis
+        contents = ""
+    for row in _csv.reader(_io.StringIO(contents)):
+        if len(row) == 2:
+            globals()[row[0]] = _json.loads(row[1])
+    _galago_run(protocol)
+'''
+
+
+def protocol_hash(protocol_text: str) -> str:
+    return hashlib.sha256(protocol_text.encode("utf-8")).hexdigest()
+
+
+def api_level(script_content: str) -> Optional[tuple[int, int]]:
+    match = re.search(r"""["']apiLevel["']\s*:\s*["'](\d+)\.(\d+)["']""", script_content)
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def _module_level_names(tree: ast.Module) -> set[str]:
+    """Names read while the module is imported, i.e. outside function bodies."""
+    names: set[str] = set()
+
+    def visit(node: ast.AST) -> None:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            # Decorators and defaults are evaluated at import
+            for child in [*getattr(node, "decorator_list", []), *node.args.defaults, *node.args.kw_defaults]:
+                if child is not None:
+                    visit(child)
+            return
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+            names.add(node.id)
+        for child in ast.iter_child_nodes(node):
+            visit(child)
+
+    visit(tree)
+    return names
+
+
+def stable_protocol(script_content: str, variable_names: list[str]) -> Optional[str]:
+    """
+    The script wrapped to read its variables from a runtime parameter file, or
+    None if it can't be, in which case the variables have to be injected.
+    """
+    level = api_level(script_content)
+    if level is None or level < MIN_STABLE_API_LEVEL:
+        return None
+    try:
+        tree = ast.parse(script_content)
+    except SyntaxError:
+        return None
+    defined = {node.name for node in tree.body if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))}
+    if "run" not in defined or "add_parameters" in defined:
+        return None
+    if _module_level_names(tree) & set(variable_names):
+        return None
+    return script_content + _STABLE_SUFFIX
+
+
+def variables_csv(values: dict[str, Any]) -> str:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    for name, value in values.items():
+        writer.writerow([name, json.dumps(value)])
+    return out.getvalue()
+
+
+class ProtocolCache:
+    """protocol hash -> protocolId for one robot, persisted across restarts."""
+
+    def __init__(self, robot: str, path: Path = PROTOCOL_CACHE_FILE) -> None:
+        self.robot = robot
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read_all(self) -> dict[str, dict[str, str]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _write_all(self, data: dict[str, dict[str, str]]) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logging.warning(f"Failed to save OT-2 protocol cache: {e}")
+
+    def get(self, digest: str) -> Optional[str]:
+        with self._lock:
+            return self._read_all().get(self.robot, {}).get(digest)
+
+    def put(self, digest: str, protocol_id: str) -> None:
+        with self._lock:
+            data = self._read_all()
+            data.setdefault(self.robot, {})[digest] = protocol_id
+            self._write_all(data)
+
+    def retain(self, protocol_ids: set[str]) -> None:
+        """Forget protocols the robot no longer has."""
+        with self._lock:
+            data = self._read_all()
+            entries = data.get(self.robot, {})
+            kept = {digest: pid for digest, pid in entries.items() if pid in protocol_ids}
+            if kept != entries:
+                data[self.robot] = kept
+                self._write_all(data)
@@ -0,0 +1,180 @@
+"""
+Progress of a protocol run on an OT-2.
+
+RunMonitor polls the run over the driver's keep-alive session. It polls every
+MIN_POLL_INTERVAL while commands are moving and backs off to MAX_POLL_INTERVAL
+while nothing changes, e.g. during long incubations or a pause. Commands are
+read from /runs/{id}/commands with a cursor at the first command that hadn't
+finished at the previous poll, so each poll only fetches what changed.
+
+The total number of commands comes from the protocol's analysis, so the
+progress and ETA are estimates for protocols that branch at run time.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+import requests
+
+MIN_POLL_INTERVAL = 0.5
+MAX_POLL_INTERVAL = 5.0
+BACKOFF = 1.5
+COMMANDS_PAGE_LENGTH = 200
+
+SUCCEEDED_STATUSES = {"succeeded"}
+FAILED_STATUSES = {"stopped", "failed", "blocked-by-open-door"}
+FINISHED_COMMAND_STATUSES = {"succeeded", "failed"}
+
+
+@dataclass
+class RunProgress:
+    run_id: str
+    status: str
+    completed_commands: int
+    total_commands: Optional[int] = None
+    current_command: Optional[str] = None
+    eta_seconds: Optional[float] = None
+
+    def __str__(self) -> str:
+        text = f"Run {self.run_id} {self.status}: {self.completed_commands}"
+        if self.total_commands:
+            text += f"/{self.total_commands} commands"
+        else:
+            text += " commands"
+        if self.current_command:
+            text += f", {self.current_command}"
+        if self.eta_seconds is not None:
+            text += f", about {self.eta_seconds:.0f}s left"
+        return text
+
+
+ProgressCallback = Callable[[RunProgress], None]
+
+
+def describe_command(command: dict[str, Any]) -> str:
+    command_type = str(command.get("commandType", "command"))
+    params = command.get("params") or {}
+    if "message" in params:
+        return f"{command_type}: {params['message']}"
+    details = [str(params[key]) for key in ("volume", "wellName", "seconds") if key in params]
+    return f"{command_type} {' '.join(details)}".strip()
+
+
+class RunMonitor:
+    def __init__(
+        self,
+        session: requests.Session,
+        base_url: str,
+        run_id: str,
+        total_commands: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> None:
+        self.session = session
+        self.base_url = base_url
+        self.run_id = run_id
+        self.total_commands = total_commands
+        self.on_progress = on_progress
+        # Commands before the cursor have finished
+        self.cursor = 0
+        self.commands: list[dict[str, Any]] = []
+        self.progress: Optional[RunProgress] = None
+        self._started: Optional[float] = None
+        self._completed_at_start = 0
+
+    def _get(self, path: str, **params: Any) -> dict[str, Any]:
+        response = self.session.get(url=f"{self.base_url}{path}", params=params or None, timeout=30)
+        if not response.ok:
+            # A RequestException, so wait() retries it like a dropped connection
+            raise requests.HTTPError(f"GET {path} failed: {response.text}", response=response)
+        data: dict[str, Any] = response.json()
+        return data
+
+    def _fetch_commands(self) -> bool:
+        """Fetch commands from the cursor on. Returns whether any changed."""
+        changed = False
+        page_cursor = self.cursor
+        while True:
+            page = self._get(
+                f"/runs/{self.run_id}/commands", cursor=page_cursor, pageLength=COMMANDS_PAGE_LENGTH
+            )
+            fetched = page.get("data", [])
+            start = page.get("meta", {}).get("cursor", page_cursor)
+            # The next page starts after this one, whether or not its commands finished
+            page_cursor = start + len(fetched)
+            for offset, command in enumerate(fetched):
+                index = start + offset
+                if index < len(self.commands):
+                    if self.commands[index].get("status") != command.get("status"):
+                        changed = True
+                    self.commands[index] = command
+                else:
+                    self.commands.append(command)
+                    changed = True
+            while (
+                self.cursor < len(self.commands)
+                and self.commands[self.cursor].get("status") in FINISHED_COMMAND_STATUSES
+            ):
+                self.cursor += 1
+            total_length = page.get("meta", {}).get("totalLength", 0)
+            if len(fetched) < COMMANDS_PAGE_LENGTH or start + len(fetched) >= total_length:
+                return changed
+
+    def poll(self) -> tuple[RunProgress, bool]:
+        """Fetch the run's state. Returns its progress and whether it changed."""
+        status = self._get(f"/runs/{self.run_id}")["data"]["status"]
+        changed = self._fetch_commands()
+
+        completed = self.cursor
+        current = next(
+            (command for command in self.commands[self.cursor:] if command.get("status") == "running"),
+            None,
+        )
+        now = time.monotonic()
+        if self._started is None:
+            self._started = now
+            self._completed_at_start = completed
+
+        eta = None
+        done_since_start = completed - self._completed_at_start
+        if self.total_commands and done_since_start > 0 and status == "running":
+            remaining = max(self.total_commands - completed, 0)
+            eta = (now - self._started) / done_since_start * remaining
+
+        progress = RunProgress(
+            run_id=self.run_id,
+            status=status,
+            completed_commands=completed,
+            total_commands=self.total_commands,
+            current_command=describe_command(current) if current else None,
+            eta_seconds=eta,
+        )
+        changed = changed or self.progress is None or progress.status != self.progress.status
+        self.progress = progress
+        if changed and self.on_progress is not None:
+            try:
+                self.on_progress(progress)
+            except Exception as e:
+                logging.warning(f"Run progress callback failed: {e}")
+        return progress, changed
+
+    def wait(self, timeout: float = 1800) -> RunProgress:
+        """Wait for the run to succeed. Raises if it stops, fails or takes longer than timeout."""
+        deadline = time.monotonic() + timeout
+        interval = MIN_POLL_INTERVAL
+        while time.monotonic() < deadline:
+            try:
+                progress, changed = self.poll()
+            except requests.RequestException as e:
+                logging.warning(f"Error checking run status: {e}")
+                interval = MAX_POLL_INTERVAL
+            else:
+                if progress.status in SUCCEEDED_STATUSES:
+                    logging.info(f"Run {self.run_id} completed successfully")
+                    return progress
+                if progress.status in FAILED_STATUSES:
+                    raise Exception(f"Run {self.run_id} failed with status: {progress.status}")
+                interval = MIN_POLL_INTERVAL if changed else min(interval * BACKOFF, MAX_POLL_INTERVAL)
+            time.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+        raise TimeoutError(f"Run {self.run_id} did not complete within {timeout} seconds")
@@ -1,12 +1,12 @@
 import logging
-import os
-import tempfile
+from typing import Any
 
 from tools.base_server import ToolServer, serve
 from tools.grpc_interfaces.opentrons2_pb2 import Command, Config
 from google.protobuf import json_format
 from tools.app_config import Config as AppConfig 
-from .driver import Ot2Driver
+from .driver import DataFilesUnsupported, Ot2Driver
+from .protocol_cache import stable_protocol
 import argparse
 import json 
 
@@ -26,13 +26,11 @@ class Opentrons2Server(ToolServer):
         # self.driver = Ot2Driver(robot_ip=config.robot_ip, robot_port=config.robot_port)
         # self.driver.ping()
 
-    def _create_executable_script(self, script_content: str, variables: dict) -> str:
+    def _parse_variables(self, variables: dict) -> dict[str, Any]:
         """
-        Create an executable script by injecting variables at the top of the script.
+        Variable values by name, parsed according to their type.
         """
-        # Create the variables definition section
-        variables_section = "# Injected variables\n"
-        
+        values: dict[str, Any] = {}
         for key, var_data in variables.items():
             # Extract the actual variable name and value from the variable data structure
             if isinstance(var_data, dict) and 'name' in var_data and 'value' in var_data:
@@ -44,77 +42,73 @@ class Opentrons2Server(ToolServer):
                 if var_type == 'array':
                     # Parse JSON array string
                     try:
-                        parsed_value = json.loads(raw_value)
-                        variables_section += f'{var_name} = {repr(parsed_value)}\n'
+                        values[var_name] = json.loads(raw_value)
                     except json.JSONDecodeError:
                         logging.warning(f"Failed to parse array variable {var_name}: {raw_value}")
-                        variables_section += f'{var_name} = []\n'
+                        values[var_name] = []
                         
                 elif var_type == 'boolean':
                     # Parse boolean string
-                    bool_value = raw_value.lower() in ('true', '1', 'yes', 'on')
-                    variables_section += f'{var_name} = {bool_value}\n'
+                    values[var_name] = raw_value.lower() in ('true', '1', 'yes', 'on')
                     
                 elif var_type == 'number':
                     # Parse number string
                     try:
                         if '.' in str(raw_value):
-                            parsed_value = float(raw_value)
+                            values[var_name] = float(raw_value)
                         else:
-                            parsed_value = int(raw_value)
-                        variables_section += f'{var_name} = {parsed_value}\n'
+                            values[var_name] = int(raw_value)
                     except (ValueError, TypeError):
                         logging.warning(f"Failed to parse number variable {var_name}: {raw_value}")
-                        variables_section += f'{var_name} = 0\n'
+                        values[var_name] = 0
                         
-                elif var_type == 'string':
-                    variables_section += f'{var_name} = "{raw_value}"\n'
-                    
                 else:
-                    # Fallback for unknown types
-                    variables_section += f'{var_name} = "{raw_value}"\n'
+                    # Strings and unknown types
+                    values[var_name] = str(raw_value)
                     
             else:
                 # Handle case where key is the variable name and var_data is the direct value
-                var_name = str(key)
-                if isinstance(var_data, str):
-                    variables_section += f'{var_name} = "{var_data}"\n'
-                elif isinstance(var_data, (list, dict)):
-                    variables_section += f'{var_name} = {repr(var_data)}\n'
-                else:
-                    variables_section += f'{var_name} = {var_data}\n'
-        
+                values[str(key)] = var_data
+        return values
+
+    def _inject_variables(self, script_content: str, values: dict[str, Any]) -> str:
+        """
+        The script with variables defined at its top.
+        """
+        variables_section = "# Injected variables\n"
+        for var_name, value in values.items():
+            variables_section += f'{var_name} = {repr(value)}\n'
         variables_section += "\n# End injected variables\n\n"
-        
-        # Combine variables with the script content
-        processed_script = variables_section + script_content
-        
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(mode="w", delete=False, suffix=".py") as f:
-            f.write(processed_script)
-            logging.info(f"Created executable script: {f.name}")
-            return f.name
+        return variables_section + script_content
 
     def RunProgram(self, params: Command.RunProgram) -> None:
         """
         Execute a Python script with variables passed directly in the request.
+
+        When the script allows it, the variables are sent as a runtime parameter
+        file so the protocol text, and with it the robot's copy, is reused across
+        runs. Otherwise they are injected into the script.
         """
         script_content = params.script_content
         variables_dict = json_format.MessageToDict(params.variables) if params.variables else {}
         logging.info(f"Running program with {len(variables_dict)} variables")
         try:
-            # Process the script and create executable file with injected variables
-            executable_script = self._create_executable_script(script_content, variables_dict)
-            
+            values = self._parse_variables(variables_dict)
+            stable = None
+            # Without variables the script text is already the same every run
+            if values and self.driver.supports_data_files is not False:
+                stable = stable_protocol(script_content, list(values))
+            if stable is not None:
+                try:
+                    self.driver.run_protocol(stable, variables=values)
+                    return
+                except DataFilesUnsupported:
+                    logging.info("Robot doesn't support runtime parameter files, injecting variables")
+
             # Execute the script on the OT-2
-            self.driver.start_protocol(protocol_file=executable_script)
-            
-            # Cleanup temporary file
-            try:
-                os.unlink(executable_script)
-                logging.info(f"Cleaned up temporary script: {executable_script}")
-            except OSError as e:
-                logging.warning(f"Could not delete temporary file {executable_script}: {e}")
+            if values:
+                script_content = self._inject_variables(script_content, values)
+            self.driver.run_protocol(script_content)
                 
         except Exception as e:
             logging.error(f"Error running program: {e}")
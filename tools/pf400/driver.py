@@ -1,11 +1,15 @@
+from contextlib import contextmanager
 from dataclasses import dataclass
 import logging
 from enum import Enum
-from typing import Optional, List
+from typing import Callable, Iterator, Optional, List
 from tools.pf400.tcp_ip import Pf400TcpIp
 from tools.base_server import ABCToolDriver
 import time 
 
+# The TCS command server keeps motion profiles 1 to 20
+MAX_PROFILE_ID = 20
+
 class RobotError(Enum):
     """Error codes for the PF400 robot"""
     NO_ROBOT = -1009
@@ -47,19 +51,107 @@ class Location:
         values = [float(x) for x in loc_string.split()]
         return cls(values)
 
+@dataclass
+class QueuedMove:
+    """A move held back by the motion queue until the next command is known"""
+    commands: Callable[[int], List[str]]  # Commands sending the move with a profile id
+    profile_id: int
+    target: Optional[str] = None  # Location name, moves between different ones may blend
+    blendable: bool = False
+
+class MotionQueue:
+    """
+    Streams moves to the controller, which runs them one after the other,
+    instead of waiting for the end of each move before sending the next.
+    The latest move is held until the next command arrives. The held move is
+    sent with its blending profile only when it passes through a location:
+    the move before it and the move after it both target other locations.
+    The first and last moves at a location, such as the descent into a nest
+    and the retreat out of it, always settle.
+    """
+    def __init__(self, communicator: "RobotCommunicator", blend_profiles: dict[int, int]):
+        self.communicator = communicator
+        # Profile id -> id of the same profile with inrange -1
+        self.blend_profiles = blend_profiles
+        self.held: Optional[QueuedMove] = None
+        # Target of the last move sent, None when it isn't known
+        self.previous_target: Optional[str] = None
+        self.in_motion = False
+
+    def _send(self, move: QueuedMove, profile_id: int) -> None:
+        self.previous_target = None
+        for response in self.communicator.send_motion(move.commands(profile_id)):
+            if response.split(" ")[0] != "0":
+                raise Exception(f"Robot returned {response} for queued move")
+        self.in_motion = True
+        self.previous_target = move.target
+
+    def add(self, move: QueuedMove) -> None:
+        held, self.held = self.held, None
+        if held is None:
+            self.held = move
+            return
+        profile_id = held.profile_id
+        if (
+            held.blendable and move.blendable
+            and held.target is not None and move.target is not None
+            and self.previous_target is not None
+            and held.target != move.target and held.target != self.previous_target
+        ):
+            profile_id = self.blend_profiles.get(profile_id, profile_id)
+        self._send(held, profile_id)
+        # Only held once the move before it went out, so a failed send can't leave it queued
+        self.held = move
+
+    def sync(self) -> None:
+        """Send the held move and wait for the arm to stop"""
+        held, self.held = self.held, None
+        if held is not None:
+            self._send(held, held.profile_id)
+        if self.in_motion:
+            self.in_motion = False
+            self.communicator.wait_for_completion()
+
+    def abort(self) -> None:
+        """Drop the held move and wait for the moves already sent"""
+        self.held = None
+        self.previous_target = None
+        if self.in_motion:
+            self.in_motion = False
+            try:
+                self.communicator.wait_for_completion()
+            except Exception as e:
+                logging.warning(f"Error waiting for queued moves: {e}")
+
 class RobotCommunicator:
     """Handles communication with the robot"""
     def __init__(self, tcp_ip: Pf400TcpIp):
         self.tcp_ip = tcp_ip
+        self.motion_queue: Optional[MotionQueue] = None
 
     def send_command(self, command: str, expected: Optional[str] = None, 
                     timeout: int = 10) -> str:
         """Send command and get response"""
+        if self.motion_queue is not None and not self.tcp_ip.reconnecting:
+            # Anything but a move has to wait for the arm to get where it's going.
+            # Not while reconnecting, the held move would go out before the one
+            # whose send is reconnecting.
+            self.motion_queue.sync()
         if expected:
             self.tcp_ip.write_and_expect(command, expected)
             return expected
         return self.tcp_ip.write_and_read(command, timeout=timeout)
 
+    def send_commands(self, commands: List[str], timeout: int = 10) -> List[str]:
+        """Send commands that don't move the arm together and get their responses in order"""
+        if self.motion_queue is not None and not self.tcp_ip.reconnecting:
+            self.motion_queue.sync()
+        return self.tcp_ip.pipeline(commands, timeout=timeout)
+
+    def send_motion(self, commands: List[str], timeout: int = 10) -> List[str]:
+        """Send the commands of a move without waiting for moves in progress"""
+        return [self.tcp_ip.write_and_read(command, timeout=timeout) for command in commands]
+
     def wait_for_completion(self) -> None:
         """Wait for end of movement signal"""
         self.tcp_ip.wait_for_eom()
@@ -84,7 +176,15 @@ class MovementController:
         self.state = state
         self.config = config 
 
-    def move_joints(self, location: Location, profile_id: int) -> None:
+    def _move(self, move: QueuedMove) -> None:
+        if self.communicator.motion_queue is not None:
+            self.communicator.motion_queue.add(move)
+            return
+        for command in move.commands(move.profile_id):
+            self.communicator.send_command(command)
+        self.communicator.wait_for_completion()
+
+    def move_joints(self, location: Location, profile_id: int, target: Optional[str] = None) -> None:
         """Move robot using joint coordinates"""
         loc_values = location.values
         if self.state.gripper_axis_override_value is not None:
@@ -92,24 +192,30 @@ class MovementController:
         if self.config.joints == 5:
             loc_values = loc_values[:5]
         loc_string = Location(loc_values).to_string()
-        if self.config.gpl_version == "v1":
-            self.communicator.send_command(f"profidx {profile_id}")
-            self.communicator.send_command(f"movej {loc_string}")
-        elif self.config.gpl_version == "v2":
-            self.communicator.send_command(f"movej {profile_id} {loc_string}")
-        self.communicator.wait_for_completion()
 
-    def move_cartesian(self, location: Location, motion_profile: int = 1) -> None:
+        def commands(profile: int) -> List[str]:
+            if self.config.gpl_version == "v1":
+                return [f"profidx {profile}", f"movej {loc_string}"]
+            elif self.config.gpl_version == "v2":
+                return [f"movej {profile} {loc_string}"]
+            return []
+
+        # GPL v1 sets the profile for the moves after this one too, so only v2 blends
+        self._move(QueuedMove(commands, profile_id, target, blendable=self.config.gpl_version == "v2"))
+
+    def move_cartesian(self, location: Location, motion_profile: int = 1, target: Optional[str] = None) -> None:
         """Move robot using Cartesian coordinates"""
         loc_values = location.values
         if self.config.joints == 5:
             loc_values = loc_values[:5]
         loc_string = Location(loc_values).to_string()
-        if self.config.gpl_version == "v1":
-            self.communicator.send_command(f"movec {loc_string}")
-        else:
-            self.communicator.send_command(f"movec {motion_profile} {loc_string}")
-        self.communicator.wait_for_completion()
+
+        def commands(profile: int) -> List[str]:
+            if self.config.gpl_version == "v1":
+                return [f"movec {loc_string}"]
+            return [f"movec {profile} {loc_string}"]
+
+        self._move(QueuedMove(commands, motion_profile, target, blendable=self.config.gpl_version != "v1"))
 
     def jog(self, axis: Axis, distance: float) -> None:
         """Jog robot along specified axis"""
@@ -291,12 +397,14 @@ class Pf400Driver(ABCToolDriver):
         self.gripper: Optional[GripperController] = None
         self.initializer: Optional[RobotInitializer] = None
         self.movement: Optional[MovementController] = None
+        # Profile id -> id of its blending copy, see register_blend_profiles
+        self.blend_profiles: dict[int, int] = {}
         
     def initialize(self) -> None:
         """Initialize connection to robot"""
         try:
             # Establish new connection
-            self.tcp_ip = Pf400TcpIp(self.config.tcp_host, self.config.tcp_port)
+            self.tcp_ip = Pf400TcpIp(self.config.tcp_host, self.config.tcp_port, on_reconnect=self._reattach)
             self.communicator = RobotCommunicator(tcp_ip=self.tcp_ip)
             self.gripper = GripperController(
                 communicator=self.communicator,
@@ -324,6 +432,11 @@ class Pf400Driver(ABCToolDriver):
             self.movement = None
             raise
 
+    def _reattach(self) -> None:
+        """Attach the robot again on a new connection, attachment is per connection"""
+        if self.initializer is not None:
+            self.initializer._ensure_robot_attached()
+
     def close(self) -> None:
         """Close connection to robot"""
         try:
@@ -337,17 +450,42 @@ class Pf400Driver(ABCToolDriver):
             self.tcp_ip = None
 
     # Movement commands
-    def movej(self, loc_string: str, motion_profile: int = 1) -> None:
+    def movej(self, loc_string: str, motion_profile: int = 1, target: Optional[str] = None) -> None:
         """Move in joint space"""
         if self.movement is None:
             raise RuntimeError("Robot not initialized")
-        self.movement.move_joints(Location.from_string(loc_string), motion_profile)
+        self.movement.move_joints(Location.from_string(loc_string), motion_profile, target)
 
-    def movec(self, loc_string: str, motion_profile: int = 1) -> None:
+    def movec(self, loc_string: str, motion_profile: int = 1, target: Optional[str] = None) -> None:
         """Move in Cartesian space"""
         if self.movement is None:
             raise RuntimeError("Robot not initialized")
-        self.movement.move_cartesian(Location.from_string(loc_string), motion_profile)
+        self.movement.move_cartesian(Location.from_string(loc_string), motion_profile, target)
+
+    @contextmanager
+    def motion_queue(self, blend: bool = False) -> Iterator[None]:
+        """
+        Stream the moves made inside the block, see MotionQueue. Other commands
+        still wait for the arm to stop first, and the block ends once it has.
+        With blend, moves passing through a location (the target of movej/movec)
+        blend into the next one using the profiles from register_blend_profiles.
+        """
+        if self.communicator is None:
+            raise RuntimeError("Robot not initialized")
+        if self.communicator.motion_queue is not None:
+            # Already streaming
+            yield
+            return
+        queue = MotionQueue(self.communicator, self.blend_profiles if blend else {})
+        self.communicator.motion_queue = queue
+        try:
+            yield
+            queue.sync()
+        except BaseException:
+            queue.abort()
+            raise
+        finally:
+            self.communicator.motion_queue = None
 
     def jog(self, axis: str, distance: float) -> None:
         """Jog along specified axis"""
@@ -413,8 +551,7 @@ class Pf400Driver(ABCToolDriver):
         if self.communicator is None:
             raise RuntimeError("Robot not initialized")
         logging.info(f"Setting profile to index {profile_index}")
-        self.communicator.send_command(f"profidx {profile_index}")
-        profile_current = self.communicator.send_command("profidx")
+        _, profile_current = self.communicator.send_commands([f"profidx {profile_index}", "profidx"])
         logging.info(f"Profile current {profile_current}")
 
     def wherec(self) -> str:
@@ -431,6 +568,30 @@ class Pf400Driver(ABCToolDriver):
         logging.info(f"Registering motion profile {profile}...")
         self.communicator.send_command(f"profile {profile}")
 
+    def register_motion_profiles(self, profiles: List[str]) -> None:
+        """Register motion profiles, sending them all before waiting for the responses"""
+        if self.communicator is None:
+            raise RuntimeError("Robot not initialized")
+        logging.info(f"Registering {len(profiles)} motion profiles...")
+        responses = self.communicator.send_commands([f"profile {profile}" for profile in profiles])
+        for profile, response in zip(profiles, responses):
+            if response.split(" ")[0] != "0":
+                logging.warning(f"Robot returned {response} for profile {profile}")
+
+    def register_blend_profiles(self, profiles: dict[int, str]) -> None:
+        """
+        Register copies of motion profiles to blend streamed moves with, by the
+        id of the profile they copy. Each copy must have inrange -1.
+        """
+        self.blend_profiles = {}
+        blend_profiles = {profile_id: int(profile.split(" ")[0]) for profile_id, profile in profiles.items()}
+        too_high = sorted(blend_id for blend_id in blend_profiles.values() if blend_id > MAX_PROFILE_ID)
+        if too_high:
+            raise ValueError(f"Blend profile ids {too_high} are above the robot's limit of {MAX_PROFILE_ID}")
+        self.register_motion_profiles(list(profiles.values()))
+        self.blend_profiles = blend_profiles
+        logging.info(f"Blend profiles: {', '.join(f'{a} -> {b}' for a, b in blend_profiles.items())}")
+
     def set_sys_speed(self, speed:int) ->  None:
         if self.communicator is None:
             raise RuntimeError("Robot not initialized")
@@ -0,0 +1,210 @@
+"""
+Duration estimates for PF400 commands.
+
+Each move is timed as a trapezoidal velocity profile: the axis speeds up at
+the profile's acceleration to its speed, cruises, and slows down at its
+deceleration, or speeds up and slows down without cruising when the move is
+short. The accel/decel ramps round off the corners and add half their time.
+- A joint move takes as long as its slowest joint.
+- A Cartesian move takes as long as the slower of its straight-line travel
+  (at speed) and its yaw rotation (at speed2).
+Profile percentages apply to the nominal axis limits below.
+
+The nominal limits are rough. Calibration keeps, per command type, a moving
+average of actual/estimated duration, and estimates are multiplied by it.
+Calibration is saved per robot in DATA_DIR/pf400_durations.json, in the
+background every SAVE_EVERY samples or SAVE_INTERVAL seconds, and at exit.
+"""
+
+import atexit
+import json
+import logging
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import appdirs  # type: ignore
+
+from tools.pf400.waypoints_models import MotionProfile
+
+APP_NAME = "galago"
+APP_AUTHOR = "sciencecorp"
+CALIBRATION_FILE = Path(appdirs.user_data_dir(APP_NAME, APP_AUTHOR)) / "pf400_durations.json"
+
+# Nominal limits at 100%: z, shoulder, elbow, wrist, gripper, rail in mm/s or degrees/s.
+# Reaching full speed takes 1 / ACCEL_FACTOR seconds at 100% acceleration.
+JOINT_MAX_SPEED = (400.0, 200.0, 300.0, 600.0, 100.0, 1000.0)
+CARTESIAN_MAX_SPEED = 1200.0  # mm/s
+ROTATION_MAX_SPEED = 600.0  # degrees/s
+ACCEL_FACTOR = 4.0
+# The gripper axis follows the grip override rather than the waypoints
+MOVE_JOINTS = (0, 1, 2, 3, 5)
+
+MOVE_OVERHEAD = 0.1  # Seconds to send a move and settle
+UNKNOWN_MOVE_SECONDS = 2.0  # When the start of a move isn't known
+GRIPPER_SECONDS = 0.5
+GRIPPER_TRAVEL = 10.0  # mm the gripper opens or closes around a plate
+
+CALIBRATION_ALPHA = 0.2
+CALIBRATION_RANGE = (0.25, 4.0)
+SAVE_EVERY = 20  # Samples
+SAVE_INTERVAL = 60.0  # Seconds
+
+DEFAULT_PROFILE = MotionProfile(
+    id=1,
+    name="default",
+    speed=85,
+    speed2=80,
+    acceleration=60,
+    deceleration=60,
+    accel_ramp=0.1,
+    decel_ramp=0.1,
+    inrange=0,
+    straight=0,
+)
+
+Pose = list[float]
+
+
+def trapezoid_time(distance: float, speed: float, accel: float, decel: float) -> float:
+    """Seconds to travel `distance` from standstill to standstill."""
+    if distance <= 0:
+        return 0.0
+    if speed <= 0 or accel <= 0 or decel <= 0:
+        return math.inf
+    ramp_distance = speed * speed / (2 * accel) + speed * speed / (2 * decel)
+    if distance >= ramp_distance:
+        return distance / speed + speed / (2 * accel) + speed / (2 * decel)
+    # Triangular: the move ends before reaching full speed
+    peak = math.sqrt(2 * distance * accel * decel / (accel + decel))
+    return peak / accel + peak / decel
+
+
+def _axis_time(distance: float, max_speed: float, speed_pct: float, profile: MotionProfile) -> float:
+    max_accel = max_speed * ACCEL_FACTOR
+    return trapezoid_time(
+        distance,
+        max_speed * speed_pct / 100,
+        max_accel * profile.acceleration / 100,
+        max_accel * profile.deceleration / 100,
+    )
+
+
+def move_seconds(
+    start: Optional[Pose],
+    end: Pose,
+    location_type: str = "j",
+    profile: Optional[MotionProfile] = None,
+) -> float:
+    """Estimated seconds of a move from `start`, in the same space as `end`."""
+    if start is None:
+        return UNKNOWN_MOVE_SECONDS
+    profile = profile or DEFAULT_PROFILE
+    if location_type == "c":
+        linear = math.dist(start[:3], end[:3])
+        rotation = abs(end[3] - start[3]) if len(start) > 3 and len(end) > 3 else 0.0
+        travel = max(
+            _axis_time(linear, CARTESIAN_MAX_SPEED, profile.speed, profile),
+            _axis_time(rotation, ROTATION_MAX_SPEED, profile.speed2, profile),
+        )
+    else:
+        travel = max(
+            (
+                _axis_time(abs(end[i] - start[i]), JOINT_MAX_SPEED[i], profile.speed, profile)
+                for i in MOVE_JOINTS
+                if i < len(start) and i < len(end)
+            ),
+            default=0.0,
+        )
+    if travel == 0:
+        return MOVE_OVERHEAD
+    return travel + (profile.accel_ramp + profile.decel_ramp) / 2 + MOVE_OVERHEAD
+
+
+def gripper_seconds(speed_pct: float) -> float:
+    """Estimated seconds to grasp or release a plate."""
+    speed = JOINT_MAX_SPEED[4] * max(speed_pct, 1) / 100
+    return GRIPPER_SECONDS + GRIPPER_TRAVEL / speed
+
+
+class DurationCalibration:
+    """Ratio of actual to estimated durations per command type, for one robot."""
+
+    def __init__(self, robot: str, path: Path = CALIBRATION_FILE) -> None:
+        self.robot = robot
+        self.path = path
+        self._lock = threading.Lock()
+        # Held while writing, so saves don't overlap
+        self._save_lock = threading.Lock()
+        self._ratios: Optional[dict[str, float]] = None
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+        self._saving = False
+        atexit.register(self.flush)
+
+    def _load(self) -> dict[str, float]:
+        if self._ratios is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._ratios = dict(json.load(f).get(self.robot, {}))
+            except (OSError, ValueError, AttributeError):
+                self._ratios = {}
+        return self._ratios
+
+    def ratio(self, kind: str) -> float:
+        with self._lock:
+            return self._load().get(kind, 1.0)
+
+    def apply(self, kind: str, estimated: float) -> float:
+        return estimated * self.ratio(kind)
+
+    def record(self, kind: str, estimated: float, actual: float) -> None:
+        """Fold a measured duration into the ratio for its command type. Saved later, see flush."""
+        if estimated <= 0 or actual <= 0:
+            return
+        low, high = CALIBRATION_RANGE
+        observed = min(max(actual / estimated, low), high)
+        with self._lock:
+            ratios = self._load()
+            previous = ratios.get(kind)
+            ratios[kind] = observed if previous is None else previous + CALIBRATION_ALPHA * (observed - previous)
+            logging.debug(f"{kind} took {actual:.1f}s, estimated {estimated:.1f}s, ratio now {ratios[kind]:.2f}")
+            self._unsaved += 1
+            due = self._unsaved >= SAVE_EVERY or time.monotonic() - self._last_save >= SAVE_INTERVAL
+            if not due or self._saving:
+                return
+            self._saving = True
+        threading.Thread(target=self.flush, daemon=True, name="pf400-calibration").start()
+
+    def flush(self) -> None:
+        """Save the ratios if they changed since the last save."""
+        with self._save_lock:
+            with self._lock:
+                self._saving = False
+                if not self._unsaved or self._ratios is None:
+                    return
+                ratios = dict(self._ratios)
+                self._unsaved = 0
+                self._last_save = time.monotonic()
+            self._save(ratios)
+
+    def _save(self, ratios: dict[str, float]) -> None:
+        try:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if not isinstance(data, dict):
+                    data = {}
+            except (OSError, ValueError):
+                data = {}
+            data[self.robot] = ratios
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logging.warning(f"Failed to save PF400 duration calibration: {e}")
@@ -0,0 +1,160 @@
+"""
+Route planning for PF400 transfers between nests.
+
+Without a planner a transfer always unwinds the arm between the nests. The
+planner searches a graph whose nodes are the retreat pose above the source,
+the approach pose above the destination, the transit waypoints (locations
+named "transit...") and the unwind poses, and returns the fastest route.
+Unwinding folds the arm where it is, keeping its z and rail, so each node the
+route can unwind from has an unwind pose of its own.
+
+There is no model of the workcell, so which moves are safe is decided
+conservatively from the joints:
+- Unwinding from any node, and moving on from the unwind pose, is always
+  allowed. That is what transfers have always done.
+- Any other move is allowed when it leaves the rail alone and swings the
+  shoulder, elbow and wrist by at most max_swing degrees each.
+
+Transit waypoints let an operator mark safe ways around the workcell that
+stay within that limit.
+
+Only joint ("j") locations can be planned. Transfers involving Cartesian
+locations keep the unwind.
+"""
+
+import heapq
+import logging
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from tools.pf400.waypoints_models import Location
+
+UNWIND_NAME = "unwind"
+TRANSIT_PREFIX = "transit"
+MAX_SWING = 90.0  # Degrees
+
+# Joint indexes: z, shoulder, elbow, wrist, gripper, rail
+Z, SHOULDER, ELBOW, WRIST, GRIPPER, RAIL = range(6)
+ARM_JOINTS = (SHOULDER, ELBOW, WRIST)
+
+# Nominal speeds for comparing routes, in mm/s and degrees/s
+Z_SPEED = 300.0
+JOINT_SPEED = 120.0
+RAIL_SPEED = 400.0
+
+Pose = list[float]
+LegTime = Callable[[Pose, Pose], float]
+
+
+def nominal_leg_time(start: Pose, end: Pose) -> float:
+    """Seconds of a joint move, set by the joint that has the furthest to go."""
+    times = [abs(end[Z] - start[Z]) / Z_SPEED]
+    times += [abs(end[i] - start[i]) / JOINT_SPEED for i in ARM_JOINTS]
+    if len(start) > RAIL and len(end) > RAIL:
+        times.append(abs(end[RAIL] - start[RAIL]) / RAIL_SPEED)
+    return max(times)
+
+
+@dataclass
+class PlannedRoute:
+    waypoints: list[str]  # Names from the source to the destination
+    poses: list[Pose]
+    estimated_seconds: float
+
+    @property
+    def via(self) -> list[tuple[str, Pose]]:
+        """Waypoints between the source and the destination"""
+        return list(zip(self.waypoints[1:-1], self.poses[1:-1]))
+
+    @property
+    def unwinds(self) -> bool:
+        return UNWIND_NAME in self.waypoints
+
+    def to_dict(self) -> dict:
+        return {
+            "path": self.waypoints,
+            "estimated_seconds": round(self.estimated_seconds, 2),
+            "unwind": self.unwinds,
+        }
+
+
+class TransferPlanner:
+    def __init__(
+        self,
+        locations: list[Location],
+        max_swing: float = MAX_SWING,
+        leg_time: LegTime = nominal_leg_time,
+    ) -> None:
+        self.max_swing = max_swing
+        self.leg_time = leg_time
+        self.unwind = next((loc for loc in locations if loc.name.lower() == UNWIND_NAME), None)
+        self.transits = [
+            loc for loc in locations
+            if loc.name.lower().startswith(TRANSIT_PREFIX) and loc.location_type == "j"
+        ]
+
+    def is_safe(self, start: Pose, end: Pose) -> bool:
+        if len(start) > RAIL and len(end) > RAIL and start[RAIL] != end[RAIL]:
+            return False
+        return all(abs(end[i] - start[i]) <= self.max_swing for i in ARM_JOINTS)
+
+    def unwind_pose(self, start: Pose) -> Optional[Pose]:
+        """The unwind the server makes from `start`: its arm joints folded, the rest kept"""
+        if self.unwind is None:
+            return None
+        pose = list(start)
+        for i in ARM_JOINTS:
+            pose[i] = self.unwind.coordinates.vec[i]
+        return pose
+
+    def plan(self, source: str, start: Pose, destination: str, goal: Pose) -> Optional[PlannedRoute]:
+        """
+        Fastest route from the retreat pose above the source to the approach
+        pose above the destination, or None if there is no safe one.
+        """
+        names = [source, destination] + [loc.name for loc in self.transits]
+        poses = [start, goal] + [loc.coordinates.vec for loc in self.transits]
+        # Unwind node -> the node it unwinds from
+        unwound_from: dict[int, int] = {}
+        for i in [0] + list(range(2, len(poses))):
+            unwind = self.unwind_pose(poses[i])
+            if unwind is not None:
+                unwound_from[len(poses)] = i
+                names.append(UNWIND_NAME)
+                poses.append(unwind)
+
+        def allowed(a: int, b: int) -> bool:
+            if b in unwound_from:
+                return unwound_from[b] == a
+            return a in unwound_from or self.is_safe(poses[a], poses[b])
+
+        # Dijkstra, the graph is small and complete
+        best = {0: 0.0}
+        previous: dict[int, int] = {}
+        queue = [(0.0, 0)]
+        done: set[int] = set()
+        while queue:
+            cost, node = heapq.heappop(queue)
+            if node in done:
+                continue
+            done.add(node)
+            if node == 1:
+                break
+            for other in range(len(poses)):
+                if other in done or not allowed(node, other):
+                    continue
+                new_cost = cost + self.leg_time(poses[node], poses[other])
+                if new_cost < best.get(other, float("inf")):
+                    best[other] = new_cost
+                    previous[other] = node
+                    heapq.heappush(queue, (new_cost, other))
+        if 1 not in done:
+            return None
+
+        route = [1]
+        while route[-1] != 0:
+            route.append(previous[route[-1]])
+        route.reverse()
+        planned = PlannedRoute([names[i] for i in route], [poses[i] for i in route], best[1])
+        logging.info(f"Planned route {' -> '.join(planned.waypoints)}, about {planned.estimated_seconds:.1f}s")
+        return planned
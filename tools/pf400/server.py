@@ -3,10 +3,15 @@ from tools.base_server import ToolServer, serve
 from tools.grpc_interfaces.pf400_pb2 import Command, Config
 from .driver import Pf400Driver
 import argparse
+import math
+import time
+from contextlib import nullcontext
 from typing import Optional, Union 
 from tools.grpc_interfaces.tool_base_pb2 import ExecuteCommandReply, SUCCESS, ERROR_FROM_TOOL
 from google.protobuf.struct_pb2 import Struct
 import logging
+from tools.pf400.duration_model import DurationCalibration, gripper_seconds, move_seconds
+from tools.pf400.planner import PlannedRoute, TransferPlanner, UNWIND_NAME
 from tools.pf400.waypoints_models import (
     Waypoints,
     MotionProfiles,
@@ -69,6 +74,11 @@ DEFAULT_PLATE_HANDLING_PARAMS : dict[str, dict[str, Union[Command.GraspPlate, Co
     }
 }
 
+# Sequences run with the gripper axis override they need, see _run_phases
+Phases = list[tuple[Optional[float], list[message.Message]]]
+# Location type ("j" or "c") and coordinates
+Pose = tuple[str, list[float]]
+
 class Pf400Server(ToolServer):
     toolType = "pf400"
 
@@ -82,6 +92,10 @@ class Pf400Server(ToolServer):
         self.motion_profiles : MotionProfiles
         self.grips : Grips
         self.plate_handling_params : dict[str, dict[str, Union[Command.GraspPlate, Command.ReleasePlate]]] = {}
+        self.planner: Optional[TransferPlanner] = None
+        self.duration_calibration: Optional[DurationCalibration] = None
+        # Location type and pose of the last move sent, for estimating the next
+        self._last_pose: Optional[Pose] = None
 
     def _configure(self, request: Config) -> None:
         self.config = request
@@ -95,6 +109,10 @@ class Pf400Server(ToolServer):
 
         )
         self.driver.initialize()
+        if self.duration_calibration is not None:
+            self.duration_calibration.flush()
+        self.duration_calibration = DurationCalibration(f"{request.host}:{request.port}")
+        self._last_pose = None
 
     def _getGrip(self, grip_name:str) -> Grip:
         grip = next((x for x in self.grips.grip_params if x.name.lower() == grip_name.lower()), None)
@@ -142,6 +160,7 @@ class Pf400Server(ToolServer):
             locations_list = waypoints_dictionary.get("locations", [])
             self.waypoints = Waypoints.parse_obj({"locations": locations_list})
             logging.info(f"Loaded {len(self.waypoints.locations)} locations")
+            self.planner = TransferPlanner(self.waypoints.locations)
 
             #Load grips
             grips_list = waypoints_dictionary.get("grip_params")
@@ -173,29 +192,29 @@ class Pf400Server(ToolServer):
             logging.info(f"Loaded {len(motion_profiles.profiles)} motion profiles")
   
             if motion_profiles_list and len(motion_profiles_list) > 0:
-                for motion_profile in motion_profiles.profiles:
-                    logging.info(f"Registering motion profile {motion_profile.name}")
-                    try:
-                        profile_no_name = motion_profile.copy(deep=True)
-                        profile_no_name.name = ""
-                        self.driver.register_motion_profile(str(motion_profile))
-                    except Exception as e:
-                        logging.error(f"Error registering motion profile {motion_profile.name}: {e}")
-                        raise Exception(f"Error registering motion profile {motion_profile.name}: {e}")
+                profiles_to_register = motion_profiles.profiles
             else:
                 #Register default motion profiles
                 logging.info("No motion profiles loaded. Using default profiles.")
-                for motion_profile in DEFAULT_MOTION_PROFILES:
-                    logging.info(f"Registering default motion profiles {motion_profile.name}")
-                    try:
-                        #Remove name from the profile 
-                        profile_no_name = motion_profile.copy(deep=True)
-                        profile_no_name.name = ""
-                        logging.info(profile_no_name)
-                        self.driver.register_motion_profile(str(motion_profile))
-                    except Exception as e:
-                        logging.error(f"Error registering motion profile {motion_profile.name}: {e}")
-                        raise Exception(f"Error registering motion profile {motion_profile.name}: {e}")
+                profiles_to_register = DEFAULT_MOTION_PROFILES
+            logging.info(f"Registering motion profiles {', '.join(p.name for p in profiles_to_register)}")
+            try:
+                # Sent together, the robot answers them in order
+                self.driver.register_motion_profiles([str(p) for p in profiles_to_register])
+            except Exception as e:
+                logging.error(f"Error registering motion profiles: {e}")
+                raise Exception(f"Error registering motion profiles: {e}")
+            if self.config.blend_moves and self.config.gpl_version == "v2":
+                # Copies that don't stop at their target, after the highest id taken above
+                offset = max(p.id for p in profiles_to_register)
+                blend_profiles = {
+                    p.id: str(p.copy(update={"id": p.id + offset, "inrange": -1}))
+                    for p in profiles_to_register
+                }
+                try:
+                    self.driver.register_blend_profiles(blend_profiles)
+                except ValueError as e:
+                    logging.error(f"Moves won't blend: {e}")
                 
             # #Load Sequences 
             sequences_list = waypoints_dictionary.get("sequences")
@@ -225,16 +244,39 @@ class Pf400Server(ToolServer):
         else:
             new_loc = f"{current_loc_array[1]} {waypoint_loc.vec[1]} {waypoint_loc.vec[2]} {waypoint_loc.vec[3]} {current_loc_array[5]} {current_loc_array[6]}"
         self.driver.movej(new_loc,  motion_profile=1)
+        self._last_pose = ("j", [float(v) for v in new_loc.split(" ")])
 
     def Unwind(self,params: Command.Unwind) -> None:
         self._unwind()
 
     def Release(self, params: Command.Release) -> None:
         self.driver.safe_free()
+        # The arm can be moved by hand now
+        self._last_pose = None
 
     def Engage(self, params: Command.Engage) -> None:
         self.driver.unfree()
 
+    def _motion_queue(self) -> t.ContextManager[None]:
+        """Streams the moves made in the block unless disabled in the config, see Pf400Driver.motion_queue"""
+        if self.config.disable_motion_queue:
+            return nullcontext()
+        return self.driver.motion_queue(blend=self.config.blend_moves)
+
+    def _target(self, loc: Location, approach_height: float = 0) -> Coordinate:
+        """Coordinates of a location raised by an approach height"""
+        loc_type = loc.location_type
+        if loc_type == "c":
+            string_offset =  f"0 0 {approach_height} 0 0 0"
+            if self.config.joints == 5:
+                string_offset = " ".join(string_offset.split(" ")[:-1])
+        #For now we only handle a z offset for joints
+        elif loc_type == "j":
+            string_offset = f"{approach_height} 0 0 0 0 0"
+        else:
+            raise Exception("Invalid location type")
+        return loc.coordinates + Coordinate(string_offset)
+
     def moveTo(
         self,
         loc: Location,
@@ -243,22 +285,17 @@ class Pf400Server(ToolServer):
     ) -> None:
         if self.driver is None:
             return
-        loc_type = loc.location_type
-        if loc_type == "c":
-            string_offset =  f"0 0 {approach_height} 0 0 0"
-            if self.config.joints == 5:
-                string_offset = " ".join(string_offset.split(" ")[:-1])
+        target = self._target(loc, approach_height)
+        if loc.location_type == "c":
             self.driver.movec(
-                str(loc.coordinates + Coordinate(string_offset)),
+                str(target),
                 motion_profile=motion_profile_id,
+                target=loc.name,
             )
-        #For now we only handle a z offset for joints
-        elif loc_type == "j":
-            string_offset = f"{approach_height} 0 0 0 0 0"
-            self.driver.movej(str(loc.coordinates + Coordinate(string_offset)), 
-                                motion_profile=motion_profile_id)
         else:
-            raise Exception("Invalid location type")
+            self.driver.movej(str(target), 
+                                motion_profile=motion_profile_id, target=loc.name)
+        self._last_pose = (loc.location_type, target.vec)
         
     def Move(self, params: Command.Move) -> None:
         """Execute a move command with the given coordinate and motion profile."""
@@ -274,6 +311,12 @@ class Pf400Server(ToolServer):
     def ReleasePlate(self, params: Command.ReleasePlate) -> None:
         self.driver.releaseplate(params.width, params.speed)
 
+    def _run_phases(self, phases: Phases) -> None:
+        for gripper_override, sequence in phases:
+            self.driver.state.gripper_axis_override_value = gripper_override
+            self.runSequence(sequence)
+        self.driver.state.gripper_axis_override_value = None
+
     def retrieve_plate(
         self,
         source_nest: str,
@@ -283,6 +326,19 @@ class Pf400Server(ToolServer):
         grip_width: int = 0,
         labware_name: str = "",
     ) -> None:
+        phases = self._retrieve_plate_phases(source_nest, grasp_params, approach_height, motion_profile, grip_width, labware_name)
+        with self._motion_queue():
+            self._run_phases(phases)
+
+    def _retrieve_plate_phases(
+        self,
+        source_nest: str,
+        grasp_params: Optional[Command.GraspPlate] = None,
+        approach_height: float = 0,
+        motion_profile: str = "default",
+        grip_width: int = 0,
+        labware_name: str = "",
+    ) -> Phases:
         source_location = self._getLocation(source_nest)
         if not source_location:
             raise Exception(f"Location '{source_nest}' not found")
@@ -327,10 +383,7 @@ class Pf400Server(ToolServer):
             grasp,  # Grasp the plate
             Command.Move(location=source_location.name, motion_profile=motion_profile, approach_height=approach_height)
         ])
-        self.driver.state.gripper_axis_override_value = open_grip_width
-        self.runSequence(pre_grip_sequence)
-        self.driver.state.gripper_axis_override_value = None
-        self.runSequence(retrieve_sequence)
+        return [(open_grip_width, pre_grip_sequence), (None, retrieve_sequence)]
 
     def dropoff_plate(
         self,
@@ -340,6 +393,18 @@ class Pf400Server(ToolServer):
         motion_profile: str = "default",
         labware_name: str = "",
     ) -> None:
+        phases = self._dropoff_plate_phases(destination_nest, release_params, approach_height, motion_profile, labware_name)
+        with self._motion_queue():
+            self._run_phases(phases)
+
+    def _dropoff_plate_phases(
+        self,
+        destination_nest: str,
+        release_params: Optional[Command.ReleasePlate] = None,
+        approach_height: float = 0,
+        motion_profile: str = "default",
+        labware_name: str = "",
+    ) -> Phases:
         dest_location = self._getLocation(destination_nest)
         if not dest_location:
             raise Exception(f"Location '{destination_nest}' not found")
@@ -373,10 +438,7 @@ class Pf400Server(ToolServer):
 
         post_dropoff_sequence.append(Command.Move(location=dest_location.name, motion_profile=motion_profile, approach_height=int(approach_height))) #Move to the approach offset
 
-        self.runSequence(dropoff_sequence)
-        self.driver.state.gripper_axis_override_value = self._getGrip(dest_location.orientation).width + 10
-        self.runSequence(post_dropoff_sequence)
-        self.driver.state.gripper_axis_override_value = None
+        return [(None, dropoff_sequence), (self._getGrip(dest_location.orientation).width + 10, post_dropoff_sequence)]
 
     def RetrievePlate(self, params: Command.RetrievePlate) -> None:
         self.retrieve_plate(source_nest=params.location, motion_profile=params.motion_profile, approach_height=params.approach_height, labware_name=params.labware)
@@ -389,21 +451,59 @@ class Pf400Server(ToolServer):
         if not self.driver:
             raise Exception("Driver not initialized")
         self.driver.jog(params.axis, params.distance)
+        self._last_pose = None
+
+    def _plan_transfer(self, source_nest: str, destination_nest: str) -> Optional[PlannedRoute]:
+        """Route between the approach poses of two nests, None if they can't be planned"""
+        if self.planner is None:
+            return None
+        source = self._getLocation(source_nest)
+        destination = self._getLocation(destination_nest)
+        if source is None or destination is None or "c" in (source.location_type, destination.location_type):
+            return None
+        # Transfers retreat and approach 5mm above the nests
+        start = (source.coordinates + Coordinate("5 0 0 0 0 0")).vec
+        goal = (destination.coordinates + Coordinate("5 0 0 0 0 0")).vec
+        return self.planner.plan(source.name, start, destination.name, goal)
+
+    def _follow_route(self, route: PlannedRoute, motion_profile_id: int) -> None:
+        """Move through the waypoints between the nests of a planned route"""
+        gripper: Optional[str] = None
+        for name, pose in route.via:
+            if name == UNWIND_NAME:
+                self._unwind()
+                continue
+            if gripper is None:
+                # Keep the gripper as it is while carrying the plate
+                gripper = self.driver.wherej().split(" ")[5]
+            via = [str(v) for v in pose]
+            via[4] = gripper
+            self.driver.movej(" ".join(via), motion_profile=motion_profile_id, target=name)
+            self._last_pose = ("j", pose)
 
     def Transfer(self, params: Command.Transfer) -> None:
-        self.retrieve_plate(
-            source_nest=params.source_nest,
-            motion_profile = params.motion_profile,
-            approach_height=5,
-            labware_name=params.labware
-        )
-        self._unwind()
-        self.dropoff_plate(
-            destination_nest=params.destination_nest,
-            motion_profile=params.motion_profile,
-            approach_height=5,
-            labware_name=params.labware
-        )
+        route = None
+        if self.config.plan_transfers:
+            route = self._plan_transfer(params.source_nest, params.destination_nest)
+            if route is None:
+                logging.info("Transfer can't be planned, unwinding")
+        with self._motion_queue():
+            self.retrieve_plate(
+                source_nest=params.source_nest,
+                motion_profile = params.motion_profile,
+                approach_height=5,
+                labware_name=params.labware
+            )
+            if route is None:
+                self._unwind()
+            else:
+                self._follow_route(route, self._getProfileId(params.motion_profile))
+            self.dropoff_plate(
+                destination_nest=params.destination_nest,
+                motion_profile=params.motion_profile,
+                approach_height=5,
+                labware_name=params.labware
+            )
 
 
     def _pick_lid(
@@ -414,6 +514,16 @@ class Pf400Server(ToolServer):
         approach_height: float = 0,
         motion_profile: str = "default",
     ) -> None:
+        self._run_phases(self._pick_lid_phases(location_name, labware_name, pick_from_plate, approach_height, motion_profile))
+
+    def _pick_lid_phases(
+        self,
+        location_name: str,
+        labware_name: str,
+        pick_from_plate: bool = False,
+        approach_height: float = 0,
+        motion_profile: str = "default",
+    ) -> Phases:
         location: Optional[Location] = self._getLocation(location_name)
         if not location:
             raise Exception(f"Location '{location_name}' not found")
@@ -450,12 +560,9 @@ class Pf400Server(ToolServer):
         pre_pick_sequence: t.List[message.Message] = []
         pick_sequence: t.List[message.Message] = []
         
-        # Configure gripper width
+        # Configure gripper width, overridden while approaching
         open_grip_width = self._getGrip(location.orientation).width + 10
         
-        # Set gripper override
-        self.driver.state.gripper_axis_override_value = open_grip_width
-        
         pre_pick_sequence.append(adjust_gripper)
         pre_pick_sequence.append(Command.Move(location=location.name, motion_profile=motion_profile, 
                                             approach_height=int(labware.height + approach_height)))
@@ -469,10 +576,7 @@ class Pf400Server(ToolServer):
         ])
         
         
-        # Execute sequences
-        self.runSequence(pre_pick_sequence)
-        self.driver.state.gripper_axis_override_value = None
-        self.runSequence(pick_sequence)
+        return [(open_grip_width, pre_pick_sequence), (None, pick_sequence)]
 
 
     def PickLid(self, params: Command.PickLid) -> None:
@@ -493,6 +597,16 @@ class Pf400Server(ToolServer):
         approach_height: float = 0,
         motion_profile: str = "default",
     ) -> None:
+        self._run_phases(self._place_lid_phases(location_name, labware_name, place_on_plate, approach_height, motion_profile))
+
+    def _place_lid_phases(
+        self,
+        location_name: str,
+        labware_name: str,
+        place_on_plate: bool = False,
+        approach_height: float = 0,
+        motion_profile: str = "default",
+    ) -> Phases:
         # Get location
         location: Optional[Location] = self._getLocation(location_name)
         if not location:
@@ -532,12 +646,8 @@ class Pf400Server(ToolServer):
         post_place_sequence.append(Command.Move(location=location.name, motion_profile=motion_profile, 
                                             approach_height=int(labware.height + approach_height)))
 
-        self.runSequence(place_lid_sequence)
         open_grip_width = self._getGrip(location.orientation).width + 10
-        self.driver.state.gripper_axis_override_value = open_grip_width
-        self.runSequence(post_place_sequence)
-        
-        self.driver.state.gripper_axis_override_value = None
+        return [(None, place_lid_sequence), (open_grip_width, post_place_sequence)]
         
     def PlaceLid(self, params: Command.PlaceLid) -> None:
         """Place lid handler that delegates to the _place_lid implementation"""
@@ -571,6 +681,25 @@ class Pf400Server(ToolServer):
             response.error_message = str(e)
             return response
 
+    def PlanTransfer(self, params: Command.PlanTransfer) -> ExecuteCommandReply:
+        """Report the route and estimated time of a transfer between two nests"""
+        response = ExecuteCommandReply()
+        response.return_reply = True
+        response.response = SUCCESS
+        try:
+            route = self._plan_transfer(params.source_nest, params.destination_nest)
+            if route is None:
+                raise Exception(f"No route planned from {params.source_nest} to {params.destination_nest}")
+            meta = Struct()
+            meta.update(route.to_dict())
+            response.meta_data.CopyFrom(meta)
+            return response
+        except Exception as e:
+            logging.error(f"Error planning transfer: {e}")
+            response.response = ERROR_FROM_TOOL
+            response.error_message = str(e)
+            return response
+
     def command_instance_from_name(self, command_name: str) -> Union[message.Message, t.Any]:
         command_descriptors = Command.DESCRIPTOR.fields_by_name
         command_dictionary = dict()
@@ -582,6 +711,11 @@ class Pf400Server(ToolServer):
         return command_dictionary[command_name]
 
     def RunSequence(self, params: Command.RunSequence) -> None:
+        commandSequence = self._sequence_commands(params)
+        with self._motion_queue():
+            self.runSequence(commandSequence)
+
+    def _sequence_commands(self, params: Command.RunSequence) -> list[message.Message]:
         commandSequence : list[message.Message] = list()
         sequence = self._getSequence(params.sequence_name)
         logging.info(f"Sequence has {len(sequence.commands)} commands")
@@ -601,43 +735,178 @@ class Pf400Server(ToolServer):
             except Exception as e:
                 logging.error(f"Error parsing command {command_name} with params {command_params}: {e}")
                 raise Exception(f"Error parsing command {command_name} with params {command_params}: {e}")
-        self.runSequence(commandSequence)
-
-    def estimateRelease(self, params: Command.Release) -> int:
+        return commandSequence
+
+    def _streaming(self) -> bool:
+        driver = getattr(self, "driver", None)
+        communicator = driver.communicator if driver is not None else None
+        return communicator is not None and communicator.motion_queue is not None
+
+    def _dispatchCommand(self, command: message.Message) -> ExecuteCommandReply:
+        """Dispatch a command, calibrating its estimate against how long it took"""
+        estimate = None
+        # Streamed moves return before the arm gets there, so only the command streaming them is timed
+        if not self.simulated and self.duration_calibration is not None and not self._streaming():
+            try:
+                estimate = self._model_estimate(command, self._last_pose)
+            except Exception:
+                estimate = None
+        start = time.monotonic()
+        reply = super()._dispatchCommand(command)
+        if estimate is not None and self.duration_calibration is not None and reply.response == SUCCESS:
+            try:
+                self.duration_calibration.record(command.__class__.__name__, estimate[0], time.monotonic() - start)
+            except Exception as e:
+                # Calibration must never fail the command
+                logging.warning(f"Failed to record duration of {command.__class__.__name__}: {e}")
+        return reply
+
+    def _getProfile(self, profile_name: str) -> Optional[MotionProfile]:
+        motion_profiles: Optional[MotionProfiles] = getattr(self, "motion_profiles", None)
+        if motion_profiles is None:
+            return None
+        profile_id = self._getProfileId(profile_name)
+        return next((p for p in motion_profiles.profiles if p.id == profile_id), None)
+
+    def _estimate_move(self, location_name: str, approach_height: float, motion_profile: str, pose: Optional[Pose]) -> tuple[float, Pose]:
+        location = self._getLocation(location_name)
+        if location is None:
+            raise Exception(f"Location '{location_name}' not found")
+        end = self._target(location, approach_height).vec
+        start = pose[1] if pose is not None and pose[0] == location.location_type else None
+        return move_seconds(start, end, location.location_type, self._getProfile(motion_profile)), (location.location_type, end)
+
+    def _estimate_unwind(self, pose: Optional[Pose]) -> tuple[float, Optional[Pose]]:
+        if pose is None or pose[0] != "j" or self.planner is None:
+            return move_seconds(None, []), None
+        unwound = self.planner.unwind_pose(pose[1])
+        if unwound is None:
+            raise KeyError("Unwind location not found")
+        return move_seconds(pose[1], unwound, "j", self._getProfile("default")), ("j", unwound)
+
+    def _model_estimate(self, command: message.Message, pose: Optional[Pose]) -> Optional[tuple[float, Optional[Pose]]]:
+        """
+        Seconds a command would take from `pose` and the pose it ends in, or
+        None for commands that aren't modeled. Commands made of others are
+        expanded into the sequences they run.
+        """
+        commands: list[message.Message]
+        if isinstance(command, Command.Move):
+            return self._estimate_move(command.location, command.approach_height, command.motion_profile, pose)
+        if isinstance(command, (Command.GraspPlate, Command.ReleasePlate)):
+            return gripper_seconds(command.speed), pose
+        if isinstance(command, Command.Unwind):
+            return self._estimate_unwind(pose)
+        if isinstance(command, Command.RetrievePlate):
+            commands = self._phase_commands(self._retrieve_plate_phases(
+                command.location, motion_profile=command.motion_profile,
+                approach_height=command.approach_height, labware_name=command.labware))
+        elif isinstance(command, Command.DropOffPlate):
+            commands = self._phase_commands(self._dropoff_plate_phases(
+                command.location, motion_profile=command.motion_profile,
+                approach_height=command.approach_height, labware_name=command.labware))
+        elif isinstance(command, Command.PickLid):
+            commands = self._phase_commands(self._pick_lid_phases(
+                command.location, command.labware, command.pick_from_plate,
+                command.approach_height, command.motion_profile))
+        elif isinstance(command, Command.PlaceLid):
+            commands = self._phase_commands(self._place_lid_phases(
+                command.location, command.labware, command.place_on_plate,
+                command.approach_height, command.motion_profile))
+        elif isinstance(command, Command.Transfer):
+            return self._estimate_transfer(command, pose)
+        elif isinstance(command, Command.RunSequence):
+            commands = self._sequence_commands(command)
+        else:
+            return None
+
+        seconds = 0.0
+        for inner in commands:
+            estimate = self._model_estimate(inner, pose)
+            if estimate is not None:
+                seconds += estimate[0]
+                pose = estimate[1]
+        return seconds, pose
+
+    def _phase_commands(self, phases: Phases) -> list[message.Message]:
+        return [command for _, sequence in phases for command in sequence]
+
+    def _estimate_transfer(self, params: Command.Transfer, pose: Optional[Pose]) -> tuple[float, Optional[Pose]]:
+        retrieve = Command.RetrievePlate(location=params.source_nest, motion_profile=params.motion_profile,
+                                         approach_height=5, labware=params.labware)
+        dropoff = Command.DropOffPlate(location=params.destination_nest, motion_profile=params.motion_profile,
+                                       approach_height=5, labware=params.labware)
+        retrieved = self._model_estimate(retrieve, pose)
+        assert retrieved is not None
+        seconds, pose = retrieved
+        route = self._plan_transfer(params.source_nest, params.destination_nest) if self.config.plan_transfers else None
+        if route is None:
+            unwind_seconds, pose = self._estimate_unwind(pose)
+            seconds += unwind_seconds
+        else:
+            profile = self._getProfile(params.motion_profile)
+            for start, end in zip(route.poses, route.poses[1:-1]):
+                seconds += move_seconds(start, end, "j", profile)
+            pose = ("j", route.poses[-2]) if len(route.poses) > 2 else pose
+        dropped = self._model_estimate(dropoff, pose)
+        assert dropped is not None
+        return seconds + dropped[0], dropped[1]
+
+    def _estimate(self, command: message.Message) -> int:
+        """Estimated whole seconds of a command, 1 if it can't be estimated"""
+        try:
+            estimate = self._model_estimate(command, self._last_pose)
+        except Exception as e:
+            logging.debug(f"Could not estimate {command.__class__.__name__}: {e}")
+            return 1
+        if estimate is None:
+            return 1
+        seconds = estimate[0]
+        if self.duration_calibration is not None:
+            seconds = self.duration_calibration.apply(command.__class__.__name__, seconds)
+        return max(1, math.ceil(seconds))
+
+    def EstimateRelease(self, params: Command.Release) -> int:
         return 1
 
-    def estimateEngage(self, params: Command.Engage) -> int:
+    def EstimateEngage(self, params: Command.Engage) -> int:
         return 1
 
-    def estimateUnwind(self, params: Command.Unwind) -> int:
-        return 1
+    def EstimateUnwind(self, params: Command.Unwind) -> int:
+        return self._estimate(params)
     
-    def estimateGraspPlate(self, params: Command.GraspPlate) -> int:
-        return 1
+    def EstimateGraspPlate(self, params: Command.GraspPlate) -> int:
+        return self._estimate(params)
 
-    def estimateReleasePlate(self, params: Command.ReleasePlate) -> int:
-        return 1
+    def EstimateReleasePlate(self, params: Command.ReleasePlate) -> int:
+        return self._estimate(params)
 
-    def estimateRunSequence(self, sequence: list[Command]) -> int:
-        return 1
+    def EstimateRunSequence(self, params: Command.RunSequence) -> int:
+        return self._estimate(params)
+
+    def EstimateRetrievePlate(self, params: Command.RetrievePlate) -> int:
+        return self._estimate(params)
+
+    def EstimateDropOffPlate(self, params: Command.DropOffPlate) -> int:
+        return self._estimate(params)
 
     def EstimateGetCurrentLocation(self, params: Command.GetCurrentLocation) -> int:
         return 1
 
     def EstimateMove(self, params: Command.Move) -> int:
-        return 1
+        return self._estimate(params)
     
     def EstimateTransfer(self, params: Command.Transfer) -> int:
-        return 1
+        return self._estimate(params)
     
     def EstimateJog(self, params: Command.Jog) -> int:
         return 1
 
     def EstimatePickLid(self, params: Command.PickLid) -> int:
-        return 1
+        return self._estimate(params)
     
     def EstimatePlaceLid(self, params: Command.PlaceLid) -> int:
-        return 1
+        return self._estimate(params)
 
     def EstimateLoadWaypoints(self, params: Command.LoadWaypoints) -> int:
         return 1 
@@ -645,6 +914,9 @@ class Pf400Server(ToolServer):
     def EstimateLoadLabware(self, params: Command.LoadLabware) -> int:
         return 1
 
+    def EstimatePlanTransfer(self, params: Command.PlanTransfer) -> int:
+        return 1
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG)
     parser = argparse.ArgumentParser()
@@ -1,6 +1,44 @@
-from telnetlib import Telnet
+"""
+TCP transport for the PF400's TCS command server.
+
+Commands are lines ending in "\\n" and every command gets exactly one reply
+line ending in "\\r\\n", in the order the commands were sent. A reader thread
+splits the stream into replies and hands each to the oldest command still
+waiting, so several commands can be in flight at once (see pipeline()).
+
+Each command has its own timeout. A reply that doesn't arrive in time would
+be matched to the next command, so a timeout drops the connection. Dropped
+connections are reopened on the next command, and commands in
+RETRYABLE_COMMANDS, which don't move the arm, are sent again once.
+"""
+
 import logging
-from typing import Union
+import queue
+import socket
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional, Union
+
+CONNECT_TIMEOUT = 5
+CONNECT_ATTEMPTS = 3
+READ_CHUNK = 4096
+
+# Commands that are safe to send again after a dropped connection, and to
+# keep in flight together
+RETRYABLE_COMMANDS = {
+    "mode",
+    "sysState",
+    "wherej",
+    "wherec",
+    "profile",
+    "profidx",
+    "mspeed",
+    "gripopenpos",
+    "gripclosepos",
+    "isfullyclosed",
+}
+
 
 def try_utf_decode(data:Union[str,bytes]) -> str:
     if isinstance(data, str):
@@ -13,42 +51,232 @@ def try_utf_decode(data:Union[str,bytes]) -> str:
     return data_string
 
 
-def telnet_read(conn: Telnet, timeout: int=1) -> str:
-    reply_string = conn.read_until(b"\r\n", timeout=timeout)
-    reply = try_utf_decode(reply_string)
+class ReplyParser:
+    """Splits the bytes received into reply lines."""
+
+    def __init__(self) -> None:
+        self.buffer = b""
+
+    def feed(self, data: bytes) -> list[str]:
+        self.buffer += data
+        *lines, self.buffer = self.buffer.split(b"\r\n")
+        return [try_utf_decode(line) for line in lines]
+
 
-    if len(reply) < 2 or reply[-1] != "\n" or reply[-2] != "\r":
-        raise Exception(f"Received invalid message {reply} from tcp connection.")
+class PendingReply:
+    """Reply to a command that has been sent."""
 
-    logging.info(f"Received {reply[0:-2]}")
+    def __init__(self, command: str, timeout: float, generation: int, forward: bool = False) -> None:
+        self.command = command
+        self.generation = generation
+        self.timeout = timeout
+        # Replies to write() go to read() instead
+        self.forward = forward
+        self.deadline = time.monotonic() + timeout
+        self._done = threading.Event()
+        self._reply: Optional[str] = None
+        self._error: Optional[Exception] = None
+
+    def set(self, reply: str) -> None:
+        self._reply = reply
+        self._done.set()
+
+    def fail(self, error: Exception) -> None:
+        self._error = error
+        self._done.set()
+
+    def wait(self) -> Optional[str]:
+        """The reply, or None if it didn't arrive in time."""
+        if not self._done.wait(max(self.deadline - time.monotonic(), 0)):
+            return None
+        if self._error is not None:
+            raise self._error
+        return self._reply
+
+
+def is_retryable(msg: str) -> bool:
+    return msg.split(" ")[0] in RETRYABLE_COMMANDS
 
-    return reply[0:-2]
 
 class Pf400TcpIp:
-    def __init__(self, tcp_host: str, tcp_port: int) -> None:
-        self.conn = None
+    def __init__(
+        self,
+        tcp_host: str,
+        tcp_port: int,
+        on_reconnect: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.tcp_host = tcp_host
+        self.tcp_port = tcp_port
+        # Restores per-connection state, such as the attached robot, after a reconnect
+        self.on_reconnect = on_reconnect
+        self.conn: Optional[socket.socket] = None
+        self._generation = 0
+        self._closed = False
+        self._connecting = False
+        # Held while sending and reconnecting, so commands go out in the order they are queued
+        self._send_lock = threading.RLock()
+        self._pending_lock = threading.Lock()
+        self._pending: deque[PendingReply] = deque()
+        self._unsolicited: "queue.Queue[str]" = queue.Queue()
+        self.round_trips = 0
         try:
-            self.conn = Telnet(tcp_host, tcp_port, timeout=1)
-            self.write_and_read("mode")
+            self._connect()
         except Exception as e:
             logging.error(f"Failed to establish connection: {e}")
-            if self.conn:
-                try:
-                    self.conn.close()
-                except Exception as close_error:
-                    logging.warning(f"Error closing connection: {close_error}")
-                self.conn = None
+            self._disconnect(e)
             raise
 
+    @property
+    def reconnecting(self) -> bool:
+        """Whether a connection is being set up, including the on_reconnect hook"""
+        return self._connecting
+
+    def _connect(self) -> None:
+        conn = socket.create_connection((self.tcp_host, self.tcp_port), timeout=CONNECT_TIMEOUT)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn.settimeout(None)
+        self.conn = conn
+        self._generation += 1
+        threading.Thread(
+            target=self._read_loop, args=(conn, self._generation), daemon=True, name="pf400-reader"
+        ).start()
+        self._connecting = True
+        try:
+            self.write_and_read("mode")
+        finally:
+            self._connecting = False
+
+    def _reconnect(self) -> None:
+        last_error: Optional[Exception] = None
+        for attempt in range(CONNECT_ATTEMPTS):
+            if attempt:
+                time.sleep(0.5 * 2 ** attempt)
+            try:
+                logging.warning(f"Reconnecting to PF400 at {self.tcp_host}:{self.tcp_port}")
+                self._connect()
+                if self.on_reconnect is not None:
+                    self._connecting = True
+                    try:
+                        self.on_reconnect()
+                    finally:
+                        self._connecting = False
+                return
+            except Exception as e:
+                last_error = e
+                self._disconnect(e)
+        raise ConnectionError(f"Could not reconnect to PF400: {last_error}")
+
+    def _disconnect(self, error: Exception) -> None:
+        """Close the connection and fail the commands waiting on it."""
+        conn, self.conn = self.conn, None
+        self._generation += 1
+        if conn is not None:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+        with self._pending_lock:
+            pending, self._pending = self._pending, deque()
+        for reply in pending:
+            reply.fail(ConnectionError(f"Connection lost before {reply.command} was answered: {error}"))
+
+    def _read_loop(self, conn: socket.socket, generation: int) -> None:
+        parser = ReplyParser()
+        while True:
+            try:
+                data = conn.recv(READ_CHUNK)
+            except OSError as e:
+                data = b""
+                error: Exception = e
+            else:
+                error = ConnectionError("Connection closed by the robot")
+            if not data:
+                with self._send_lock:
+                    if generation == self._generation:
+                        self._disconnect(error)
+                return
+            if generation != self._generation:
+                # Replaced after a timeout, whatever is left belongs to nobody
+                return
+            for line in parser.feed(data):
+                logging.debug(f"Received {line}")
+                with self._pending_lock:
+                    reply = self._pending.popleft() if self._pending else None
+                if reply is None or reply.forward:
+                    self._unsolicited.put(line)
+                if reply is not None:
+                    reply.set(line)
+
+    def send(self, msg: str, timeout: float = 5, forward: bool = False) -> PendingReply:
+        """Send a command without waiting for its reply."""
+        with self._send_lock:
+            if self._closed:
+                raise Exception("No active connection")
+            if self.conn is None:
+                if self._connecting:
+                    raise ConnectionError("Connection lost while connecting")
+                self._reconnect()
+            assert self.conn is not None
+            reply = PendingReply(msg, timeout, self._generation, forward)
+            with self._pending_lock:
+                self._pending.append(reply)
+            logging.debug(f"Sending {msg}")
+            try:
+                self.conn.sendall((msg + "\n").encode("utf-8"))
+            except OSError as e:
+                self._disconnect(e)
+                raise ConnectionError(f"Failed to send {msg}: {e}")
+            self.round_trips += 1
+            return reply
+
+    def _wait(self, reply: PendingReply) -> str:
+        result = reply.wait()
+        if result is None:
+            with self._send_lock:
+                if reply.generation == self._generation:
+                    self._disconnect(TimeoutError(f"{reply.command} timed out"))
+            raise TimeoutError(f"No reply to {reply.command} within {reply.timeout}s")
+        return result
+
+    def request(self, msg: str, timeout: float = 5) -> str:
+        """Send a command and return its reply."""
+        try:
+            return self._wait(self.send(msg, timeout))
+        except ConnectionError as e:
+            if not is_retryable(msg) or self._closed or self._connecting:
+                raise
+            logging.warning(f"Retrying {msg} after {e}")
+            return self._wait(self.send(msg, timeout))
+
+    def pipeline(self, msgs: list[str], timeout: float = 5) -> list[str]:
+        """
+        Send commands back to back and return their replies in order. Only for
+        commands in RETRYABLE_COMMANDS, which are sent again if the connection drops.
+        """
+        for msg in msgs:
+            if not is_retryable(msg):
+                raise ValueError(f"{msg.split(' ')[0]} can't be pipelined")
+        for attempt in range(2):
+            try:
+                with self._send_lock:
+                    replies = [self.send(msg, timeout) for msg in msgs]
+                return [self._wait(reply) for reply in replies]
+            except ConnectionError as e:
+                if attempt or self._closed or self._connecting:
+                    raise
+                logging.warning(f"Retrying {len(msgs)} commands after {e}")
+        raise AssertionError("unreachable")
+
     # PF400 should always return a single line of output, unless you are in "pc" mode.
-    def read(self, timeout: int=5) -> str:
-        if not self.conn:
-            raise Exception("No active connection")
-        return telnet_read(self.conn, timeout)
+    def read(self, timeout: float=5) -> str:
+        """Next reply not taken by request(), e.g. to a write()."""
+        try:
+            return self._unsolicited.get(timeout=timeout)
+        except queue.Empty:
+            raise Exception(f"No message received from tcp connection within {timeout}s")
 
     def read_all(self) -> list[str]:
-        if not self.conn:
-            raise Exception("No active connection")
         messages = []
 
         more = True
@@ -63,34 +291,22 @@ class Pf400TcpIp:
         return messages
 
     def write(self, msg: str) -> None:
-        if not self.conn:
-            raise Exception("No active connection")
-        logging.info(f"Sending {msg}")
-        self.conn.write((msg + "\n").encode("utf-8"))
-
-    def write_and_expect(self, msg: str, expected: str="0", timeout: int=5) -> None:
-        if not self.conn:
-            raise Exception("No active connection")
+        self.send(msg, forward=True)
+
+    def write_and_expect(self, msg: str, expected: str="0", timeout: float=5) -> None:
         command_name = msg.split(" ")[0]
 
-        self.write(msg)
-        result = self.read(timeout)
+        result = self.request(msg, timeout)
 
         if result != expected:
             raise Exception(f"Robot returned {result} for {command_name}. Expected {expected}")
 
     # Does NOT validate return value.
-    def write_and_read(self, msg: str, timeout: int=5) -> str:
-        if not self.conn:
-            raise Exception("No active connection")
-        self.write(msg)
-        return self.read(timeout)
+    def write_and_read(self, msg: str, timeout: float=5) -> str:
+        return self.request(msg, timeout)
 
     def wait_for_eom(self) -> None:
-        if not self.conn:
-            raise Exception("No active connection")
-        self.write("waitForEom")
-        result = self.read(timeout=150)
+        result = self.request("waitForEom", timeout=150)
 
         if result != "0":
             raise Exception(f"Robot returned {result} for waitForEom")
@@ -99,7 +315,8 @@ class Pf400TcpIp:
         if self.conn:
             try:
                 self.write_and_read("attach 0")
-                self.conn.close()
             except Exception as e:
                 logging.warning(f"Error closing connection: {e}")
-            self.conn = None
\ No newline at end of file
+        with self._send_lock:
+            self._closed = True
+            self._disconnect(ConnectionError("Connection closed"))
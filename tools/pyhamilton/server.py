@@ -1,11 +1,14 @@
 import logging
+import typing as t
 from tools.base_server import ToolServer, serve
 from tools.grpc_interfaces.pyhamilton_pb2  import Command, Config
 from tools.grpc_interfaces.tool_base_pb2 import ExecuteCommandReply
 import argparse 
 from google.protobuf.struct_pb2 import Struct
 from tools.grpc_interfaces.tool_base_pb2 import  SUCCESS, ERROR_FROM_TOOL
-from tools.toolbox.python_subprocess import run_python_script
+from tools.toolbox.python_subprocess import run_python_file, run_python_script
+from tools.toolbox import script_workers
+from tools.toolbox.script_limits import ScriptLimits
 
 class PyHamiltonServer(ToolServer):
     toolType = "pyhamilton"
@@ -18,16 +21,27 @@ class PyHamiltonServer(ToolServer):
     def _configure(self, request:Config) -> None:
         logging.info("Configuring PyHamilton...")
         self.config = request
+        # Keep an interpreter with pyhamilton imported ready for scripts
+        script_workers.configure(preload=("pyhamilton",))
+        if request.python_exe:
+            script_workers.configure(request.python_exe, preload=("pyhamilton",))
         return
         
         
+    def _script_limits(self, params: t.Any) -> ScriptLimits:
+        """Script limits from the tool config, overridden by the ones set on the command."""
+        config = getattr(self, "config", None)
+        return ScriptLimits.from_message(config, prefix="script_").override(ScriptLimits.from_message(params))
+
     def RunScript(self, params:Command.RunScript) -> ExecuteCommandReply:
         s  = Struct()
         response = ExecuteCommandReply()
         response.return_reply = True
         response.response = SUCCESS
+        limits = self._script_limits(params)
+        s.update({'limits': limits.to_dict()})
         try:
-            result = run_python_script(params.script_content, blocking=True)
+            result = run_python_script(params.script_content, blocking=True, limits=limits, cancelled=self.isCancelled)
             logging.info(f"Script result is {result}")
             if response:
                 s.update({'response':result})
@@ -38,6 +52,7 @@ class PyHamiltonServer(ToolServer):
             logging.exception(exc)
             response.response = ERROR_FROM_TOOL
             response.error_message = str(exc)
+            response.meta_data.CopyFrom(s)
         return response
 
     def RunLocalScript(self, params:Command.RunLocalScript) -> ExecuteCommandReply:
@@ -45,6 +60,8 @@ class PyHamiltonServer(ToolServer):
         response = ExecuteCommandReply()
         response.return_reply = True
         response.response = SUCCESS
+        limits = self._script_limits(params)
+        s.update({'limits': limits.to_dict()})
         try:
             if not params.path:
                 raise ValueError("Path to script must be provided...")
@@ -53,7 +70,7 @@ class PyHamiltonServer(ToolServer):
             if self.config and self.config.python_exe:
                 python_exe = self.config.python_exe
                 logging.info(f"Using python executable from config: {python_exe}")
-            result = run_python_script(f"exec(open(r'''{params.path}''').read())", blocking=True, python_exe=python_exe)
+            result = run_python_file(params.path, blocking=True, python_exe=python_exe, limits=limits, cancelled=self.isCancelled)
             logging.info(f"Script result is {result}")
             if response:
                 s.update({'response':result})
@@ -64,6 +81,7 @@ class PyHamiltonServer(ToolServer):
             logging.exception(exc)
             response.response = ERROR_FROM_TOOL
             response.error_message = str(exc)
+            response.meta_data.CopyFrom(s)
         return response
      
              
@@ -0,0 +1,147 @@
+"""
+Per-tool ("slim") variants of tool_base.proto.
+
+tool_base.proto imports every instrument's proto so that Command and Config can
+carry any tool's messages. A tool server only ever needs its own, so the build
+also generates, for each tool, a tool_base_pb2 compiled from a copy of
+tool_base.proto with the other tools' imports and oneof fields removed. Field
+numbers, message names and the proto file name are unchanged, so the slim
+module is wire-compatible with the full one and tool_driver_pb2 resolves
+against it as usual; commands for other tools simply parse as unknown fields
+and are rejected with WRONG_TOOL like before.
+
+A tool process loads its slim module through SlimProtoFinder, which base_server
+installs before importing any generated code. The tool is taken from the
+GALAGO_PROTO_TOOL environment variable, or from the running module when
+started as `python -m tools.<tool>.server`. Set GALAGO_FULL_PROTOS=1 to always
+load the full descriptors.
+"""
+
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import types
+from typing import Optional, Sequence
+
+TOOL_BASE_MODULE = "tools.grpc_interfaces.tool_base_pb2"
+TOOL_BASE_PROTO = os.path.join("tools", "grpc_interfaces", "tool_base.proto")
+SLIM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "grpc_interfaces", "slim")
+
+_IMPORT_RE = re.compile(r'^\s*import\s+"tools/grpc_interfaces/(\w+)\.proto"\s*;')
+_ONEOF_FIELD_RE = re.compile(r"^\s*tools\.grpc_interfaces\.(\w+)\.(?:Command|Config)\s+\w+\s*=\s*\d+\s*;")
+_SERVER_MODULE_RE = re.compile(r"^tools\.(\w+)\.server$")
+
+
+def slim_module_path(tool: str) -> str:
+    return os.path.join(SLIM_DIR, f"{tool}_tool_base_pb2.py")
+
+
+def slim_tool_base_source(tool_base_source: str, tool: str) -> str:
+    """Strip every other tool's import and oneof field from tool_base.proto."""
+    lines = []
+    for line in tool_base_source.splitlines():
+        match = _IMPORT_RE.match(line) or _ONEOF_FIELD_RE.match(line)
+        if match and match.group(1) != tool:
+            continue
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def tools_in_tool_base(tool_base_source: str) -> list[str]:
+    tools = []
+    for line in tool_base_source.splitlines():
+        match = _IMPORT_RE.match(line)
+        if match:
+            tools.append(match.group(1))
+    return tools
+
+
+def build_slim_protos(proto_src: str, output_dir: Optional[str] = None) -> list[str]:
+    """
+    Compile a slim tool_base_pb2 for every tool referenced by tool_base.proto.
+
+    Args:
+        proto_src: Root of the proto tree (the `interfaces` folder)
+        output_dir: Where to write <tool>_tool_base_pb2.py, defaults to SLIM_DIR
+
+    Returns:
+        Paths of the generated modules
+    """
+    output_dir = output_dir or SLIM_DIR
+    with open(os.path.join(proto_src, TOOL_BASE_PROTO), "r") as f:
+        tool_base_source = f.read()
+
+    os.makedirs(output_dir, exist_ok=True)
+    generated = []
+    for tool in tools_in_tool_base(tool_base_source):
+        with tempfile.TemporaryDirectory() as work_dir:
+            slim_src = os.path.join(work_dir, "src")
+            slim_out = os.path.join(work_dir, "out")
+            os.makedirs(os.path.join(slim_src, "tools", "grpc_interfaces"))
+            os.makedirs(slim_out)
+            slim_proto = os.path.join(slim_src, TOOL_BASE_PROTO)
+            with open(slim_proto, "w") as f:
+                f.write(slim_tool_base_source(tool_base_source, tool))
+            # The slim copy shadows the real tool_base.proto, the tool's own proto
+            # still comes from proto_src.
+            subprocess.run(
+                [
+                    sys.executable, "-m", "grpc_tools.protoc",
+                    f"-I{slim_src}",
+                    f"-I{proto_src}",
+                    f"--python_out={slim_out}",
+                    slim_proto,
+                ],
+                check=True,
+            )
+            target = os.path.join(output_dir, f"{tool}_tool_base_pb2.py")
+            shutil.move(os.path.join(slim_out, "tools", "grpc_interfaces", "tool_base_pb2.py"), target)
+            generated.append(target)
+    return generated
+
+
+def current_tool() -> Optional[str]:
+    """The tool this process serves, or None if it isn't a tool server."""
+    if os.environ.get("GALAGO_FULL_PROTOS") == "1":
+        return None
+    tool = os.environ.get("GALAGO_PROTO_TOOL")
+    if tool:
+        return tool
+    main_spec = getattr(sys.modules.get("__main__"), "__spec__", None)
+    match = _SERVER_MODULE_RE.match(getattr(main_spec, "name", None) or "")
+    return match.group(1) if match else None
+
+
+class SlimProtoFinder(importlib.abc.MetaPathFinder):
+    """Resolves tool_base_pb2 to the current tool's slim module when one was built."""
+
+    def find_spec(
+        self,
+        fullname: str,
+        path: Optional[Sequence[str]] = None,
+        target: Optional[types.ModuleType] = None,
+    ) -> Optional[importlib.machinery.ModuleSpec]:
+        if fullname != TOOL_BASE_MODULE:
+            return None
+        tool = current_tool()
+        if not tool or not os.path.exists(slim_module_path(tool)):
+            return None
+        return importlib.util.spec_from_file_location(fullname, slim_module_path(tool))
+
+
+def install() -> None:
+    """Install SlimProtoFinder, must run before tool_base_pb2 is first imported."""
+    if not any(isinstance(finder, SlimProtoFinder) for finder in sys.meta_path):
+        sys.meta_path.insert(0, SlimProtoFinder())
+
+
+if __name__ == "__main__":
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for module_path in build_slim_protos(os.path.join(root_dir, "interfaces")):
+        print(f"Generated {module_path}")
@@ -0,0 +1,70 @@
+import json
+import unittest
+from typing import Any
+from unittest import mock
+
+import requests
+
+from tools import app_config
+from tools.app_config import Config, WorkcellConfig, diff_tools
+
+WORKCELL = {
+    "id": 1,
+    "name": "wc_1",
+    "tools": [{"id": 1, "name": "pf400", "type": "pf400", "port": 4000}],
+}
+
+
+def response(status: int, data: Any = None, etag: str = "") -> requests.Response:
+    result = requests.Response()
+    result.status_code = status
+    result._content = json.dumps(data).encode() if data is not None else b""
+    if etag:
+        result.headers["ETag"] = etag
+    return result
+
+
+class TestLoadWorkcellConfig(unittest.TestCase):
+    def setUp(self) -> None:
+        Config._loaded = None
+        self.addCleanup(setattr, Config, "_loaded", None)
+        patcher = mock.patch.object(app_config, "get_selected_workcell", return_value="wc_1")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unchanged_reload_is_a_no_op(self) -> None:
+        with mock.patch.object(app_config.db, "request", return_value=response(200, WORKCELL, '"v1"')):
+            self.assertTrue(Config().load_workcell_config())
+        with mock.patch.object(app_config.db, "request", return_value=response(304)) as request, \
+                mock.patch.object(WorkcellConfig, "parse_obj") as parse_obj:
+            config = Config()
+            self.assertFalse(config.load_workcell_config())
+        self.assertEqual(request.call_args.kwargs["headers"], {"If-None-Match": '"v1"'})
+        parse_obj.assert_not_called()
+        self.assertEqual(config.workcell_config and config.workcell_config.tools[0].port, 4000)
+
+    def test_keeps_last_config_when_api_is_down(self) -> None:
+        with mock.patch.object(app_config.db, "request", return_value=response(200, WORKCELL)):
+            Config().load_workcell_config()
+        config = Config()
+        with mock.patch.object(app_config, "get_selected_workcell", side_effect=requests.ConnectionError()):
+            self.assertFalse(config.load_workcell_config())
+        self.assertEqual(config.workcell_config and config.workcell_config.name, "wc_1")
+
+    def test_diff_tools(self) -> None:
+        old = WorkcellConfig.parse_obj(WORKCELL)
+        new = WorkcellConfig.parse_obj({
+            **WORKCELL,
+            "tools": [
+                {"id": 1, "name": "pf400", "type": "pf400", "port": 4001},
+                {"id": 2, "name": "liconic", "type": "liconic", "port": 4002},
+            ],
+        })
+        added, removed, changed = diff_tools(old, new)
+        self.assertEqual([t.name for t in added], ["liconic"])
+        self.assertEqual(removed, [])
+        self.assertEqual([t.port for t in changed], [4001])
+
+
+if __name__ == "__main__":
+    unittest.main()
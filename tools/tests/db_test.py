@@ -0,0 +1,217 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from typing import Any, Callable, Optional
+from unittest import mock
+
+import requests
+
+from tools.toolbox import db as db_module
+from tools.toolbox import inventory
+from tools.toolbox.async_db import AsyncDb, run_sync
+from tools.toolbox.db import Db
+from tools.toolbox.db_cache import ResponseCache
+
+
+class TestDbApiUrl(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config_file = Path(self.tmp.name) / "api_config.json"
+        patcher = mock.patch.object(db_module, "CONFIG_FILE", self.config_file)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+        Db._api_url_cache = None
+
+    def write_config(self, url: str, mtime: float) -> None:
+        with open(self.config_file, "w") as f:
+            json.dump({"api_url": url}, f)
+        os.utime(self.config_file, (mtime, mtime))
+
+    def test_url_is_reread_only_when_config_changes(self) -> None:
+        self.write_config("http://a:3010/api", 1000)
+        self.assertEqual(Db.get_api_url(), "http://a:3010/api")
+        with mock.patch("builtins.open", side_effect=AssertionError("config re-read")):
+            self.assertEqual(Db.get_api_url(), "http://a:3010/api")
+        self.write_config("http://b:3010/api", 2000)
+        self.assertEqual(Db.get_api_url(), "http://b:3010/api")
+
+    def test_set_api_url_updates_cache(self) -> None:
+        self.assertTrue(Db.set_api_url("http://c:3010/api"))
+        with mock.patch("builtins.open", side_effect=AssertionError("config re-read")):
+            self.assertEqual(Db.get_api_url(), "http://c:3010/api")
+
+    def test_session_is_shared(self) -> None:
+        self.assertIs(Db.session(), Db().session())
+        self.assertIsNot(Db.session(), Db.session(retry=False))
+
+
+def make_response(status: int, body: bytes = b"", headers: Optional[dict] = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    response.headers.update(headers or {})
+    return response
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache = ResponseCache(ttls={"labware": 60, "variables": 0.01})
+        self.sent: list[dict] = []
+
+    def send(self, response: requests.Response) -> Callable[[dict], requests.Response]:
+        def _send(headers: dict) -> requests.Response:
+            self.sent.append(headers)
+            return response
+        return _send
+
+    def test_hit_after_miss(self) -> None:
+        ok = make_response(200, b'{"name": "plate"}')
+        self.assertEqual(self.cache.get("labware/1", self.send(ok)).json(), {"name": "plate"})
+        self.assertEqual(self.cache.get("labware/1", self.send(ok)).json(), {"name": "plate"})
+        self.assertEqual(len(self.sent), 1)
+        self.assertEqual(self.cache.stats()["labware"]["hits"], 1)
+        self.assertEqual(self.cache.stats()["total"]["misses"], 1)
+
+    def test_expired_entry_is_revalidated(self) -> None:
+        ok = make_response(200, b'{"value": 1}', {"ETag": '"v1"'})
+        self.cache.get("variables/x", self.send(ok))
+        time.sleep(0.02)
+        response = self.cache.get("variables/x", self.send(make_response(304)))
+        self.assertEqual(self.sent[-1], {"If-None-Match": '"v1"'})
+        self.assertEqual(response.json(), {"value": 1})
+        self.assertEqual(self.cache.stats()["variables"]["revalidated"], 1)
+
+    def test_invalidate_model(self) -> None:
+        self.cache.get("labware/1", self.send(make_response(200, b"{}")))
+        self.cache.get("labware", self.send(make_response(200, b"[]")))
+        self.cache.invalidate("labware")
+        self.cache.get("labware/1", self.send(make_response(200, b"{}")))
+        self.assertEqual(len(self.sent), 3)
+
+    def test_uncached_models_and_errors(self) -> None:
+        self.assertFalse(self.cache.caches("plates/1"))
+        self.cache.get("labware/2", self.send(make_response(404, b"{}")))
+        self.cache.get("labware/2", self.send(make_response(404, b"{}")))
+        self.assertEqual(len(self.sent), 2)
+
+    def test_db_write_invalidates(self) -> None:
+        Db.enable_cache({"labware": 60})
+        self.addCleanup(Db.disable_cache)
+        session = mock.Mock()
+        session.request.return_value = make_response(200, b'{"id": 1}')
+        with mock.patch.object(Db, "session", return_value=session):
+            Db.get_by_id_or_name(1, "labware")
+            Db.get_by_id_or_name(1, "labware")
+            Db.update_data(1, {"name": "new"}, "labware")
+            Db.get_by_id_or_name(1, "labware")
+        methods = [c.args[0] for c in session.request.call_args_list]
+        self.assertEqual(methods, ["GET", "PUT", "GET"])
+
+
+class TestAsyncDb(unittest.TestCase):
+    def test_fan_out_runs_concurrently(self) -> None:
+        def slow_get(model: str) -> str:
+            time.sleep(0.1)
+            return model
+
+        with mock.patch.object(Db, "get_data", side_effect=slow_get):
+            start = time.monotonic()
+            contents = inventory.get_plates_contents([1, 2, 3, 4])
+            elapsed = time.monotonic() - start
+        self.assertLess(elapsed, 0.4)
+        self.assertEqual(contents[3], {"wells": "wells?plate_id=3", "reagents": "reagents?plate_id=3"})
+
+    def test_concurrency_limit(self) -> None:
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def tracked_get(model: str) -> str:
+            with lock:
+                active.append(model)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.remove(model)
+            return model
+
+        with mock.patch.object(Db, "get_data", side_effect=tracked_get):
+            results = run_sync(AsyncDb(concurrency=2).get_many([f"m{i}" for i in range(6)]))
+        self.assertEqual(results, [f"m{i}" for i in range(6)])
+        self.assertLessEqual(max(peak), 2)
+
+
+class TestBulk(unittest.TestCase):
+    def setUp(self) -> None:
+        Db._bulk_support.clear()
+        self.addCleanup(Db._bulk_support.clear)
+        patcher = mock.patch.multiple(Db, _bulk_routes=None, _bulk_routes_probed=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_falls_back_to_single_requests(self) -> None:
+        def request(method: str, path: str, **kwargs: Any) -> requests.Response:
+            if path == "openapi.json":
+                return make_response(404)
+            if path == "reagents/bulk":
+                return make_response(404)
+            if kwargs["json"]["name"] == "bad":
+                return make_response(422, b'{"detail": "invalid"}')
+            return make_response(200, json.dumps(kwargs["json"]).encode())
+
+        items = [{"name": "water"}, {"name": "bad"}, {"name": "dmso"}]
+        with mock.patch.object(Db, "request", side_effect=request) as patched:
+            results = inventory.create_reagents(items, chunk_size=2)
+        self.assertEqual([r.ok for r in results], [True, False, True])
+        self.assertEqual([r.index for r in results], [0, 1, 2])
+        self.assertEqual(results[2].data, {"name": "dmso"})
+        self.assertEqual((results[1].error or "")[:3], "422")
+        bulk_calls = [c for c in patched.call_args_list if c.args[1] == "reagents/bulk"]
+        self.assertEqual(len(bulk_calls), 1)
+
+    def test_uses_bulk_endpoint_in_chunks(self) -> None:
+        def request(method: str, path: str, **kwargs: Any) -> requests.Response:
+            if path == "openapi.json":
+                return make_response(200, b'{"paths": {"/plates/bulk": {"put": {}}, "/plates/{id}": {"put": {}}}}')
+            return make_response(200, json.dumps([{"id": item["id"]} for item in kwargs["json"]]).encode())
+
+        with mock.patch.object(Db, "request", side_effect=request) as patched:
+            results = inventory.update_plates([(i, {"name": f"p{i}"}) for i in range(5)], chunk_size=2)
+        self.assertEqual([c.args[1] for c in patched.call_args_list], ["openapi.json"] + ["plates/bulk"] * 3)
+        self.assertEqual([r.data for r in results], [{"id": i} for i in range(5)])
+
+    def test_bulk_route_mismatch_is_remembered(self) -> None:
+        def request(method: str, path: str, **kwargs: Any) -> requests.Response:
+            if path == "openapi.json":
+                return make_response(404)
+            if path == "reagents/bulk":
+                # The list was validated as a single record
+                return make_response(422, b'{"detail": [{"loc": ["body"], "msg": "Input should be a valid dictionary"}]}')
+            return make_response(200, json.dumps(kwargs["json"]).encode())
+
+        with mock.patch.object(Db, "request", side_effect=request) as patched:
+            inventory.create_reagents([{"name": "water"}] * 4, chunk_size=2)
+            inventory.create_reagents([{"name": "dmso"}] * 2, chunk_size=2)
+        paths = [c.args[1] for c in patched.call_args_list]
+        self.assertEqual(paths.count("reagents/bulk"), 1)
+        self.assertEqual(paths.count("openapi.json"), 1)
+
+    def test_no_bulk_update_without_schema(self) -> None:
+        def request(method: str, path: str, **kwargs: Any) -> requests.Response:
+            if path == "openapi.json":
+                return make_response(404)
+            return make_response(200, json.dumps(kwargs["json"]).encode())
+
+        with mock.patch.object(Db, "request", side_effect=request) as patched:
+            results = inventory.update_plates([(i, {"name": f"p{i}"}) for i in range(3)])
+        self.assertTrue(all(r.ok for r in results))
+        self.assertNotIn("plates/bulk", [c.args[1] for c in patched.call_args_list])
+
+
+if __name__ == "__main__":
+    unittest.main()
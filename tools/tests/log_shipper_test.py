@@ -0,0 +1,89 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from typing import Any
+from unittest import mock
+
+from tools.toolbox import log_shipper
+from tools.toolbox.db import BulkResult, Db
+
+
+class TestLogShipper(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        data_dir = Path(tmp.name)
+        for name, file_name in (
+            ("SPOOL_FILE", "log_spool.jsonl"),
+            ("REPLAY_FILE", "log_spool.replaying.jsonl"),
+            ("SPOOL_OFFSET_FILE", "log_spool.offset"),
+            ("REPLAY_LOCK_FILE", "log_spool.lock"),
+        ):
+            patcher = mock.patch.object(log_shipper, name, data_dir / file_name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(log_shipper, "DATA_DIR", data_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.api_up = True
+        self.received: list[dict] = []
+        bulk_patcher = mock.patch.object(Db, "bulk_post", side_effect=self.bulk_post)
+        self.bulk_post_mock = bulk_patcher.start()
+        self.addCleanup(bulk_patcher.stop)
+        self.shipper = log_shipper.LogShipper(batch_size=3, flush_interval=0.05)
+
+    def bulk_post(self, items: list[dict], model: str, **kwargs: Any) -> list[BulkResult]:
+        if not self.api_up:
+            return [BulkResult(i, False, error="unreachable") for i in range(len(items))]
+        self.received.extend(items)
+        return [BulkResult(i, True, data=item, status_code=200) for i, item in enumerate(items)]
+
+    def ship(self, *messages: str) -> None:
+        for message in messages:
+            self.shipper.ship({"message": message})
+        self.assertTrue(self.shipper.flush(timeout=5))
+
+    def test_batches_records(self) -> None:
+        self.ship("a", "b", "c", "d")
+        self.assertEqual([r["message"] for r in self.received], ["a", "b", "c", "d"])
+        self.assertLessEqual(self.bulk_post_mock.call_count, 2)
+
+    def test_spools_while_down_and_replays_in_order(self) -> None:
+        self.api_up = False
+        self.ship("a", "b")
+        with open(log_shipper.SPOOL_FILE) as f:
+            self.assertEqual([json.loads(line)["message"] for line in f], ["a", "b"])
+
+        self.api_up = True
+        self.shipper._next_replay = 0
+        self.ship("c", "d")
+        self.assertEqual([r["message"] for r in self.received], ["a", "b", "c", "d"])
+        self.assertFalse(log_shipper.SPOOL_FILE.exists())
+        self.assertFalse(log_shipper.REPLAY_FILE.exists())
+
+    def test_replay_resumes_from_offset(self) -> None:
+        self.api_up = False
+        self.ship("a", "b", "c", "d", "e")
+        self.api_up = True
+        calls = 0
+
+        def fail_second_batch(items: list[dict], model: str, **kwargs: Any) -> list[BulkResult]:
+            nonlocal calls
+            calls += 1
+            if calls == 2:
+                return [BulkResult(i, False) for i in range(len(items))]
+            return self.bulk_post(items, model)
+
+        self.bulk_post_mock.side_effect = fail_second_batch
+        self.shipper._next_replay = 0
+        self.assertFalse(self.shipper._replay_spool())
+        self.bulk_post_mock.side_effect = self.bulk_post
+        self.shipper._next_replay = 0
+        self.assertTrue(self.shipper._replay_spool())
+        self.assertEqual([r["message"] for r in self.received], ["a", "b", "c", "d", "e"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+from tools.log_store import LogStore, parse_log_line, search_entries
+
+
+class TestLogStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.store = LogStore(max_entries=5)
+
+    def test_parse_log_line(self) -> None:
+        self.assertEqual(
+            parse_log_line("2024-01-01 10:00:00 | WARNING | low tips"),
+            ("2024-01-01 10:00:00", "WARNING"),
+        )
+        self.assertEqual(parse_log_line("Traceback (most recent call last):"), ("", None))
+
+    def test_continuation_lines_inherit_level(self) -> None:
+        entries = self.store.add_lines("pf400", [
+            "2024-01-01 10:00:00 | ERROR | Move failed",
+            "Traceback (most recent call last):",
+        ])
+        self.assertEqual([e.level for e in entries], ["ERROR", "ERROR"])
+        self.assertEqual(entries[1].tag, "error")
+
+    def test_store_is_bounded(self) -> None:
+        self.store.add_lines("pf400", [f"t | INFO | line {i}" for i in range(8)])
+        self.assertEqual(len(self.store), 5)
+        self.assertEqual(self.store.filter("ALL")[0].text, "t | INFO | line 3")
+
+    def test_filter_by_level_and_seq(self) -> None:
+        entries = self.store.add_lines("liconic", ["t | INFO | a", "t | ERROR | b", "t | ERROR | c"])
+        self.assertEqual([e.text for e in self.store.filter("ERROR")], ["t | ERROR | b", "t | ERROR | c"])
+        self.assertEqual(len(self.store.filter("ALL", after_seq=entries[1].seq)), 1)
+        self.assertEqual(len(self.store.filter("ALL", limit=2)), 2)
+
+    def test_search_is_case_insensitive(self) -> None:
+        entries = self.store.add_lines("toolbox", ["t | INFO | Plate plate", "t | INFO | none"])
+        self.assertEqual(search_entries(entries, "PLATE"), [(0, 11, 16), (0, 17, 22)])
+        self.assertEqual(search_entries(entries, ""), [])
+
+    def test_search_columns_survive_case_folding(self) -> None:
+        # 'İ'.lower() is two characters long
+        entries = self.store.add_lines("toolbox", ["t | INFO | İstanbul plate"])
+        self.assertEqual(search_entries(entries, "plate"), [(0, 20, 25)])
+        self.assertEqual(entries[0].text[20:25], "plate")
+
+
+if __name__ == "__main__":
+    unittest.main()
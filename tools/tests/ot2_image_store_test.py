@@ -0,0 +1,57 @@
+import io
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from PIL import Image
+
+from tools.opentrons2.image_store import ImageStore, TimeLapse
+
+
+def jpeg() -> bytes:
+    image = Image.new("RGB", (64, 48), "white")
+    image.paste((255, 0, 0), (0, 0, 16, 16))
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=100)
+    return out.getvalue()
+
+
+class TestImageStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.store = ImageStore(self.dir)
+
+    def test_original_is_tagged_and_copies_are_rotated(self) -> None:
+        content = jpeg()
+        path = self.store.save("a.jpg", content, datetime(2026, 1, 2, 3, 4, 5))
+        with open(path, "rb") as f:
+            saved = f.read()
+        # Image data untouched, only the orientation added
+        self.assertTrue(saved.endswith(content[content.index(b"\xff\xdb"):]))
+        with Image.open(path) as image:
+            self.assertEqual(image.getexif()[0x0112], 3)
+        self.store.wait(timeout=10)
+
+        [entry] = self.store.list_images("2026-01-02")
+        self.assertEqual(entry["name"], "a.jpg")
+        with Image.open(f"{self.dir}/2026-01-02/{entry['rotated']}") as rotated:
+            red, green, _ = rotated.getpixel((60, 44))
+            self.assertGreater(red, 200)
+            self.assertLess(green, 100)
+        with Image.open(f"{self.dir}/2026-01-02/{entry['thumbnail']}") as thumbnail:
+            self.assertLessEqual(thumbnail.width, 320)
+        # The index survives a restart
+        self.assertEqual(ImageStore(self.dir).list_images("2026-01-02"), [entry])
+
+    def test_time_lapse(self) -> None:
+        time_lapse = TimeLapse(jpeg, self.store, interval=0.01, count=3).start()
+        time_lapse._thread.join(timeout=10)
+        self.assertEqual(time_lapse.taken, 3)
+        self.store.wait(timeout=10)
+        self.assertEqual(len(self.store.list_images(datetime.now().strftime("%Y-%m-%d"))), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
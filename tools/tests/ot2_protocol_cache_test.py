@@ -0,0 +1,59 @@
+import csv
+import io
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from tools.opentrons2.protocol_cache import ProtocolCache, stable_protocol, variables_csv
+
+SCRIPT = """
+metadata = {"apiLevel": "2.20"}
+
+def run(protocol):
+    protocol.comment(str(volume))
+"""
+
+
+class TestProtocolCache(unittest.TestCase):
+    def test_stable_protocol_reads_variables_at_run(self) -> None:
+        stable = stable_protocol(SCRIPT, ["volume"])
+        assert stable is not None
+        namespace: dict = {}
+        exec(stable, namespace)
+        comments: list[str] = []
+
+        class Params:
+            galago_variables = type("File", (), {"contents": variables_csv({"volume": 12.5})})()
+
+        protocol = type("Protocol", (), {"params": Params, "comment": lambda self, text: comments.append(text)})()
+        namespace["run"](protocol)
+        self.assertEqual(comments, ["12.5"])
+
+    def test_unsupported_scripts_keep_injection(self) -> None:
+        self.assertIsNone(stable_protocol(SCRIPT.replace("2.20", "2.15"), ["volume"]))
+        self.assertIsNone(stable_protocol(SCRIPT + "\nwells = volume * 2\n", ["volume"]))
+        self.assertIsNone(stable_protocol(SCRIPT + "\ndef add_parameters(p):\n    pass\n", ["volume"]))
+
+    def test_variables_csv_round_trips(self) -> None:
+        values = {"wells": ["A1", "B2"], "name": 'a "quoted", name', "on": True}
+        rows = csv.reader(io.StringIO(variables_csv(values)))
+        self.assertEqual({name: json.loads(value) for name, value in rows}, values)
+
+    def test_cache_is_per_robot_and_forgets_deleted_protocols(self) -> None:
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        path = Path(directory) / "protocols.json"
+        cache = ProtocolCache("10.0.0.1:31950", path)
+        cache.put("a", "protocol-a")
+        cache.put("b", "protocol-b")
+        self.assertIsNone(ProtocolCache("10.0.0.2:31950", path).get("a"))
+        cache.retain({"protocol-b"})
+        reloaded = ProtocolCache("10.0.0.1:31950", path)
+        self.assertIsNone(reloaded.get("a"))
+        self.assertEqual(reloaded.get("b"), "protocol-b")
+
+
+if __name__ == "__main__":
+    unittest.main()
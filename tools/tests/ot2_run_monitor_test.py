@@ -0,0 +1,65 @@
+import unittest
+from typing import Any
+from unittest import mock
+
+from tools.opentrons2.run_monitor import RunMonitor, RunProgress
+
+
+class FakeResponse:
+    ok = True
+
+    def __init__(self, data: dict[str, Any]) -> None:
+        self.data = data
+
+    def json(self) -> dict[str, Any]:
+        return self.data
+
+
+class FakeRobot:
+    """Runs one more of its commands each time the run is polled."""
+
+    def __init__(self, commands: int) -> None:
+        self.commands = [{"commandType": "aspirate", "params": {"volume": 10}, "status": "queued"} for _ in range(commands)]
+        self.done = -1
+        self.cursors: list[int] = []
+
+    def get(self, url: str, params: Any = None, timeout: float = 0) -> FakeResponse:
+        if url.endswith("/commands"):
+            cursor = params["cursor"]
+            self.cursors.append(cursor)
+            page = self.commands[cursor:cursor + params["pageLength"]]
+            return FakeResponse({"data": [dict(c) for c in page], "meta": {"cursor": cursor, "totalLength": len(self.commands)}})
+        self.done += 1
+        for i, command in enumerate(self.commands):
+            command["status"] = "succeeded" if i < self.done else "running" if i == self.done else "queued"
+        status = "succeeded" if self.done >= len(self.commands) else "running"
+        return FakeResponse({"data": {"status": status}})
+
+
+class TestRunMonitor(unittest.TestCase):
+    def test_reports_progress_from_the_cursor(self) -> None:
+        robot = FakeRobot(3)
+        events: list[RunProgress] = []
+        monitor = RunMonitor(robot, "http://ot2", "run-1", total_commands=3, on_progress=events.append)  # type: ignore[arg-type]
+        with mock.patch("tools.opentrons2.run_monitor.time.sleep"):
+            result = monitor.wait(timeout=10)
+
+        self.assertEqual(result.status, "succeeded")
+        self.assertEqual([event.completed_commands for event in events], [0, 1, 2, 3])
+        self.assertEqual(events[1].current_command, "aspirate 10")
+        self.assertIsNotNone(events[1].eta_seconds)
+        # Finished commands are not fetched again
+        self.assertEqual(robot.cursors, [0, 0, 1, 2])
+
+    def test_pages_past_an_unfinished_command(self) -> None:
+        robot = FakeRobot(450)
+        monitor = RunMonitor(robot, "http://ot2", "run-1", total_commands=450)  # type: ignore[arg-type]
+        progress, _ = monitor.poll()
+
+        self.assertEqual(robot.cursors, [0, 200, 400])
+        self.assertEqual(len(monitor.commands), 450)
+        self.assertEqual(progress.completed_commands, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
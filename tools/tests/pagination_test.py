@@ -0,0 +1,43 @@
+import unittest
+from typing import Any
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from tools.toolbox.db import Db
+from tools.toolbox.logging import iter_logs
+from tools.toolbox.pagination import iter_collection
+
+LOGS = [{"id": i, "level": "error" if i % 3 == 0 else "info"} for i in range(10)]
+
+
+class TestIterCollection(unittest.TestCase):
+    def setUp(self) -> None:
+        self.requests: list[dict[str, list[str]]] = []
+        patcher = mock.patch.object(Db, "get_data", side_effect=self.get_data)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_data(self, path: str) -> Any:
+        query = parse_qs(urlparse(path).query)
+        self.requests.append(query)
+        skip, limit = int(query["skip"][0]), int(query["limit"][0])
+        return LOGS[skip:skip + limit]
+
+    def test_pages_through_everything(self) -> None:
+        self.assertEqual(list(iter_logs(page_size=4)), LOGS)
+        self.assertEqual([q["skip"] for q in self.requests], [["0"], ["4"], ["8"]])
+        self.assertEqual(self.requests[0]["descending"], ["False"])
+
+    def test_filter_and_early_stop(self) -> None:
+        records = list(iter_collection("logs", page_size=4, where=lambda r: r["level"] == "error", limit=2))
+        self.assertEqual([r["id"] for r in records], [0, 3])
+        self.assertLessEqual(len(self.requests), 2)
+
+    def test_unpaginated_endpoint(self) -> None:
+        with mock.patch.object(Db, "get_data", return_value=LOGS) as get_data:
+            self.assertEqual(list(iter_collection("labware", page_size=4, prefetch=False)), LOGS)
+        self.assertEqual(get_data.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from tools.pf400.duration_model import (
+    DEFAULT_PROFILE,
+    DurationCalibration,
+    move_seconds,
+    trapezoid_time,
+)
+
+
+def pose(*values: float) -> list[float]:
+    return list(values)
+
+
+class TestMoveSeconds(unittest.TestCase):
+    def test_trapezoid_and_triangle(self) -> None:
+        # 1s to reach 100, 50 units ramping each way, 100 units cruising
+        self.assertAlmostEqual(trapezoid_time(200, 100, 100, 100), 3.0)
+        # Too short to reach full speed
+        self.assertAlmostEqual(trapezoid_time(25, 100, 100, 100), 1.0)
+        self.assertEqual(trapezoid_time(0, 100, 100, 100), 0.0)
+
+    def test_slower_profiles_take_longer(self) -> None:
+        start, end = pose(100, 0, 180, 0, 80, 0), pose(100, 90, 120, -30, 80, 0)
+        slow = DEFAULT_PROFILE.copy(update={"speed": 20, "acceleration": 20, "deceleration": 20})
+        fast = move_seconds(start, end, "j", DEFAULT_PROFILE)
+        self.assertGreater(move_seconds(start, end, "j", slow), fast)
+        self.assertGreater(fast, move_seconds(start, pose(100, 10, 180, 0, 80, 0), "j", DEFAULT_PROFILE))
+
+    def test_gripper_joint_is_ignored(self) -> None:
+        start = pose(100, 0, 180, 0, 80, 0)
+        self.assertAlmostEqual(move_seconds(start, pose(100, 0, 180, 0, 120, 0)), move_seconds(start, start))
+
+
+class TestDurationCalibration(unittest.TestCase):
+    def test_converges_and_persists(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "durations.json"
+            calibration = DurationCalibration("robot", path)
+            self.assertEqual(calibration.apply("Move", 2.0), 2.0)
+            for _ in range(30):
+                calibration.record("Move", 2.0, 3.0)
+            self.assertAlmostEqual(calibration.ratio("Move"), 1.5, places=2)
+            self.assertEqual(calibration.ratio("Transfer"), 1.0)
+
+            calibration.flush()
+            reloaded = DurationCalibration("robot", path)
+            self.assertAlmostEqual(reloaded.ratio("Move"), 1.5, places=2)
+            self.assertEqual(DurationCalibration("other", path).ratio("Move"), 1.0)
+
+    def test_saves_are_batched_and_never_raise(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "durations.json"
+            calibration = DurationCalibration("robot", path)
+            calibration.record("Move", 2.0, 3.0)
+            self.assertFalse(path.exists())
+            calibration.flush()
+            self.assertTrue(path.exists())
+
+            # A directory where the file should be makes every write fail
+            blocked = DurationCalibration("robot", Path(tmp))
+            blocked.record("Move", 2.0, 3.0)
+            blocked.flush()
+            self.assertAlmostEqual(blocked.ratio("Move"), 1.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
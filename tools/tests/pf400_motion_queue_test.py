@@ -0,0 +1,132 @@
+import unittest
+from typing import Callable, Optional
+
+from tools.pf400.driver import (
+    GripperController,
+    Location,
+    MotionQueue,
+    MovementController,
+    Pf400Driver,
+    RobotCommunicator,
+    RobotConfig,
+    RobotInitializer,
+    RobotState,
+)
+
+
+class FakeTcpIp:
+    def __init__(self) -> None:
+        self.sent: list[str] = []
+        self.reconnecting = False
+        # Called with each command before it is sent, e.g. to reconnect first
+        self.before_send: Optional[Callable[[str], None]] = None
+
+    def write_and_read(self, msg: str, timeout: float = 5) -> str:
+        if self.before_send is not None:
+            self.before_send(msg)
+        self.sent.append(msg)
+        return "0 1" if msg == "attach" else "0"
+
+    def write_and_expect(self, msg: str, expected: str = "0", timeout: float = 5) -> None:
+        self.sent.append(msg)
+
+    def wait_for_eom(self) -> None:
+        self.sent.append("waitForEom")
+
+    def pipeline(self, msgs: list[str], timeout: float = 5) -> list[str]:
+        self.sent.extend(msgs)
+        return ["0"] * len(msgs)
+
+
+class TestMotionQueue(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tcp = FakeTcpIp()
+        self.communicator = RobotCommunicator(self.tcp)  # type: ignore[arg-type]
+        config = RobotConfig(tcp_host="", tcp_port=0, gpl_version="v2")
+        state = RobotState()
+        self.movement = MovementController(self.communicator, state, config)
+        self.gripper = GripperController(self.communicator, state, config)
+
+    def move(self, value: float, target: str) -> None:
+        self.movement.move_joints(Location([value] * 5), 1, target)
+
+    def test_moves_wait_one_by_one_without_queue(self) -> None:
+        self.move(1, "a")
+        self.move(2, "a")
+        self.assertEqual(self.tcp.sent, ["movej 1 1 1 1 1 1", "waitForEom", "movej 1 2 2 2 2 2", "waitForEom"])
+
+    def test_queue_waits_only_before_gripper(self) -> None:
+        queue = MotionQueue(self.communicator, {1: 3})
+        self.communicator.motion_queue = queue
+        self.move(1, "a")
+        self.move(2, "a")
+        self.move(3, "b")
+        self.gripper.release_plate(100)
+        self.move(4, "b")
+        queue.sync()
+        self.assertEqual(self.tcp.sent, [
+            # The last move at a location settles before moving on
+            "movej 1 1 1 1 1 1",
+            "movej 1 2 2 2 2 2",
+            "movej 1 3 3 3 3 3",
+            "waitForEom",
+            "releaseplate 100 10",
+            "waitForEom",
+            "movej 1 4 4 4 4 4",
+            "waitForEom",
+        ])
+
+    def test_retrieve_then_transit_blends_only_the_transit(self) -> None:
+        queue = MotionQueue(self.communicator, {1: 3})
+        self.communicator.motion_queue = queue
+        self.move(1, "source")
+        self.move(2, "source")
+        self.gripper.grasp_plate(100)
+        self.move(3, "source")
+        self.move(4, "transit")
+        self.move(5, "destination")
+        self.move(6, "destination")
+        queue.sync()
+        self.assertEqual([msg for msg in self.tcp.sent if msg.startswith("movej")], [
+            "movej 1 1 1 1 1 1",
+            "movej 1 2 2 2 2 2",
+            # The retreat lifting the plate out of the nest settles
+            "movej 1 3 3 3 3 90",
+            "movej 3 4 4 4 4 90",
+            "movej 1 5 5 5 5 90",
+            "movej 1 6 6 6 6 90",
+        ])
+
+    def test_reconnect_during_a_queued_move_keeps_the_order(self) -> None:
+        driver = Pf400Driver("", 0, gpl_version="v2")
+        driver.communicator = self.communicator
+        driver.initializer = RobotInitializer(self.communicator, driver.config)
+
+        def drop_once(msg: str) -> None:
+            # The connection drops as the first move is sent and is restored before it goes out
+            if msg.startswith("movej") and "attach" not in self.tcp.sent:
+                self.tcp.reconnecting = True
+                try:
+                    driver._reattach()
+                finally:
+                    self.tcp.reconnecting = False
+
+        self.tcp.before_send = drop_once
+        with driver.motion_queue():
+            self.move(1, "a")
+            self.move(2, "b")
+        self.assertEqual(self.tcp.sent, ["attach", "movej 1 1 1 1 1 1", "movej 1 2 2 2 2 2", "waitForEom"])
+
+    def test_blend_profiles_above_the_limit_are_rejected(self) -> None:
+        driver = Pf400Driver("", 0, gpl_version="v2")
+        driver.communicator = self.communicator
+        driver.register_blend_profiles({1: "6 50 50 50 50 0.1 0.1 -1 0"})
+        self.assertEqual(driver.blend_profiles, {1: 6})
+        with self.assertRaises(ValueError):
+            driver.register_blend_profiles({1: "21 50 50 50 50 0.1 0.1 -1 0"})
+        self.assertEqual(driver.blend_profiles, {})
+        self.assertEqual(self.tcp.sent, ["profile 6 50 50 50 50 0.1 0.1 -1 0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from tools.pf400.planner import TransferPlanner
+from tools.pf400.waypoints_models import Location
+
+
+def location(name: str, coordinates: str, location_type: str = "j") -> Location:
+    return Location.parse_obj({
+        "name": name,
+        "tool_id": 1,
+        "id": 1,
+        "coordinates": coordinates,
+        "location_type": location_type,
+        "orientation": "landscape",
+    })
+
+
+def pose(*values: float) -> list[float]:
+    return list(values)
+
+
+class TestTransferPlanner(unittest.TestCase):
+    def setUp(self) -> None:
+        self.locations = [location("unwind", "100 0 180 0 80 0")]
+
+    def test_nearby_nests_skip_the_unwind(self) -> None:
+        route = TransferPlanner(self.locations).plan("a", pose(100, 10, 20, 30, 80, 0), "b", pose(90, 40, 10, 20, 80, 0))
+        assert route is not None
+        self.assertEqual(route.waypoints, ["a", "b"])
+        self.assertFalse(route.unwinds)
+        self.assertAlmostEqual(route.estimated_seconds, 30 / 120)
+
+    def test_far_nests_go_through_a_transit_or_unwind(self) -> None:
+        start, goal = pose(100, 0, 20, 30, 80, 0), pose(100, 170, 20, 30, 80, 0)
+        route = TransferPlanner(self.locations).plan("a", start, "b", goal)
+        assert route is not None
+        self.assertEqual(route.waypoints, ["a", "unwind", "b"])
+        self.assertEqual(route.poses[1], pose(100, 0, 180, 0, 80, 0))
+
+        transit = location("transit_1", "100 85 20 30 80 0")
+        route = TransferPlanner(self.locations + [transit]).plan("a", start, "b", goal)
+        assert route is not None
+        self.assertEqual(route.waypoints, ["a", "transit_1", "b"])
+
+    def test_rail_moves_unwind(self) -> None:
+        route = TransferPlanner(self.locations).plan("a", pose(100, 0, 20, 30, 80, 0), "b", pose(100, 0, 20, 30, 80, 500))
+        assert route is not None
+        self.assertTrue(route.unwinds)
+
+    def test_unwinds_where_the_route_is(self) -> None:
+        start, goal = pose(100, 0, 20, 30, 80, 0), pose(100, 0, 20, 30, 80, 500)
+        transit = location("transit_1", "150 60 20 30 80 0")
+
+        def leg_time(a: list[float], b: list[float]) -> float:
+            # Leaving the source is slow except towards the transit
+            return 10.0 if a == start and b != transit.coordinates.vec else 1.0
+
+        route = TransferPlanner(self.locations + [transit], leg_time=leg_time).plan("a", start, "b", goal)
+        assert route is not None
+        self.assertEqual(route.waypoints, ["a", "transit_1", "unwind", "b"])
+        # Folded at the transit's z, as the server's unwind does
+        self.assertEqual(route.poses[2], pose(150, 0, 180, 0, 80, 0))
+        self.assertEqual(route.estimated_seconds, 3.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import socket
+import threading
+import unittest
+
+from tools.pf400.tcp_ip import Pf400TcpIp, ReplyParser
+
+
+class FakeRobot:
+    """Answers TCS commands, in pieces, and can drop the connection."""
+
+    def __init__(self) -> None:
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.port = self.server.getsockname()[1]
+        self.commands: list[str] = []
+        self.connections = 0
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self) -> None:
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+    def handle(self, conn: socket.socket) -> None:
+        buffer = b""
+        with conn:
+            while True:
+                data = conn.recv(1024)
+                if not data:
+                    return
+                buffer += data
+                while b"\n" in buffer:
+                    line, buffer = buffer.split(b"\n", 1)
+                    command = line.decode()
+                    self.commands.append(command)
+                    if command == "drop":
+                        return
+                    if command == "hang":
+                        continue
+                    reply = "0 1 2 3 4 5" if command == "wherej" else "0"
+                    for part in (reply[:1], reply[1:] + "\r\n"):
+                        conn.sendall(part.encode())
+
+    def close(self) -> None:
+        self.server.close()
+
+
+class TestPf400TcpIp(unittest.TestCase):
+    def setUp(self) -> None:
+        self.robot = FakeRobot()
+        self.addCleanup(self.robot.close)
+        self.reconnects = 0
+        self.tcp = Pf400TcpIp("127.0.0.1", self.robot.port, on_reconnect=self.on_reconnect)
+        self.addCleanup(self.tcp.close)
+
+    def on_reconnect(self) -> None:
+        self.reconnects += 1
+
+    def test_parser_handles_partial_replies(self) -> None:
+        parser = ReplyParser()
+        self.assertEqual(parser.feed(b"0 1"), [])
+        self.assertEqual(parser.feed(b" 2\r\n0\r"), ["0 1 2"])
+        self.assertEqual(parser.feed(b"\n"), ["0"])
+
+    def test_pipelined_replies_are_matched_in_order(self) -> None:
+        replies = self.tcp.pipeline(["profile 1 2 3", "wherej", "mspeed"])
+        self.assertEqual(replies, ["0", "0 1 2 3 4 5", "0"])
+        with self.assertRaises(ValueError):
+            self.tcp.pipeline(["movej 1 2 3"])
+
+    def test_reconnects_after_a_drop_or_timeout(self) -> None:
+        with self.assertRaises(ConnectionError):
+            self.tcp.write_and_read("drop")
+        # Queries are sent again on a new connection
+        self.assertEqual(self.tcp.write_and_read("wherej"), "0 1 2 3 4 5")
+        with self.assertRaises(TimeoutError):
+            self.tcp.write_and_read("hang", timeout=0.2)
+        self.tcp.write_and_expect("movej 1 2 3")
+        self.assertEqual(self.robot.connections, 3)
+        self.assertEqual(self.reconnects, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from typing import Any
+
+from tools.toolbox.reagent_index import ReagentIndex
+
+
+def reagent(id: int, plate_id: int, quantity: float, name: str = "water") -> dict[str, Any]:
+    return {"id": id, "plate_id": plate_id, "name": name, "quantity": quantity}
+
+
+class TestReagentIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.snapshot = [
+            reagent(1, 10, 50),
+            reagent(2, 10, 5),
+            reagent(3, 11, 60),
+            reagent(4, 11, 70),
+            reagent(5, 12, 200),
+            reagent(6, 12, 500, name="dmso"),
+        ]
+        self.fetches = 0
+        self.index = ReagentIndex("wc", self.fetch, ttl=60)
+
+    def fetch(self, workcell_name: str) -> list[dict[str, Any]]:
+        self.fetches += 1
+        return list(self.snapshot)
+
+    def test_best_plate_matches_most_reagents(self) -> None:
+        plate_id, reagents = self.index.best_plate("water", 40) or (None, [])
+        self.assertEqual(plate_id, 11)
+        self.assertEqual([r["id"] for r in reagents], [3, 4])
+        self.assertIsNone(self.index.best_plate("water", 1000))
+        self.assertEqual(self.fetches, 1)
+
+    def test_plates_for_total_uses_fewest_plates(self) -> None:
+        plates = self.index.plates_for_total("water", 180) or []
+        self.assertEqual([plate_id for plate_id, _ in plates], [12])
+        plates = self.index.plates_for_total("water", 300) or []
+        self.assertEqual([plate_id for plate_id, _ in plates], [12, 11])
+        self.assertIsNone(self.index.plates_for_total("water", 1000))
+
+    def test_refresh_applies_changes(self) -> None:
+        self.index.refresh()
+        self.snapshot = [reagent(1, 10, 0), reagent(3, 11, 60), reagent(7, 13, 80)]
+        self.index.refresh(force=True)
+        self.assertEqual(sorted(r["id"] for r in self.index.find("water", 1)), [3, 7])
+        self.assertIsNone(self.index.get(5))
+        self.assertFalse(self.index.has_plate(12))
+
+    def test_local_writes(self) -> None:
+        self.index.refresh()
+        self.index.upsert(reagent(2, 10, 90))
+        self.index.remove(4)
+        self.assertEqual(self.index.best_plate("water", 40), (10, [reagent(1, 10, 50), reagent(2, 10, 90)]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from typing import Any
+from unittest import mock
+
+import requests
+
+from tools.toolbox import replica
+from tools.toolbox.db import Db
+
+WORKCELLS = [
+    {"id": 1, "name": "wc_1", "updated_at": "2024-01-01", "tools": []},
+    {"id": 2, "name": "wc_2", "updated_at": "2024-01-02", "tools": []},
+]
+
+
+def json_response(data: Any) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response._content = json.dumps(data).encode()
+    return response
+
+
+class TestReplica(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        for name, value in (("DATA_DIR", Path(tmp.name)), ("REPLICA_FILE", Path(tmp.name) / "replica.db")):
+            patcher = mock.patch.object(replica, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.api = {"workcells": WORKCELLS, "settings/workcell": {"value": "wc_2"}}
+
+    def fake_send(self, method: str, path: str, **kwargs: Any) -> requests.Response:
+        if path not in self.api:
+            response = requests.Response()
+            response.status_code = 404
+            return response
+        return json_response(self.api[path])
+
+    def sync(self) -> None:
+        with mock.patch.object(Db, "_send", side_effect=self.fake_send):
+            self.assertTrue(replica.sync())
+
+    def test_offline_reads_fall_back_to_replica(self) -> None:
+        self.sync()
+        with mock.patch.object(Db, "_send", side_effect=requests.exceptions.ConnectionError()):
+            self.assertEqual(Db.get_by_id_or_name("wc_1", "workcells")["id"], 1)
+            self.assertEqual(Db.get_data("workcells"), WORKCELLS)
+            self.assertEqual(Db.get_data("settings/workcell"), {"value": "wc_2"})
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                Db.get_data("labware")
+
+    def test_sync_rewrites_only_changes(self) -> None:
+        self.sync()
+        self.api["workcells"] = [WORKCELLS[0], {**WORKCELLS[1], "updated_at": "2024-02-01"}]
+        with mock.patch.object(Db, "_send", side_effect=self.fake_send), replica._connect() as conn:
+            # The list itself, plus wc_2 under its id and its name
+            self.assertEqual(replica.sync_model(conn, "workcells"), 3)
+        self.assertLess(replica.staleness()["workcells"], 5)
+
+    def test_failed_sync_keeps_data(self) -> None:
+        self.sync()
+        with mock.patch.object(Db, "_send", side_effect=requests.exceptions.ConnectionError()):
+            self.assertFalse(replica.sync())
+        self.assertIsNotNone(replica.lookup("workcells/wc_2"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import subprocess
+import sys
+import time
+import unittest
+from types import SimpleNamespace
+
+from tools.toolbox.script_limits import (
+    ScriptCancelled,
+    ScriptLimitExceeded,
+    ScriptLimits,
+    kill_tree,
+    popen_poll,
+    process_group_kwargs,
+    supervise,
+)
+
+
+class TestScriptLimits(unittest.TestCase):
+    def test_command_limits_override_config(self) -> None:
+        config = SimpleNamespace(script_timeout_seconds=30.0, script_memory_limit_mb=512, script_nice=0)
+        command = SimpleNamespace(timeout_seconds=5.0, memory_limit_mb=0, nice=10, max_output_chars=0)
+        limits = ScriptLimits.from_message(config, prefix="script_").override(ScriptLimits.from_message(command))
+        self.assertEqual(limits.to_dict(), {"timeout": 5.0, "memory_mb": 512, "nice": 10})
+
+    def start(self, code: str) -> "subprocess.Popen[bytes]":
+        process = subprocess.Popen([sys.executable, "-c", code], **process_group_kwargs())
+        self.addCleanup(kill_tree, process)
+        return process
+
+    def test_timeout_kills_the_process(self) -> None:
+        process = self.start("import time; time.sleep(30)")
+        start = time.monotonic()
+        with self.assertRaises(ScriptLimitExceeded):
+            supervise(process.pid, popen_poll(process), lambda: kill_tree(process), ScriptLimits(timeout=0.3))
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertIsNotNone(process.poll())
+
+    def test_cancellation_and_exit_code(self) -> None:
+        process = self.start("import sys; sys.exit(4)")
+        self.assertEqual(supervise(process.pid, popen_poll(process), lambda: kill_tree(process), ScriptLimits()), 4)
+        process = self.start("import time; time.sleep(30)")
+        with self.assertRaises(ScriptCancelled):
+            supervise(process.pid, popen_poll(process), lambda: kill_tree(process), ScriptLimits(), lambda: True)
+        self.assertIsNotNone(process.poll())
+
+
+if __name__ == "__main__":
+    unittest.main()
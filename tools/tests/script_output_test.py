@@ -0,0 +1,48 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from tools.toolbox import python_subprocess, script_output
+from tools.toolbox.python_subprocess import run_python_script
+from tools.toolbox.script_output import ScriptOutput
+
+
+class TestScriptOutput(unittest.TestCase):
+    def test_keeps_head_and_tail(self) -> None:
+        output = ScriptOutput("unused", head=10, tail=10)
+        for i in range(10):
+            output.add_line(f"line {i}\n")
+        self.assertTrue(output.truncated)
+        self.assertEqual(output.omitted, 50)
+        self.assertEqual(output.text(), "line 0\nlin\n... 50 characters omitted ...\n 8\nline 9\n")
+
+    def test_short_output_is_returned_whole(self) -> None:
+        output = ScriptOutput("unused", head=10, tail=10)
+        output.add_line("a\n")
+        output.add_line("b")
+        self.assertEqual(output.text(), "a\nb")
+
+    def test_script_lines_are_streamed_and_full_output_kept(self) -> None:
+        output_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, output_dir, True)
+        lines: list[str] = []
+        with patch.multiple(script_output, SCRIPT_OUTPUT_DIR=output_dir, MAX_OUTPUT_HEAD=20, MAX_OUTPUT_TAIL=20), patch.multiple(
+            python_subprocess, SCRIPT_CACHE_DIR=output_dir / "cache", SCRIPT_RUN_DIR=output_dir / "runs"
+        ):
+            result = run_python_script("for i in range(100):\n    print(f'line {i}')", on_line=lines.append)
+        self.assertEqual(lines, [f"line {i}" for i in range(100)])
+        assert result is not None
+        self.assertTrue(result.startswith("line 0\nline 1\nline 2\n"))
+        self.assertTrue(result.endswith("line 98\nline 99\n"))
+        self.assertEqual(len(list((output_dir / "cache").glob("*.py"))), 1)
+        self.assertFalse(list((output_dir / "runs").iterdir()))
+        saved = list(output_dir.glob("script_*.txt"))
+        self.assertEqual(len(saved), 1)
+        self.assertIn(f"/script-outputs/{saved[0].name}", result)
+        self.assertEqual(saved[0].read_text().splitlines(), lines)
+
+
+if __name__ == "__main__":
+    unittest.main()
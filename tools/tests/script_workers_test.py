@@ -0,0 +1,71 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from tools.toolbox.script_workers import ScriptWorkerPool
+
+
+class TestScriptWorkerPool(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pool = ScriptWorkerPool(sys.executable, preload=("json",), max_runs=3)
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.addCleanup(self.pool.shutdown)
+
+    def run_script(self, content: str, name: str = "script.py", cache_bytecode: bool = False) -> tuple[int, str]:
+        script = os.path.join(self.dir, name)
+        output = os.path.join(self.dir, "output.txt")
+        with open(script, "w", encoding="utf-8") as f:
+            f.write(content)
+        returncode = self.pool.run(script, output, cache_bytecode)
+        with open(output, "r", encoding="utf-8") as f:
+            return returncode, f.read()
+
+    def test_scripts_share_a_worker_but_not_state(self) -> None:
+        self.assertEqual(self.run_script("import os, sys\nx = 1\nos.environ['X'] = '1'\nprint('json' in sys.modules)"), (0, "True\n"))
+        self.assertEqual(
+            self.run_script("import os\nprint(globals().get('x'), os.environ.get('X'), os.getpid())")[1].split()[:2],
+            ["None", "None"],
+        )
+        self.assertEqual(len(self.pool._idle), 1)
+
+    def test_exit_codes_and_errors(self) -> None:
+        self.assertEqual(self.run_script("import sys\nsys.exit(3)")[0], 3)
+        returncode, output = self.run_script("import sys\nprint('out', file=sys.stderr)\nraise ValueError('boom')")
+        self.assertEqual(returncode, 1)
+        self.assertIn("out\n", output)
+        self.assertIn("ValueError: boom", output)
+        self.assertNotIn("script_worker.py", output)
+
+    def test_compiled_scripts_are_reused(self) -> None:
+        self.assertEqual(self.run_script("print(1)"), (0, "1\n"))
+        # Changed size, recompiled
+        self.assertEqual(self.run_script("print(22)"), (0, "22\n"))
+        self.assertFalse([name for name in os.listdir(self.dir) if name.endswith(".pyc")])
+        self.assertEqual(self.run_script("print(3)", name="abc.py", cache_bytecode=True), (0, "3\n"))
+        self.assertEqual(len([name for name in os.listdir(self.dir) if name.endswith(".pyc")]), 1)
+
+    def test_workers_are_recycled(self) -> None:
+        pids = {self.run_script("import os\nprint(os.getpid())")[1] for _ in range(3)}
+        self.assertEqual(len(pids), 1)
+        # A worker killed by its script is replaced
+        self.assertEqual(self.run_script("import os\nos._exit(5)")[0], 5)
+        self.assertEqual(self.run_script("print('ok')"), (0, "ok\n"))
+
+    def test_workers_with_leftover_state_are_retired(self) -> None:
+        pid = self.run_script("import os\nprint(os.getpid())")[1]
+        self.assertEqual(self.run_script("import os\nprint(os.getpid())")[1], pid)
+        # An open handle, e.g. a serial port a backend didn't close
+        self.run_script("import os\nhandle = open(os.devnull)\nprint(os.getpid())")
+        self.assertNotEqual(self.run_script("import os\nprint(os.getpid())")[1], pid)
+
+        pid = self.run_script("import os\nprint(os.getpid())")[1]
+        self.run_script("import builtins\nbuiltins.print = lambda *args, **kwargs: None")
+        self.assertEqual(self.run_script("print('ok')"), (0, "ok\n"))
+        self.assertNotEqual(self.run_script("import os\nprint(os.getpid())")[1], pid)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from tools.slim_protos import slim_module_path, slim_tool_base_source, tools_in_tool_base
+
+TOOL_BASE = """syntax = 'proto3';
+import "google/protobuf/struct.proto";
+import "tools/grpc_interfaces/liconic.proto";
+import "tools/grpc_interfaces/pf400.proto";
+
+message Command {
+  oneof tool_command {
+    tools.grpc_interfaces.pf400.Command pf400 = 3;
+    tools.grpc_interfaces.liconic.Command liconic = 4;
+  }
+}
+"""
+
+# Serializes a command with the full descriptors, then parses it in a process
+# that loads the pf400 slim tool_base_pb2.
+ROUND_TRIP = """
+import os, subprocess, sys
+from tools.grpc_interfaces import tool_base_pb2
+command = tool_base_pb2.Command()
+command.pf400.move.location = "nest_1"
+wire = command.SerializeToString()
+child = '''
+import sys
+from tools import slim_protos
+slim_protos.install()
+from tools.grpc_interfaces import tool_base_pb2
+command = tool_base_pb2.Command.FromString(bytes.fromhex(sys.argv[1]))
+print(len(tool_base_pb2.Command.DESCRIPTOR.fields), command.WhichOneof("tool_command"), command.pf400.move.location)
+'''
+env = dict(os.environ, GALAGO_PROTO_TOOL="pf400")
+env.pop("GALAGO_FULL_PROTOS")
+print(subprocess.run([sys.executable, "-c", child, wire.hex()], env=env, capture_output=True, text=True, check=True).stdout)
+"""
+
+
+class TestSlimProtos(unittest.TestCase):
+    def test_strips_other_tools(self) -> None:
+        slim = slim_tool_base_source(TOOL_BASE, "pf400")
+        self.assertIn('import "tools/grpc_interfaces/pf400.proto";', slim)
+        self.assertIn("pf400.Command pf400 = 3;", slim)
+        self.assertNotIn("liconic", slim)
+        self.assertIn('import "google/protobuf/struct.proto";', slim)
+
+    def test_tools_in_tool_base(self) -> None:
+        self.assertEqual(tools_in_tool_base(TOOL_BASE), ["liconic", "pf400"])
+
+    @unittest.skipUnless(os.path.exists(slim_module_path("pf400")), "slim protos not built")
+    def test_slim_module_is_wire_compatible(self) -> None:
+        env = dict(os.environ, GALAGO_FULL_PROTOS="1")
+        output = subprocess.run(
+            [sys.executable, "-c", ROUND_TRIP], env=env, capture_output=True, text=True, check=True
+        ).stdout
+        self.assertEqual(output.split(), ["1", "pf400", "nest_1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
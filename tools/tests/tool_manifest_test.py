@@ -0,0 +1,46 @@
+import json
+import os
+import tempfile
+import unittest
+
+from tools.tool_manifest import describe_tool, load_manifest, source_hash
+
+
+class TestToolManifest(unittest.TestCase):
+    def test_describe_tool_reads_commands_without_importing_server(self) -> None:
+        info = describe_tool("lcus1_relay")
+        assert info is not None
+        self.assertEqual(info["class_name"], "Lcus1RelayServer")
+        self.assertEqual(info["tool_type"], "lcus1_relay")
+        self.assertEqual(info["commands"]["TimedSwitch"]["parameter"]["fields"], ["duration_seconds"])
+        # Inherited from ToolServer
+        self.assertIn("EstimateDuration", info["estimate_methods"])
+        self.assertEqual(
+            [c["name"] for c in info["command_class_info"]["available_commands"]],
+            ["Switch", "TimedSwitch"],
+        )
+
+    def test_describe_tool_ignores_non_tools(self) -> None:
+        self.assertIsNone(describe_tool("tests"))
+        self.assertIsNone(describe_tool("does_not_exist"))
+
+    def test_stale_manifest_is_rebuilt(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "tool_manifest.json")
+            manifest = load_manifest(path)
+            assert manifest is not None
+            self.assertEqual(manifest["source_hash"], source_hash())
+            self.assertIn("lcus1_relay", manifest["tools"])
+
+            # Built before a command changed, under the same version
+            manifest["source_hash"] = "stale"
+            manifest["tools"]["lcus1_relay"]["commands"] = {}
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            rebuilt = load_manifest(path)
+            assert rebuilt is not None
+            self.assertIn("TimedSwitch", rebuilt["tools"]["lcus1_relay"]["commands"])
+
+
+if __name__ == "__main__":
+    unittest.main()
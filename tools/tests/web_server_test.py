@@ -0,0 +1,70 @@
+import asyncio
+import unittest
+from typing import Any
+from unittest import mock
+
+from tools import web_server
+from tools.app_config import Tool, WorkcellConfig
+
+
+def workcell(*tools: Tool) -> WorkcellConfig:
+    return WorkcellConfig(tools=list(tools))
+
+
+class FakeConfig:
+    """Config whose next load returns `loads` in turn."""
+
+    loads: list[tuple[bool, WorkcellConfig]] = []
+
+    def __init__(self) -> None:
+        self.workcell_config: Any = None
+
+    def load_workcell_config(self) -> bool:
+        changed, self.workcell_config = FakeConfig.loads.pop(0)
+        return changed
+
+
+class TestReloadConfig(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pf400 = Tool(id=1, name="pf400", type="pf400", port=4000)
+        self.started: list[str] = []
+        self.stopped: list[str] = []
+
+        async def start_tool(name: str, tool_type: str, port: int) -> bool:
+            self.started.append(name)
+            return True
+
+        async def stop_tool(name: str) -> bool:
+            self.stopped.append(name)
+            return True
+
+        async def send_tool_status(websocket: Any = None) -> None:
+            pass
+
+        for name, value in [
+            ("Config", FakeConfig),
+            ("start_tool", start_tool),
+            ("stop_tool", stop_tool),
+            ("send_tool_status", send_tool_status),
+            ("is_process_running", lambda name: True),
+            ("config", None),
+            ("reload_lock", None),
+        ]:
+            patcher = mock.patch.object(web_server, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_reload_applies_tool_changes(self) -> None:
+        moved = self.pf400.copy(update={"port": 4001})
+        FakeConfig.loads = [(True, workcell(self.pf400)), (True, workcell(moved)), (False, workcell(moved))]
+        asyncio.run(web_server.reload_config())
+        self.assertEqual(self.started, ["pf400"])
+        asyncio.run(web_server.reload_config())
+        self.assertEqual((self.stopped, self.started), (["pf400"], ["pf400", "pf400"]))
+        # Nothing changed, nothing restarted
+        asyncio.run(web_server.reload_config())
+        self.assertEqual((self.stopped, self.started), (["pf400"], ["pf400", "pf400"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,227 @@
+"""
+Static manifest of the available tool servers.
+
+`galago --list` and `galago --info` used to import every tools.<tool>.server
+module, which pulls in vendor SDKs (win32com, serial, PIL, ...) and fails on
+machines without them. The manifest records the same information ahead of
+time: server classes and their command/estimate methods are read from the
+server sources with `ast`, and command fields come from the generated protobuf
+descriptors, so building it never imports a driver.
+
+It is generated next to this file by the protobuf build (setup.py and
+bin/make proto) and shipped with the package. Run `python -m tools.tool_manifest`
+to regenerate it by hand. The manifest records a hash of the sources it was
+built from, and is rebuilt when they change, since protos and servers change
+without a version bump.
+"""
+
+import ast
+import glob
+import hashlib
+import importlib
+import json
+import logging
+import os
+from typing import Any, Optional
+
+from tools import __version__ as galago_version
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_FILE = os.path.join(TOOLS_DIR, "tool_manifest.json")
+# Sources the manifest is built from, relative to TOOLS_DIR
+SOURCE_PATTERNS = ("grpc_interfaces/*_pb2.py", "*/server.py", "base_server.py")
+
+
+def source_hash() -> str:
+    """Hash of the protobuf modules and server sources the manifest describes."""
+    paths = sorted(
+        path for pattern in SOURCE_PATTERNS for path in glob.glob(os.path.join(TOOLS_DIR, pattern))
+    )
+    digest = hashlib.sha1()
+    for path in paths:
+        digest.update(os.path.relpath(path, TOOLS_DIR).replace(os.sep, "/").encode())
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _find_tool_server_class(tree: ast.Module) -> Optional[ast.ClassDef]:
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            for base in node.bases:
+                if isinstance(base, ast.Name) and base.id == "ToolServer":
+                    return node
+    return None
+
+
+def _signature(func: ast.FunctionDef) -> str:
+    returns = f" -> {ast.unparse(func.returns)}" if func.returns else ""
+    return f"({ast.unparse(func.args)}){returns}"
+
+
+def _public_methods(path: str, class_name: Optional[str] = None) -> tuple[Optional[ast.ClassDef], list[ast.FunctionDef]]:
+    """Parse a server module and return its tool server class and public methods."""
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    if class_name is None:
+        server_class = _find_tool_server_class(tree)
+    else:
+        server_class = next(
+            (n for n in tree.body if isinstance(n, ast.ClassDef) and n.name == class_name), None
+        )
+    if server_class is None:
+        return None, []
+    methods = [
+        node for node in server_class.body
+        if isinstance(node, ast.FunctionDef) and not node.name.startswith("_")
+    ]
+    return server_class, methods
+
+
+def _command_fields(pb_module: Any, command_type: str) -> list[str]:
+    message = pb_module
+    for part in command_type.split("."):
+        message = getattr(message, part, None)
+        if message is None:
+            return []
+    descriptor = getattr(message, "DESCRIPTOR", None)
+    return [field.name for field in descriptor.fields] if descriptor else []
+
+
+def describe_tool(tool_name: str) -> Optional[dict]:
+    """
+    Build the manifest entry for one tool without importing its server.
+
+    Returns:
+        The same structure as utils.get_tool_server_info, or None if
+        tools/<tool_name>/server.py doesn't define a ToolServer subclass
+    """
+    server_path = os.path.join(TOOLS_DIR, tool_name, "server.py")
+    if not os.path.exists(server_path):
+        return None
+    server_class, methods = _public_methods(server_path)
+    if server_class is None:
+        return None
+    # Methods inherited from ToolServer, overridden by the tool's own
+    _, base_methods = _public_methods(os.path.join(TOOLS_DIR, "base_server.py"), "ToolServer")
+    own_names = {node.name for node in methods}
+    methods = [node for node in base_methods if node.name not in own_names] + methods
+
+    try:
+        pb_module: Any = importlib.import_module(f"tools.grpc_interfaces.{tool_name}_pb2")
+    except ImportError:
+        pb_module = None
+
+    tool_type = tool_name
+    for node in server_class.body:
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant):
+            if any(isinstance(target, ast.Name) and target.id == "toolType" for target in node.targets):
+                tool_type = str(node.value.value)
+
+    info: dict[str, Any] = {
+        "tool_name": tool_name,
+        "class_name": server_class.name,
+        "module_path": f"tools.{tool_name}.server",
+        "tool_type": tool_type,
+        "commands": {},
+        "estimate_methods": {},
+        "other_methods": {},
+    }
+
+    for node in sorted(methods, key=lambda n: n.name):
+        signature = _signature(node)
+        docstring = ast.get_docstring(node)
+        params = next((arg for arg in node.args.args if arg.arg == "params"), None)
+        annotation = ast.unparse(params.annotation) if params and params.annotation else ""
+        if annotation.startswith("Command."):
+            info["commands"][node.name] = {
+                "method_name": node.name,
+                "parameter": {
+                    "name": "params",
+                    "type": annotation.split(".")[-1],
+                    "annotation": annotation,
+                    "fields": _command_fields(pb_module, annotation) if pb_module else [],
+                },
+                "docstring": docstring,
+                "signature": signature,
+            }
+        elif node.name.startswith("Estimate"):
+            info["estimate_methods"][node.name] = {
+                "method_name": node.name,
+                "return_type": ast.unparse(node.returns) if node.returns else "Unknown",
+                "signature": signature,
+                "docstring": docstring,
+            }
+        else:
+            info["other_methods"][node.name] = {
+                "method_name": node.name,
+                "signature": signature,
+                "docstring": docstring,
+            }
+
+    command_class = getattr(pb_module, "Command", None) if pb_module else None
+    if command_class is not None:
+        info["command_class_info"] = {
+            "class_name": "Command",
+            "available_commands": [
+                {
+                    "name": nested.name,
+                    "full_name": f"Command.{nested.name}",
+                    "fields": [field.name for field in nested.fields],
+                }
+                for nested in sorted(command_class.DESCRIPTOR.nested_types, key=lambda n: n.name)
+            ],
+        }
+    return info
+
+
+def build_manifest(output_file: str = MANIFEST_FILE) -> dict:
+    tools = {}
+    for entry in sorted(os.listdir(TOOLS_DIR)):
+        if not os.path.isdir(os.path.join(TOOLS_DIR, entry)):
+            continue
+        try:
+            info = describe_tool(entry)
+        except (SyntaxError, OSError) as e:
+            logging.warning(f"Skipping {entry} in tool manifest: {e}")
+            continue
+        if info is not None:
+            tools[entry] = info
+    manifest = {"version": galago_version, "source_hash": source_hash(), "tools": tools}
+    try:
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+    except OSError as e:
+        # E.g. installed read-only, the manifest is still good for this call
+        logging.debug(f"Could not write tool manifest: {e}")
+    return manifest
+
+
+def load_manifest(manifest_file: str = MANIFEST_FILE) -> Optional[dict]:
+    """
+    Return the manifest, rebuilt if it is missing or the sources changed since
+    it was built. None if it can't be built, to fall back to live introspection.
+    """
+    try:
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            manifest: Optional[dict] = json.load(f)
+    except (OSError, ValueError):
+        manifest = None
+    try:
+        current_hash = source_hash()
+        if (
+            manifest is not None
+            and manifest.get("version") == galago_version
+            and manifest.get("source_hash") == current_hash
+        ):
+            return manifest
+        logging.debug("Tool manifest is out of date, rebuilding it")
+        return build_manifest(manifest_file)
+    except Exception as e:
+        logging.debug(f"Could not build tool manifest, falling back to live introspection: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    generated = build_manifest()
+    print(f"Wrote {len(generated['tools'])} tools to {MANIFEST_FILE}")
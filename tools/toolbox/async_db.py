@@ -0,0 +1,90 @@
+"""
+Asyncio front end for Db.
+
+Each call runs the regular (pooled, keep-alive) Db request on a shared worker
+thread, so coroutines never block the event loop and any number of them can be
+awaited together. A per-client semaphore caps how many requests are in flight;
+the default matches Db's connection pool so requests never wait for a socket.
+
+Use `run_sync` to drive a fan-out from plain scripts:
+
+    plates = run_sync(async_inventory.get_plates_contents(plate_ids))
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Coroutine, Iterable, Optional, TypeVar, Union
+
+from tools.toolbox.db import POOL_SIZE, Db
+
+T = TypeVar("T")
+
+DEFAULT_CONCURRENCY = POOL_SIZE
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="galago-db")
+    return _executor
+
+
+class AsyncDb:
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY) -> None:
+        self.concurrency = concurrency
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Semaphores belong to one event loop, and run_sync starts a new one per call
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """Run a blocking Db call on the shared worker pool."""
+        async with self._get_semaphore():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_get_executor(), functools.partial(func, *args))
+
+    async def get_data(self, model: str) -> Any:
+        return await self.run(Db.get_data, model)
+
+    async def get_by_id_or_name(self, id: Union[int, str], model: str) -> Any:
+        return await self.run(Db.get_by_id_or_name, id, model)
+
+    async def post_data(self, data: dict, model: str) -> Any:
+        return await self.run(Db.post_data, data, model)
+
+    async def update_data(self, id: Union[int, str], data: dict, model: str) -> Any:
+        return await self.run(Db.update_data, id, data, model)
+
+    async def delete_data(self, id: Union[int, str], model: str) -> Any:
+        return await self.run(Db.delete_data, id, model)
+
+    async def ping(self, times: int) -> bool:
+        return await self.run(Db.ping, times)
+
+    async def get_many(self, models: Iterable[str]) -> list[Any]:
+        """get_data for every path in `models` concurrently, results in the same order."""
+        return await gather(self.get_data(model) for model in models)
+
+
+async def gather(aws: Iterable[Awaitable[T]]) -> list[T]:
+    """asyncio.gather over an iterable, results in input order."""
+    return list(await asyncio.gather(*aws))
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """Run a coroutine to completion from synchronous code."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    coro.close()
+    raise RuntimeError("run_sync can't be used inside a running event loop, await the coroutine instead")
@@ -0,0 +1,82 @@
+"""
+Async versions of the inventory read helpers, plus fan-out queries over many
+plates. The fan-outs issue all requests at once (up to the client's
+concurrency limit), so reading 40 plates takes about one round trip instead
+of 80. Sync wrappers live in tools.toolbox.inventory.
+"""
+
+from typing import Any, Iterable, Optional
+
+from tools.toolbox.async_db import AsyncDb, gather
+
+db = AsyncDb()
+
+
+async def get_inventory(name: str) -> Any:
+    return await db.get_by_id_or_name(name, "inventory")
+
+
+async def get_all_inventory(workcell_name: Optional[str] = None) -> Any:
+    if workcell_name:
+        return await db.get_data(f"inventory?workcell_name={workcell_name}")
+    return await db.get_data("inventory?all_workcells=true")
+
+
+async def get_nests(workcell_name: str) -> Any:
+    return await db.get_data(f"nests?workcell_name={workcell_name}")
+
+
+async def get_plates(workcell_name: str) -> Any:
+    return await db.get_data(f"plates?workcell={workcell_name}")
+
+
+async def get_plate(plate_id: int) -> Any:
+    return await db.get_by_id_or_name(plate_id, "plates")
+
+
+async def get_wells(plate_id: int) -> Any:
+    return await db.get_data(f"wells?plate_id={plate_id}")
+
+
+async def get_reagents(plate_id: int) -> Any:
+    return await db.get_data(f"reagents?plate_id={plate_id}")
+
+
+async def get_workcell_reagents(workcell_name: str) -> Any:
+    return await db.get_data(f"reagents?workcell_name={workcell_name}")
+
+
+async def get_plates_by_id(plate_ids: Iterable[int]) -> dict[int, Any]:
+    plate_ids = list(plate_ids)
+    plates = await gather(get_plate(plate_id) for plate_id in plate_ids)
+    return dict(zip(plate_ids, plates))
+
+
+async def get_wells_for_plates(plate_ids: Iterable[int]) -> dict[int, Any]:
+    plate_ids = list(plate_ids)
+    wells = await gather(get_wells(plate_id) for plate_id in plate_ids)
+    return dict(zip(plate_ids, wells))
+
+
+async def get_reagents_for_plates(plate_ids: Iterable[int]) -> dict[int, Any]:
+    plate_ids = list(plate_ids)
+    reagents = await gather(get_reagents(plate_id) for plate_id in plate_ids)
+    return dict(zip(plate_ids, reagents))
+
+
+async def get_plates_contents(plate_ids: Iterable[int]) -> dict[int, dict[str, Any]]:
+    """
+    Wells and reagents for every plate, fetched concurrently.
+
+    Returns:
+        {plate_id: {"wells": [...], "reagents": [...]}}
+    """
+    plate_ids = list(plate_ids)
+    results = await gather(
+        [get_wells(plate_id) for plate_id in plate_ids] + [get_reagents(plate_id) for plate_id in plate_ids]
+    )
+    count = len(plate_ids)
+    return {
+        plate_id: {"wells": results[i], "reagents": results[count + i]}
+        for i, plate_id in enumerate(plate_ids)
+    }
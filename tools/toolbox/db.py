@@ -1,29 +1,201 @@
 import json
 import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Union
+from typing import Any, Callable, Optional, Sequence, Union
 
 import appdirs  # type: ignore
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from tools.toolbox.db_cache import ResponseCache, model_of
 
 APP_NAME = "galago"
 APP_AUTHOR = "sciencecorp"
 DATA_DIR = Path(appdirs.user_data_dir(APP_NAME, APP_AUTHOR))
 CONFIG_FILE = DATA_DIR / "api_config.json"
 
+# (connect, read) timeouts in seconds for API calls
+DEFAULT_TIMEOUT = (3.05, 30)
+POOL_SIZE = 20
+# Only idempotent verbs are retried, POST is never replayed
+RETRY_METHODS = frozenset(["GET", "PUT", "DELETE", "HEAD", "OPTIONS"])
+# Items per bulk request, or per wave of concurrent single requests
+BULK_CHUNK_SIZE = 100
+
+
+def _is_item_validation_error(response: requests.Response) -> bool:
+    """
+    Whether a 400/422 only rejects items of the body, like FastAPI's
+    {"detail": [{"loc": ["body", 3, "name"], ...}]}, rather than the path or
+    the body as a whole, which means the request reached another route.
+    """
+    try:
+        detail = response.json().get("detail")
+    except (ValueError, AttributeError):
+        return False
+    if not isinstance(detail, list) or not detail:
+        return False
+    return all(
+        isinstance(error, dict)
+        and isinstance(error.get("loc"), list)
+        and len(error["loc"]) > 2
+        and error["loc"][0] == "body"
+        and isinstance(error["loc"][1], int)
+        for error in detail
+    )
+
+
+@dataclass
+class BulkResult:
+    """Outcome of one item of a bulk_* call."""
+
+    index: int
+    ok: bool
+    data: Any = None
+    error: Optional[str] = None
+    # None when the request never got an answer (API unreachable)
+    status_code: Optional[int] = None
+
 
 class Db:
     _api_url = "http://localhost:3010/api"  # Default
+    # (config file mtime, url) so the config is only re-read when it changes
+    _api_url_cache: Optional[tuple[float, str]] = None
+    _sessions: dict[bool, requests.Session] = {}
+    _session_lock = threading.Lock()
+    # Opt-in read-through cache, see enable_cache
+    _cache: Optional[ResponseCache] = None
+    # (method, model) -> whether <model>/bulk accepts it, learned on first use
+    _bulk_support: dict[tuple[str, str], bool] = {}
+    # (method, model) of the bulk routes in the API's OpenAPI schema, None if it has none
+    _bulk_routes: Optional[set[tuple[str, str]]] = None
+    _bulk_routes_probed = False
+
+    @classmethod
+    def session(cls, retry: bool = True) -> requests.Session:
+        """
+        Shared keep-alive session. Connections are pooled per host and reused
+        across calls and threads. With retry=True, idempotent requests are
+        retried with exponential backoff on connection errors and 502/503/504.
+        """
+        session = cls._sessions.get(retry)
+        if session is None:
+            with cls._session_lock:
+                session = cls._sessions.get(retry)
+                if session is None:
+                    session = requests.Session()
+                    retries = Retry(
+                        total=3 if retry else 0,
+                        backoff_factor=0.2,
+                        status_forcelist=(502, 503, 504),
+                        allowed_methods=RETRY_METHODS,
+                        raise_on_status=False,
+                    )
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=retries)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    cls._sessions[retry] = session
+        return session
+
+    @classmethod
+    def request(cls, method: str, path: str, use_replica: bool = True, **kwargs: Any) -> requests.Response:
+        """
+        Send a request to the galago API. GETs that can't reach it are answered
+        from the local replica (tools.toolbox.replica) when it has the path,
+        unless use_replica is False.
+        """
+        if method == "GET" and use_replica:
+            try:
+                return cls._send(method, path, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                offline = cls._from_replica(path)
+                if offline is None:
+                    raise
+                return offline
+        return cls._send(method, path, **kwargs)
+
+    @classmethod
+    def _from_replica(cls, path: str) -> Optional[requests.Response]:
+        # Imported here, the replica module itself syncs through Db
+        from tools.toolbox import replica
+
+        found = replica.lookup(path)
+        if found is None:
+            return None
+        body, age = found
+        logging.warning(f"Galago API unreachable, serving {path} from local replica synced {replica.format_age(age)} ago")
+        response = requests.Response()
+        response.status_code = 200
+        response._content = body
+        response.headers["Content-Type"] = "application/json"
+        response.headers["X-Galago-Replica-Age"] = str(int(age))
+        return response
+
+    @classmethod
+    def _send(cls, method: str, path: str, **kwargs: Any) -> requests.Response:
+        kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+        url = f"{cls.get_api_url()}/{path}"
+        cache = cls._cache
+        if cache is None:
+            return cls.session().request(method, url, **kwargs)
+        if method == "GET" and cache.caches(path):
+            headers = kwargs.pop("headers", None) or {}
+            return cache.get(
+                path, lambda extra: cls.session().request(method, url, headers={**headers, **extra}, **kwargs)
+            )
+        response = cls.session().request(method, url, **kwargs)
+        if method != "GET":
+            cache.invalidate(model_of(path))
+        return response
+
+    @classmethod
+    def enable_cache(cls, ttls: Optional[dict[str, float]] = None) -> None:
+        """
+        Cache GET responses per model for protocol runs and other read-heavy
+        callers. Writes through Db invalidate the written model.
+
+        Args:
+            ttls: Seconds to cache each model for, defaults to DEFAULT_CACHE_TTLS.
+                Models missing from it are never cached.
+        """
+        cls._cache = ResponseCache(ttls=dict(ttls)) if ttls is not None else ResponseCache()
+
+    @classmethod
+    def disable_cache(cls) -> None:
+        cls._cache = None
+
+    @classmethod
+    def invalidate_cache(cls, model: Optional[str] = None) -> None:
+        if cls._cache is not None:
+            cls._cache.invalidate(model)
+
+    @classmethod
+    def cache_stats(cls) -> dict[str, dict[str, int]]:
+        return cls._cache.stats() if cls._cache is not None else {}
 
     @classmethod
     def get_api_url(cls) -> str:
         """Get the current API URL from config file or use default"""
         try:
-            if CONFIG_FILE.exists():
-                with open(CONFIG_FILE, "r") as f:
-                    config: dict[str, Any] = json.load(f)
-                    url = config.get("api_url", cls._api_url)
-                    return str(url) if url else cls._api_url
+            mtime = os.stat(CONFIG_FILE).st_mtime
+        except OSError:
+            return cls._api_url
+        cached = cls._api_url_cache
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(CONFIG_FILE, "r") as f:
+                config: dict[str, Any] = json.load(f)
+                api_url = str(config.get("api_url") or cls._api_url)
+                if cached is not None and cached[1] != api_url:
+                    cls.invalidate_cache()
+                cls._api_url_cache = (mtime, api_url)
+                return api_url
         except Exception as e:
             logging.warning(f"Failed to read API config: {e}")
         return cls._api_url
@@ -32,10 +204,18 @@ class Db:
     def set_api_url(cls, url: str) -> bool:
         """Save API URL to config file"""
         try:
+            previous_url = cls.get_api_url()
             CONFIG_FILE.parent.mkdir(parents=True, exist_ok=True)
             with open(CONFIG_FILE, "w") as f:
                 json.dump({"api_url": url}, f)
+            if url != previous_url:
+                # Cached and replicated data belong to the previous server
+                from tools.toolbox import replica
+
+                cls.invalidate_cache()
+                replica.clear()
             cls._api_url = url
+            cls._api_url_cache = (os.stat(CONFIG_FILE).st_mtime, url)
             logging.info(f"API URL updated to: {url}")
             return True
         except Exception as e:
@@ -46,7 +226,7 @@ class Db:
     def check_connection(cls) -> bool:
         try:
             api_url = cls.get_api_url()
-            response = requests.get(api_url, timeout=5)
+            response = cls.session(retry=False).get(api_url, timeout=5)
             if response.status_code == 200:
                 return True
         except requests.exceptions.ConnectionError:
@@ -57,14 +237,12 @@ class Db:
 
     @classmethod
     def get_data(cls, model: str) -> Any:
-        api_url = cls.get_api_url()
-        response = requests.get(f"{api_url}/{model}")
+        response = cls.request("GET", model)
         return response.json()
 
     @classmethod
     def get_by_id_or_name(cls, id: Union[int, str], model: str) -> Any:
-        api_url = cls.get_api_url()
-        response = requests.get(f"{api_url}/{model}/{id}")
+        response = cls.request("GET", f"{model}/{id}")
         if response.status_code == 404:
             logging.warning(f"Resource with id/name {id} not found in {model}.")
             return None
@@ -72,28 +250,188 @@ class Db:
 
     @classmethod
     def post_data(cls, data: dict, model: str) -> Any:
-        api_url = cls.get_api_url()
-        response = requests.post(f"{api_url}/{model}", json=data)
+        response = cls.request("POST", model, json=data)
         return response.json()
 
     @classmethod
     def delete_data(cls, id: Union[int, str], model: str) -> Any:
-        api_url = cls.get_api_url()
-        response = requests.delete(f"{api_url}/{model}/{id}")
+        response = cls.request("DELETE", f"{model}/{id}")
         return response.json()
 
     @classmethod
     def update_data(cls, id: Union[str, int], data: dict, model: str) -> Any:
-        api_url = cls.get_api_url()
-        response = requests.put(f"{api_url}/{model}/{id}", json=data)
+        response = cls.request("PUT", f"{model}/{id}", json=data)
         return response.json()
 
+    @classmethod
+    def bulk_post(
+        cls, items: Sequence[dict], model: str, chunk_size: int = BULK_CHUNK_SIZE, ordered: bool = False
+    ) -> list[BulkResult]:
+        """
+        Create many records, chunk_size at a time. Each chunk goes to the API's
+        <model>/bulk endpoint if it has one, otherwise as concurrent single
+        requests over the connection pool, or one after the other if `ordered`
+        (records are created in input order, e.g. logs).
+
+        Returns:
+            One BulkResult per item, in input order
+        """
+        return cls._bulk(
+            "POST", model, list(items), lambda i: cls.request("POST", model, json=items[i]), chunk_size, ordered
+        )
+
+    @classmethod
+    def bulk_update(
+        cls, updates: Sequence[tuple[Union[int, str], dict]], model: str, chunk_size: int = BULK_CHUNK_SIZE
+    ) -> list[BulkResult]:
+        """Update many records given (id, data) pairs, see bulk_post."""
+        payload = [{"id": record_id, **data} for record_id, data in updates]
+        return cls._bulk(
+            "PUT",
+            model,
+            payload,
+            lambda i: cls.request("PUT", f"{model}/{updates[i][0]}", json=updates[i][1]),
+            chunk_size,
+        )
+
+    @classmethod
+    def bulk_delete(cls, ids: Sequence[Union[int, str]], model: str, chunk_size: int = BULK_CHUNK_SIZE) -> list[BulkResult]:
+        """Delete many records by id, see bulk_post."""
+        return cls._bulk("DELETE", model, list(ids), lambda i: cls.request("DELETE", f"{model}/{ids[i]}"), chunk_size)
+
+    @classmethod
+    def _bulk(
+        cls,
+        method: str,
+        model: str,
+        items: list[Any],
+        send_one: Callable[[int], requests.Response],
+        chunk_size: int,
+        ordered: bool = False,
+    ) -> list[BulkResult]:
+        chunk_size = max(chunk_size, 1)
+        results: list[BulkResult] = []
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start:start + chunk_size]
+            chunk_results = cls._send_bulk_chunk(method, model, chunk, start)
+            if chunk_results is None:
+                chunk_results = cls._send_singles(range(start, start + len(chunk)), send_one, ordered)
+            results.extend(chunk_results)
+        return results
+
+    @classmethod
+    def _probe_bulk_routes(cls) -> Optional[set[tuple[str, str]]]:
+        """Bulk routes listed in the API's OpenAPI schema, fetched once."""
+        if not cls._bulk_routes_probed:
+            try:
+                response = cls.request("GET", "openapi.json", use_replica=False)
+            except requests.exceptions.RequestException:
+                # Probed again on the next bulk call
+                return None
+            cls._bulk_routes_probed = True
+            try:
+                paths = response.json().get("paths") if response.ok else None
+            except (ValueError, AttributeError):
+                paths = None
+            if isinstance(paths, dict):
+                cls._bulk_routes = {
+                    (method.upper(), path.strip("/").split("/")[-2])
+                    for path, operations in paths.items()
+                    if path.strip("/").endswith("/bulk") and isinstance(operations, dict)
+                    for method in operations
+                }
+                logging.debug(f"Bulk routes: {sorted(cls._bulk_routes)}")
+        return cls._bulk_routes
+
+    @classmethod
+    def _send_bulk_chunk(cls, method: str, model: str, chunk: list[Any], offset: int) -> Optional[list[BulkResult]]:
+        """Send a chunk to <model>/bulk, or return None if the API has no such endpoint."""
+        key = (method, model)
+        supported = cls._bulk_support.get(key)
+        if supported is None:
+            routes = cls._probe_bulk_routes()
+            if routes is not None:
+                supported = cls._bulk_support[key] = key in routes
+            elif method != "POST":
+                # Without a schema, PUT or DELETE <model>/bulk could reach the
+                # route of a record, e.g. one named "bulk"
+                supported = cls._bulk_support[key] = False
+        if supported is False:
+            return None
+        body = {"ids": chunk} if method == "DELETE" else chunk
+        try:
+            response = cls.request(method, f"{model}/bulk", json=body)
+        except requests.exceptions.RequestException as e:
+            return [BulkResult(offset + i, False, error=str(e)) for i in range(len(chunk))]
+        if response.status_code in (404, 405, 501):
+            logging.debug(f"No bulk endpoint for {model}, sending items individually")
+            cls._bulk_support[key] = False
+            return None
+        if response.status_code in (400, 422):
+            if supported is None and not _is_item_validation_error(response):
+                # "bulk" was validated as an id, or the list as a single record
+                logging.debug(f"No bulk endpoint for {model}, sending items individually")
+                cls._bulk_support[key] = False
+            else:
+                cls._bulk_support[key] = True
+            # The single requests that follow report which items failed
+            return None
+        cls._bulk_support[key] = True
+        if not response.ok:
+            error = f"{response.status_code}: {response.text[:200]}"
+            return [
+                BulkResult(offset + i, False, error=error, status_code=response.status_code)
+                for i in range(len(chunk))
+            ]
+        data = response.json() if response.content else None
+        if isinstance(data, list) and len(data) == len(chunk):
+            return [
+                BulkResult(offset + i, True, data=item, status_code=response.status_code)
+                for i, item in enumerate(data)
+            ]
+        return [BulkResult(offset + i, True, data=data, status_code=response.status_code) for i in range(len(chunk))]
+
+    @classmethod
+    def _send_singles(
+        cls, indexes: range, send_one: Callable[[int], requests.Response], ordered: bool = False
+    ) -> list[BulkResult]:
+        def send(index: int) -> BulkResult:
+            try:
+                response = send_one(index)
+            except requests.exceptions.RequestException as e:
+                return BulkResult(index, False, error=str(e))
+            try:
+                data = response.json() if response.content else None
+            except ValueError:
+                data = response.text
+            if not response.ok:
+                error = f"{response.status_code}: {response.text[:200]}"
+                return BulkResult(index, False, data=data, error=error, status_code=response.status_code)
+            return BulkResult(index, True, data=data, status_code=response.status_code)
+
+        if not indexes:
+            return []
+        if ordered:
+            results: list[BulkResult] = []
+            for index in indexes:
+                results.append(send(index))
+                if results[-1].status_code is None:
+                    # Stop so the rest can be retried later without reordering
+                    results.extend(
+                        BulkResult(i, False, error="Not sent, API unreachable") for i in indexes[len(results):]
+                    )
+                    break
+            return results
+        with ThreadPoolExecutor(max_workers=min(POOL_SIZE, len(indexes))) as executor:
+            return list(executor.map(send, indexes))
+
     @classmethod
     def ping(cls, times: int) -> bool:
         api_url = cls.get_api_url()
         for i in range(times):
             try:
-                response = requests.get(f"{api_url}/health", timeout=5)
+                # The loop does its own retrying, so skip the adapter's backoff
+                response = cls.session(retry=False).get(f"{api_url}/health", timeout=5)
                 logging.info(f"Response status code: {response.status_code}")
                 if response.status_code == 200:
                     try:
@@ -107,3 +445,7 @@ class Db:
                 logging.warning(f"Connection attempt {i + 1} failed: {e}")
                 continue
         return False
+
+
+if os.environ.get("GALAGO_DB_CACHE") == "1":
+    Db.enable_cache()
@@ -0,0 +1,156 @@
+"""
+Read-through cache for Db GET requests.
+
+Responses are cached per API model (the first path segment, e.g. "labware" in
+"labware/12") for that model's TTL. Once an entry expires it is revalidated
+with If-None-Match/If-Modified-Since when the API sent an ETag or
+Last-Modified header, so an unchanged resource costs a 304 instead of a full
+body. Any POST/PUT/DELETE through Db drops every entry of the written model.
+
+Models without a TTL are never cached. Cached bodies are stored as bytes and
+parsed again on each hit, so callers can't mutate each other's results.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Seconds a cached response is served without asking the API
+DEFAULT_CACHE_TTLS: dict[str, float] = {
+    "labware": 300,
+    "workcells": 60,
+    "settings": 10,
+    "variables": 5,
+}
+
+_KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+def model_of(path: str) -> str:
+    """The model a request path belongs to, "plates/3/info?x=1" -> "plates"."""
+    return path.split("?", 1)[0].strip("/").split("/", 1)[0]
+
+
+@dataclass
+class CacheEntry:
+    content: bytes
+    headers: dict[str, str]
+    encoding: Optional[str]
+    url: str
+    expires_at: float
+
+    def to_response(self) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response._content = self.content
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.encoding = self.encoding
+        response.url = self.url
+        return response
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    revalidated: int = 0
+    invalidations: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "invalidations": self.invalidations,
+        }
+
+
+@dataclass
+class ResponseCache:
+    ttls: dict[str, float] = field(default_factory=lambda: dict(DEFAULT_CACHE_TTLS))
+    entries: dict[str, CacheEntry] = field(default_factory=dict)
+    model_stats: dict[str, CacheStats] = field(default_factory=dict)
+    # Bumped on invalidation, so a response fetched before a write isn't stored after it
+    generations: dict[str, int] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def caches(self, path: str) -> bool:
+        return self.ttls.get(model_of(path), 0) > 0
+
+    def _stats(self, model: str) -> CacheStats:
+        return self.model_stats.setdefault(model, CacheStats())
+
+    def get(self, path: str, send: Callable[[dict[str, str]], requests.Response]) -> requests.Response:
+        """
+        Serve a GET for `path` from the cache, revalidating or fetching it with
+        `send(extra_headers)` when needed.
+        """
+        model = model_of(path)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry.expires_at > now:
+                self._stats(model).hits += 1
+                return entry.to_response()
+            generation = self.generations.setdefault(model, 0)
+
+        conditional: dict[str, str] = {}
+        if entry is not None:
+            if "ETag" in entry.headers:
+                conditional["If-None-Match"] = entry.headers["ETag"]
+            if "Last-Modified" in entry.headers:
+                conditional["If-Modified-Since"] = entry.headers["Last-Modified"]
+
+        response = send(conditional)
+        expires_at = time.monotonic() + self.ttls.get(model, 0)
+        with self.lock:
+            stats = self._stats(model)
+            current = self.generations.get(model, 0) == generation
+            if response.status_code == 304 and entry is not None:
+                stats.revalidated += 1
+                if current:
+                    entry.expires_at = expires_at
+                    self.entries[path] = entry
+                return entry.to_response()
+            stats.misses += 1
+            if response.status_code == 200 and current:
+                self.entries[path] = CacheEntry(
+                    content=response.content,
+                    headers={k: response.headers[k] for k in _KEPT_HEADERS if k in response.headers},
+                    encoding=response.encoding,
+                    url=response.url,
+                    expires_at=expires_at,
+                )
+            else:
+                self.entries.pop(path, None)
+        return response
+
+    def invalidate(self, model: Optional[str] = None) -> None:
+        """Drop all cached responses for `model`, or everything if model is None."""
+        with self.lock:
+            if model is None:
+                self.entries.clear()
+                for name in self.generations:
+                    self.generations[name] += 1
+                return
+            self.generations[model] = self.generations.get(model, 0) + 1
+            for path in [p for p in self.entries if model_of(p) == model]:
+                del self.entries[path]
+            self._stats(model).invalidations += 1
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Hit/miss counters per model, plus a "total" entry."""
+        with self.lock:
+            result = {model: stats.as_dict() for model, stats in self.model_stats.items()}
+        total = CacheStats()
+        for counts in result.values():
+            total.hits += counts["hits"]
+            total.misses += counts["misses"]
+            total.revalidated += counts["revalidated"]
+            total.invalidations += counts["invalidations"]
+        result["total"] = total.as_dict()
+        return result
@@ -1,5 +1,7 @@
-from tools.toolbox.db import Db 
-from typing import Any, Dict, Optional
+from tools.toolbox.db import BULK_CHUNK_SIZE, BulkResult, Db 
+from tools.toolbox import async_inventory, reagent_index
+from tools.toolbox.async_db import run_sync
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 db = Db()
 
@@ -64,11 +66,42 @@ def delete_plate(plate_id: int) -> Any:
     response = db.delete_data(plate_id, "plates")
     return response
 
+def create_plates(plates_data: List[Dict[str, Any]], chunk_size: int = BULK_CHUNK_SIZE) -> List[BulkResult]:
+    """Create many plates. Returns one BulkResult per plate, in order."""
+    return db.bulk_post(plates_data, "plates", chunk_size)
+
+def update_plates(updates: List[Tuple[int, Dict[str, Any]]], chunk_size: int = BULK_CHUNK_SIZE) -> List[BulkResult]:
+    """Update many plates from (plate_id, plate_data) pairs."""
+    return db.bulk_update(updates, "plates", chunk_size)
+
+def delete_plates(plate_ids: List[int], chunk_size: int = BULK_CHUNK_SIZE) -> List[BulkResult]:
+    return db.bulk_delete(plate_ids, "plates", chunk_size)
+
 # Well functions
 def get_wells(plate_id: int) -> Any:
     response = db.get_data(f"wells?plate_id={plate_id}")
     return response
 
+def create_wells(wells_data: List[Dict[str, Any]], chunk_size: int = BULK_CHUNK_SIZE) -> List[BulkResult]:
+    """Create many wells. Returns one BulkResult per well, in order."""
+    return db.bulk_post(wells_data, "wells", chunk_size)
+
+def update_wells(updates: List[Tuple[int, Dict[str, Any]]], chunk_size: int = BULK_CHUNK_SIZE) -> List[BulkResult]:
+    """Update many wells from (well_id, well_data) pairs."""
+    return db.bulk_update(updates, "wells", chunk_size)
+
+def delete_wells(well_ids: List[int], chunk_size: int = BULK_CHUNK_SIZE) -> List[BulkResult]:
+    return db.bulk_delete(well_ids, "wells", chunk_size)
+
+def get_wells_for_plates(plate_ids: Iterable[int]) -> Dict[int, Any]:
+    """Wells of several plates, fetched concurrently. Returns {plate_id: wells}."""
+    return run_sync(async_inventory.get_wells_for_plates(plate_ids))
+
+def get_plates_contents(plate_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    """Wells and reagents of several plates, fetched concurrently.
+    Returns {plate_id: {"wells": [...], "reagents": [...]}}."""
+    return run_sync(async_inventory.get_plates_contents(plate_ids))
+
 # Reagent functions
 def get_reagents(plate_id: int) -> Any:
     response = db.get_data(f"reagents?plate_id={plate_id}")
@@ -78,18 +111,56 @@ def get_workcell_reagents(workcell_name: str) -> Any:
     response = db.get_data(f"reagents?workcell_name={workcell_name}")
     return response
 
+def get_reagents_for_plates(plate_ids: Iterable[int]) -> Dict[int, Any]:
+    """Reagents of several plates, fetched concurrently. Returns {plate_id: reagents}."""
+    return run_sync(async_inventory.get_reagents_for_plates(plate_ids))
+
 def create_reagent(reagent_data: Dict[str, Any]) -> Any:
     response = db.post_data(reagent_data, "reagents")
+    reagent_index.record_reagents([response])
     return response
 
 def update_reagent(reagent_id: int, reagent_data: Dict[str, Any]) -> Any:
     response = db.update_data(reagent_id, reagent_data, "reagents")
+    reagent_index.record_reagents([_updated_reagent(reagent_id, reagent_data, response)])
     return response
 
 def delete_reagent(reagent_id: int) -> Any:
     response = db.delete_data(reagent_id, "reagents")
+    reagent_index.forget_reagents([reagent_id])
     return response
 
+def _updated_reagent(reagent_id: int, reagent_data: Dict[str, Any], response: Any) -> Dict[str, Any]:
+    if isinstance(response, dict) and response.get("id") == reagent_id:
+        return response
+    return {**reagent_data, "id": reagent_id}
+
+def create_reagents(reagents_data: List[Dict[str, Any]], chunk_size: int = BULK_CHUNK_SIZE) -> List[BulkResult]:
+    """
+    Create many reagents, e.g. one per well of a 384 well plate. Failed items
+    come back with ok=False and an error instead of aborting the batch.
+    """
+    results = db.bulk_post(reagents_data, "reagents", chunk_size)
+    reagent_index.record_reagents(r.data for r in results if r.ok)
+    return results
+
+def update_reagents(updates: List[Tuple[int, Dict[str, Any]]], chunk_size: int = BULK_CHUNK_SIZE) -> List[BulkResult]:
+    """Update many reagents from (reagent_id, reagent_data) pairs."""
+    results = db.bulk_update(updates, "reagents", chunk_size)
+    reagent_index.record_reagents(
+        _updated_reagent(*updates[r.index], r.data) for r in results if r.ok
+    )
+    return results
+
+def delete_reagents(reagent_ids: List[int], chunk_size: int = BULK_CHUNK_SIZE) -> List[BulkResult]:
+    results = db.bulk_delete(reagent_ids, "reagents", chunk_size)
+    reagent_index.forget_reagents(reagent_ids[r.index] for r in results if r.ok)
+    return results
+
+def get_reagent_index(workcell_name: str) -> reagent_index.ReagentIndex:
+    """The local reagent index for a workcell, see tools.toolbox.reagent_index."""
+    return reagent_index.get_index(workcell_name, get_workcell_reagents)
+
 def get_reagents_by_name_and_quantity(reagent_name: str, quantity: int, workcell_name: str) -> Any:
     """
     Returns an array of reagents with the specified name and quantity from a single plate.
@@ -102,34 +173,20 @@ def get_reagents_by_name_and_quantity(reagent_name: str, quantity: int, workcell
     Returns:
         A list of matching reagents or raises an exception if none found
     """
-    # Get all reagents for the workcell
-    all_reagents = get_workcell_reagents(workcell_name)
-    
-    # Filter reagents by name and quantity
-    matching_reagents = [r for r in all_reagents if r.get("name") == reagent_name and r.get("quantity", 0) >= quantity]
-    
-    if not matching_reagents:
+    best = get_reagent_index(workcell_name).best_plate(reagent_name, quantity)
+    if best is None:
         raise Exception(f"No reagents found with name '{reagent_name}' and quantity {quantity} in workcell '{workcell_name}'")
-    
-    # Group reagents by plate_id
-    reagents_by_plate = {}
-    for reagent in matching_reagents:
-        plate_id = reagent.get("plate_id")
-        if plate_id not in reagents_by_plate:
-            reagents_by_plate[plate_id] = []
-        reagents_by_plate[plate_id].append(reagent)
-    
-    # Find the plate with the most matching reagents
-    best_plate_id = None
-    max_reagents = 0
-    for plate_id, reagents in reagents_by_plate.items():
-        if len(reagents) > max_reagents:
-            max_reagents = len(reagents)
-            best_plate_id = plate_id
-    
-    if best_plate_id is None:
-        raise Exception(f"Could not determine a suitable plate for reagent '{reagent_name}' with quantity {quantity}")
-    
-    return reagents_by_plate[best_plate_id]
- 
+    return best[1]
+
+def get_reagent_plates_for_quantity(reagent_name: str, total_quantity: float, workcell_name: str) -> List[Tuple[Any, List[Dict[str, Any]]]]:
+    """
+    The fewest plates that together hold `total_quantity` of a reagent.
 
+    Returns:
+        [(plate_id, reagents), ...], fullest plate first. Raises an exception if
+        the workcell doesn't hold enough
+    """
+    plates = get_reagent_index(workcell_name).plates_for_total(reagent_name, total_quantity)
+    if plates is None:
+        raise Exception(f"Not enough '{reagent_name}' in workcell '{workcell_name}' for quantity {total_quantity}")
+    return plates
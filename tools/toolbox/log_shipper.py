@@ -0,0 +1,238 @@
+"""
+Background shipping of toolbox.logging.add_log records.
+
+Records are queued and sent from a daemon thread in batches of up to
+LOG_BATCH_SIZE, or whatever has queued up after LOG_FLUSH_INTERVAL seconds, so
+logging from instrument code never waits on the API. Batches go through
+Db.bulk_post in order.
+
+When the API can't be reached, records are appended to DATA_DIR/log_spool.jsonl
+instead, and every later record follows them there until the spool has been
+replayed, so logs reach the API in the order they were written. A replay
+first moves the spool aside (log_spool.replaying.jsonl) and saves its position
+after every batch in log_spool.offset, so a crash part way through doesn't
+send records twice; a lock file keeps other tool processes from replaying it
+at the same time. Records the API rejects (4xx) are dropped
+with an error instead of being retried forever.
+
+Queued records are flushed when the interpreter exits.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+from tools.toolbox.db import DATA_DIR, BulkResult, Db
+
+LOG_BATCH_SIZE = 50
+LOG_FLUSH_INTERVAL = 1.0  # Seconds a record may wait for its batch to fill
+LOG_RETRY_INTERVAL = 30.0  # Seconds between spool replays while the API is down
+SPOOL_FILE = DATA_DIR / "log_spool.jsonl"
+REPLAY_FILE = DATA_DIR / "log_spool.replaying.jsonl"
+SPOOL_OFFSET_FILE = DATA_DIR / "log_spool.offset"
+REPLAY_LOCK_FILE = DATA_DIR / "log_spool.lock"
+STALE_LOCK_AGE = 600.0
+EXIT_FLUSH_TIMEOUT = 5.0
+
+
+class LogShipper:
+    def __init__(self, batch_size: int = LOG_BATCH_SIZE, flush_interval: float = LOG_FLUSH_INTERVAL) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue()
+        self._spool_lock = threading.Lock()
+        self._next_replay = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="galago-log-shipper", daemon=True)
+                self._thread.start()
+
+    def ship(self, record: dict) -> None:
+        self.start()
+        self._queue.put(record)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued so far is sent or spooled."""
+        if self._thread is None:
+            return True
+        # Wakes the worker so it doesn't wait for the batch to fill
+        self._queue.put(None)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self._queue.get(timeout=LOG_RETRY_INTERVAL)
+            except queue.Empty:
+                self._replay_spool()
+                continue
+            items = [first]
+            if first is not None:
+                deadline = time.monotonic() + self.flush_interval
+                while len(items) < self.batch_size:
+                    try:
+                        record = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        break
+                    items.append(record)
+                    if record is None:
+                        break
+            batch = [record for record in items if record is not None]
+            try:
+                if batch:
+                    self._send(batch)
+            except Exception as e:
+                logging.error(f"Failed to ship {len(batch)} log records: {e}")
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+
+    def _send(self, batch: list[dict]) -> None:
+        if self._spool_pending() and not self._replay_spool():
+            self._append_to_spool(batch)
+            return
+        results = Db.bulk_post(batch, "logs", chunk_size=self.batch_size, ordered=True)
+        self._handle_results(batch, results)
+
+    def _handle_results(self, batch: list[dict], results: list[BulkResult]) -> bool:
+        """Spool what the API didn't receive. Returns True if nothing was spooled."""
+        for position, result in enumerate(results):
+            if result.ok:
+                continue
+            if _retryable(result):
+                logging.warning(f"Galago API unavailable, spooling logs to {SPOOL_FILE}")
+                self._append_to_spool(batch[position:])
+                self._next_replay = time.monotonic() + LOG_RETRY_INTERVAL
+                return False
+            logging.error(f"Galago API rejected log record: {result.error}")
+        return True
+
+    def _spool_pending(self) -> bool:
+        return any(path.exists() and path.stat().st_size > 0 for path in (REPLAY_FILE, SPOOL_FILE))
+
+    def _append_to_spool(self, records: list[dict]) -> None:
+        with self._spool_lock:
+            DATA_DIR.mkdir(parents=True, exist_ok=True)
+            with open(SPOOL_FILE, "a", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, default=str) + "\n")
+
+    def _replay_spool(self) -> bool:
+        """Send spooled records in order. Returns True once the spool is empty."""
+        if not self._spool_pending():
+            return True
+        if time.monotonic() < self._next_replay:
+            return False
+        with _replay_lock() as locked:
+            if not locked:
+                # Another process is replaying
+                return False
+            while self._spool_pending():
+                if not REPLAY_FILE.exists():
+                    # Later records start a new spool while this one is replayed
+                    with self._spool_lock:
+                        os.replace(SPOOL_FILE, REPLAY_FILE)
+                    _write_offset(0)
+                if not self._replay_file():
+                    self._next_replay = time.monotonic() + LOG_RETRY_INTERVAL
+                    return False
+                os.remove(REPLAY_FILE)
+                SPOOL_OFFSET_FILE.unlink(missing_ok=True)
+        logging.info("Replayed spooled logs to the galago API")
+        return True
+
+    def _replay_file(self) -> bool:
+        with open(REPLAY_FILE, "r", encoding="utf-8") as f:
+            f.seek(_read_offset())
+            while True:
+                batch, positions = [], []
+                for line in iter(f.readline, ""):
+                    if line.strip():
+                        batch.append(json.loads(line))
+                        positions.append(f.tell())
+                    if len(batch) >= self.batch_size:
+                        break
+                if not batch:
+                    return True
+                results = Db.bulk_post(batch, "logs", chunk_size=self.batch_size, ordered=True)
+                sent = next((i for i, r in enumerate(results) if not r.ok and _retryable(r)), len(batch))
+                if sent:
+                    _write_offset(positions[sent - 1])
+                if sent < len(batch):
+                    return False
+
+
+def _retryable(result: BulkResult) -> bool:
+    return result.status_code is None or result.status_code >= 500
+
+
+@contextmanager
+def _replay_lock() -> Iterator[bool]:
+    """Cross-process lock so only one shipper replays the spool at a time."""
+    try:
+        if time.time() - os.path.getmtime(REPLAY_LOCK_FILE) > STALE_LOCK_AGE:
+            os.remove(REPLAY_LOCK_FILE)
+    except OSError:
+        pass
+    try:
+        fd = os.open(REPLAY_LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        os.close(fd)
+        os.remove(REPLAY_LOCK_FILE)
+
+
+def _read_offset() -> int:
+    try:
+        return int(SPOOL_OFFSET_FILE.read_text())
+    except (OSError, ValueError):
+        return 0
+
+
+def _write_offset(offset: int) -> None:
+    tmp = SPOOL_OFFSET_FILE.with_suffix(".tmp")
+    tmp.write_text(str(offset))
+    os.replace(tmp, SPOOL_OFFSET_FILE)
+
+
+_shipper: Optional[LogShipper] = None
+_shipper_lock = threading.Lock()
+
+
+def get_shipper() -> LogShipper:
+    global _shipper
+    with _shipper_lock:
+        if _shipper is None:
+            _shipper = LogShipper()
+            atexit.register(_flush_on_exit)
+        return _shipper
+
+
+def _flush_on_exit() -> None:
+    if _shipper is not None and not _shipper.flush(EXIT_FLUSH_TIMEOUT):
+        logging.warning("Timed out sending queued logs on exit")
+
+
+def ship_log(record: dict[str, Any]) -> None:
+    get_shipper().ship(record)
@@ -1,5 +1,7 @@
 from tools.toolbox.db import Db
-from typing import Any, Dict
+from tools.toolbox.log_shipper import get_shipper, ship_log
+from tools.toolbox.pagination import DEFAULT_PAGE_SIZE, iter_collection
+from typing import Any, Callable, Dict, Iterator, Optional
 
 db = Db()
 
@@ -19,6 +21,25 @@ def get_paginated_logs(skip: int, limit: int, descending: bool) -> Any:
     response = db.get_data(f"logs?skip={skip}&limit={limit}&descending={descending}")
     return response
 
+def iter_logs(
+    descending: bool = False,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    where: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    limit: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Iterate over logs one page at a time, prefetching the next page.
+    Unlike get_all_logs this runs in constant memory, e.g. for exports.
+
+    Args:
+        descending: Newest logs first
+        page_size: Logs fetched per request
+        where: Only yield logs this returns True for
+        limit: Stop after this many logs
+    """
+    return iter_collection(
+        "logs", page_size=page_size, params={"descending": descending}, where=where, limit=limit
+    )
+
 def clear_all_logs() -> Any:
     """Clear all logs from the database."""
     # The delete_data method typically requires an ID, but in this case,
@@ -26,11 +47,20 @@ def clear_all_logs() -> Any:
     response = db.delete_data("", "logs")
     return response
 
-def add_log(log_data: Dict[str, Any]) -> Any:
+def add_log(log_data: Dict[str, Any], wait: bool = False) -> Any:
     """Add a new log to the database.
     
     Args:
         log_data: Dictionary containing log information
+        wait: Post it right away and return the API response. By default the
+            log is queued and sent in the background (see log_shipper), and
+            None is returned.
     """
-    response = db.post_data(log_data, "logs")
-    return response
+    if wait:
+        return db.post_data(log_data, "logs")
+    ship_log(log_data)
+    return None
+
+def flush_logs(timeout: Optional[float] = None) -> bool:
+    """Block until logs queued by add_log have been sent or spooled."""
+    return get_shipper().flush(timeout)
@@ -0,0 +1,80 @@
+"""
+Lazy iteration over large API collections.
+
+iter_collection pages through a skip/limit endpoint and yields one record at a
+time, so only about two pages are ever held in memory. While the caller works
+through a page, the next one is already being fetched on a background thread.
+Stopping early (break, or limit) closes the generator and drops any
+outstanding prefetch.
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterator, Optional
+from urllib.parse import urlencode
+
+from tools.toolbox.db import Db
+
+DEFAULT_PAGE_SIZE = 500
+
+
+def iter_collection(
+    model: str,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    params: Optional[dict[str, Any]] = None,
+    where: Optional[Callable[[Any], bool]] = None,
+    limit: Optional[int] = None,
+    prefetch: bool = True,
+) -> Iterator[Any]:
+    """
+    Yield the records of `model` page by page.
+
+    Args:
+        model: API path, e.g. "logs"
+        page_size: Records requested per page
+        params: Extra query parameters, e.g. server side filters or ordering
+        where: Client side filter, records it returns False for are skipped
+        limit: Stop after yielding this many records
+        prefetch: Fetch the next page while the current one is consumed
+
+    An endpoint that ignores skip/limit and returns everything at once is
+    detected by the first page being larger than page_size, and is yielded
+    as a single page.
+    """
+    if limit is not None and limit <= 0:
+        return
+    separator = "&" if "?" in model else "?"
+
+    def fetch(skip: int) -> list:
+        query = urlencode({**(params or {}), "skip": skip, "limit": page_size})
+        page = Db.get_data(f"{model}{separator}{query}")
+        return page if isinstance(page, list) else []
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="galago-prefetch") if prefetch else None
+    pending: Optional[Future] = None
+    yielded = 0
+    skip = 0
+    try:
+        page = fetch(skip)
+        while page:
+            last_page = len(page) != page_size
+            skip += len(page)
+            if executor is not None and not last_page:
+                pending = executor.submit(fetch, skip)
+            for record in page:
+                if where is not None and not where(record):
+                    continue
+                yield record
+                yielded += 1
+                if limit is not None and yielded >= limit:
+                    return
+            if last_page:
+                return
+            if pending is not None:
+                page, pending = pending.result(), None
+            else:
+                page = fetch(skip)
+    finally:
+        if pending is not None:
+            pending.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False)
@@ -3,7 +3,26 @@ import os
 import logging
 import typing as t
 import tempfile
-import shutil
+import hashlib
+
+from tools.toolbox import script_workers
+from tools.toolbox.script_limits import (
+    ScriptCancelled,
+    ScriptLimitExceeded,
+    ScriptLimits,
+    kill_tree,
+    popen_poll,
+    process_group_kwargs,
+    set_nice,
+    supervise,
+)
+from tools.toolbox.script_output import DATA_DIR, LineCallback, ScriptOutput
+
+# Scripts are stored once per content hash, so repeated protocol steps reuse
+# the same file and the bytecode workers cache for it
+SCRIPT_CACHE_DIR = DATA_DIR / "script_cache"
+SCRIPT_RUN_DIR = SCRIPT_CACHE_DIR / "runs"
+MAX_CACHED_SCRIPTS = 500
 
 
 def write_to_file(file_name: str, content: str) -> None:
@@ -11,58 +30,161 @@ def write_to_file(file_name: str, content: str) -> None:
         f.write(content)
 
 
+def cache_script(script_content: str) -> str:
+    """Path of the cached copy of a script, written on first use."""
+    digest = hashlib.sha256(script_content.encode("utf-8")).hexdigest()
+    path = SCRIPT_CACHE_DIR / f"{digest}.py"
+    if path.exists():
+        # Keeps recently used scripts out of the pruning below
+        os.utime(path)
+        return str(path)
+    SCRIPT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{digest}.{os.getpid()}.tmp")
+    write_to_file(str(tmp), script_content)
+    os.replace(tmp, path)
+    _prune_script_cache()
+    return str(path)
+
+
+def _prune_script_cache() -> None:
+    scripts = sorted(SCRIPT_CACHE_DIR.glob("*.py"), key=lambda p: p.stat().st_mtime)
+    for old in scripts[:-MAX_CACHED_SCRIPTS]:
+        for cached in SCRIPT_CACHE_DIR.glob(f"{old.stem}.*"):
+            cached.unlink(missing_ok=True)
+
+
 def run_python_script(
-    script_content: str, 
+    script_content: str,
+    blocking: bool = True,
+    python_exe: t.Optional[str] = None,
+    on_line: t.Optional[LineCallback] = None,
+    keep_output: bool = True,
+    limits: t.Optional[ScriptLimits] = None,
+    cancelled: t.Optional[t.Callable[[], bool]] = None,
+) -> t.Optional[str]:
+    """
+    Run a python script and return its combined stdout and stderr.
+
+    While a blocking script runs, each line it prints goes to the tool log and
+    to `on_line`. Long output is returned as its head and tail; with
+    `keep_output` the full output is kept in SCRIPT_OUTPUT_DIR and the
+    truncation marker says where.
+
+    A blocking script is killed, along with anything it started, when it breaks
+    `limits` or `cancelled` returns True, raising ScriptLimitExceeded or
+    ScriptCancelled. Non-blocking scripts only get the niceness.
+    """
+    try:
+        script = cache_script(script_content)
+    except OSError as e:
+        raise RuntimeError(f"Failed to write script to {SCRIPT_CACHE_DIR}: {e}")
+    return _run(script, blocking, python_exe, on_line, keep_output, limits, cancelled, cache_bytecode=True)
+
+
+def run_python_file(
+    path: str,
     blocking: bool = True,
-    python_exe: t.Optional[str] = None
+    python_exe: t.Optional[str] = None,
+    on_line: t.Optional[LineCallback] = None,
+    keep_output: bool = True,
+    limits: t.Optional[ScriptLimits] = None,
+    cancelled: t.Optional[t.Callable[[], bool]] = None,
 ) -> t.Optional[str]:
+    """
+    Like run_python_script, for a script file on disk. The file runs in place,
+    so __file__ and imports next to it work, and workers recompile it only when
+    its modification time or size changes.
+    """
+    if not os.path.isfile(path):
+        raise RuntimeError(f"Script not found: {path}")
+    return _run(os.path.abspath(path), blocking, python_exe, on_line, keep_output, limits, cancelled, cache_bytecode=False)
 
+
+def _run(
+    script: str,
+    blocking: bool,
+    python_exe: t.Optional[str],
+    on_line: t.Optional[LineCallback],
+    keep_output: bool,
+    limits: t.Optional[ScriptLimits],
+    cancelled: t.Optional[t.Callable[[], bool]],
+    cache_bytecode: bool,
+) -> t.Optional[str]:
+    limits = limits or ScriptLimits()
     python_executable = python_exe if python_exe else "python"
     logging.info(f"Using python executable: {python_executable}")
     # Validate the executable exists if a full path was provided
     if python_exe and not os.path.isfile(python_exe):
         raise RuntimeError(f"Python executable not found: {python_exe}")
-    
-    # Create temporary directory and files
-    temp_dir = tempfile.mkdtemp()
-    temp_script = os.path.join(temp_dir, "temp_script.py")
-    stdout_file = os.path.join(temp_dir, "stdout.txt")
-    
+
+    if not blocking:
+        try:
+            # Nobody reads the output of a script that isn't waited for
+            process = subprocess.Popen([python_executable, script], stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+            if limits.nice is not None:
+                set_nice(process.pid, limits.nice)
+        except FileNotFoundError:
+            raise RuntimeError(f"Python executable not found: {python_executable}")
+        return None
+
+    SCRIPT_RUN_DIR.mkdir(parents=True, exist_ok=True)
+    fd, stdout_file = tempfile.mkstemp(suffix=".txt", dir=SCRIPT_RUN_DIR)
+    os.close(fd)
+    head = tail = None
+    if limits.max_output:
+        head = limits.max_output // 2
+        tail = limits.max_output - head
+    output = ScriptOutput(stdout_file, on_line, head, tail).start()
+
     try:
-        write_to_file(temp_script, script_content)
-        cmd = [python_executable, temp_script]
-        
-        # Execute script
-        with open(stdout_file, 'w', encoding='utf-8') as f:
-            process = subprocess.Popen(
-                cmd,
-                stdout=f,
-                stderr=subprocess.STDOUT
+        returncode = None
+        if script_workers.enabled():
+            try:
+                returncode = script_workers.get_pool(python_exe).run(
+                    script, stdout_file, cache_bytecode, limits, cancelled
+                )
+            except script_workers.WorkerStartError as e:
+                logging.warning(f"No python worker available, starting a new interpreter: {e}")
+
+        if returncode is None:
+            # Unbuffered, so output can be followed while the script runs
+            cmd = [python_executable, "-u", script]
+
+            # Execute script
+            with open(stdout_file, 'w', encoding='utf-8') as f:
+                process = subprocess.Popen(
+                    cmd,
+                    stdout=f,
+                    stderr=subprocess.STDOUT,
+                    **process_group_kwargs()
+                )
+                if limits.nice is not None:
+                    set_nice(process.pid, limits.nice)
+                returncode = supervise(process.pid, popen_poll(process), lambda: kill_tree(process), limits, cancelled)
+
+        output.finish()
+        saved = output.save() if keep_output and output.truncated else None
+        result = output.text(saved)
+        if returncode != 0:
+            raise RuntimeError(
+                f"Script failed with return code {returncode}. Output:\n{result}"
             )
-            
-            if blocking:
-                process.wait()
-                with open(stdout_file, 'r', encoding='utf-8') as output_f:
-                    output = output_f.read()
-                if process.returncode != 0:
-                    raise RuntimeError(
-                        f"Script failed with return code {process.returncode}. Output:\n{output}"
-                    )
-                
-                return output
-            
-            return None
-            
+
+        return result
+
+    except (ScriptLimitExceeded, ScriptCancelled) as e:
+        output.finish()
+        logging.error(f"Error while running script: {e}")
+        raise type(e)(f"{e}. Output:\n{output.text()}") from None
     except FileNotFoundError:
         raise RuntimeError(f"Python executable not found: {python_executable}")
     except Exception as e:
         logging.error(f"Error while running script: {e}")
         raise
     finally:
-        # Cleanup temporary files
-        logging.info("Cleaning up temporary files")
+        output.finish()
         try:
-            shutil.rmtree(temp_dir)
-        except Exception as e:
-            logging.warning(f"Failed to cleanup temporary directory: {e}")
+            os.remove(stdout_file)
+        except OSError as e:
+            logging.warning(f"Failed to remove script output file: {e}")
 
@@ -0,0 +1,179 @@
+"""
+Local index of a workcell's reagents: name -> plate -> reagents.
+
+The index is loaded from the API once and refreshed when it is older than
+REAGENT_INDEX_TTL. A refresh diffs the snapshot into the existing index, so
+only changed reagents are touched. Reagent writes made through the toolbox
+inventory helpers are applied to the index directly. Lookups never go over the
+network unless the index is due for a refresh, and cost O(matching reagents).
+"""
+
+import threading
+import time
+from typing import Any, Callable, Iterable, Optional
+
+REAGENT_INDEX_TTL = 10.0  # Seconds before the next lookup re-syncs with the API
+
+Reagent = dict[str, Any]
+
+
+class ReagentIndex:
+    def __init__(self, workcell_name: str, fetch: Callable[[str], Any], ttl: float = REAGENT_INDEX_TTL) -> None:
+        self.workcell_name = workcell_name
+        self.ttl = ttl
+        self._fetch = fetch
+        self._lock = threading.RLock()
+        self._by_id: dict[Any, Reagent] = {}
+        # name -> plate_id -> reagent_id -> reagent, in API order
+        self._by_name: dict[str, dict[Any, dict[Any, Reagent]]] = {}
+        self._plate_counts: dict[Any, int] = {}
+        self._refreshed_at: Optional[float] = None
+
+    def has_plate(self, plate_id: Any) -> bool:
+        with self._lock:
+            return plate_id in self._plate_counts
+
+    def is_stale(self) -> bool:
+        return self._refreshed_at is None or time.monotonic() - self._refreshed_at > self.ttl
+
+    def invalidate(self) -> None:
+        """Force a refresh on the next lookup."""
+        self._refreshed_at = None
+
+    def refresh(self, force: bool = False) -> None:
+        with self._lock:
+            if not force and not self.is_stale():
+                return
+            reagents = self._fetch(self.workcell_name) or []
+            seen = set()
+            for reagent in reagents:
+                seen.add(reagent.get("id"))
+                if self._by_id.get(reagent.get("id")) != reagent:
+                    self.upsert(reagent)
+            for reagent_id in [r for r in self._by_id if r not in seen]:
+                self.remove(reagent_id)
+            self._refreshed_at = time.monotonic()
+
+    def upsert(self, reagent: Reagent) -> None:
+        """Add or replace one reagent, e.g. after a create/update call."""
+        with self._lock:
+            reagent_id = reagent.get("id")
+            if reagent_id in self._by_id:
+                self.remove(reagent_id)
+            self._by_id[reagent_id] = reagent
+            plate_id = reagent.get("plate_id")
+            plates = self._by_name.setdefault(reagent.get("name", ""), {})
+            plates.setdefault(plate_id, {})[reagent_id] = reagent
+            self._plate_counts[plate_id] = self._plate_counts.get(plate_id, 0) + 1
+
+    def remove(self, reagent_id: Any) -> None:
+        with self._lock:
+            reagent = self._by_id.pop(reagent_id, None)
+            if reagent is None:
+                return
+            name, plate_id = reagent.get("name", ""), reagent.get("plate_id")
+            self._plate_counts[plate_id] -= 1
+            if not self._plate_counts[plate_id]:
+                del self._plate_counts[plate_id]
+            plates = self._by_name.get(name, {})
+            plate = plates.get(plate_id, {})
+            plate.pop(reagent_id, None)
+            if not plate:
+                plates.pop(plate_id, None)
+            if not plates:
+                self._by_name.pop(name, None)
+
+    def get(self, reagent_id: Any) -> Optional[Reagent]:
+        with self._lock:
+            return self._by_id.get(reagent_id)
+
+    def plates_with(self, name: str, quantity: float = 0) -> dict[Any, list[Reagent]]:
+        """
+        Reagents named `name` holding at least `quantity` each, grouped by plate.
+
+        Returns:
+            {plate_id: [reagent, ...]}, plates in the order the API listed them
+        """
+        self.refresh()
+        with self._lock:
+            result = {}
+            for plate_id, reagents in self._by_name.get(name, {}).items():
+                matching = [r for r in reagents.values() if r.get("quantity", 0) >= quantity]
+                if matching:
+                    result[plate_id] = matching
+            return result
+
+    def find(self, name: str, quantity: float = 0) -> list[Reagent]:
+        return [r for reagents in self.plates_with(name, quantity).values() for r in reagents]
+
+    def best_plate(self, name: str, quantity: float) -> Optional[tuple[Any, list[Reagent]]]:
+        """The plate with the most `name` reagents holding at least `quantity` each."""
+        best: Optional[tuple[Any, list[Reagent]]] = None
+        for plate_id, reagents in self.plates_with(name, quantity).items():
+            if best is None or len(reagents) > len(best[1]):
+                best = (plate_id, reagents)
+        return best
+
+    def plates_for_total(self, name: str, total_quantity: float) -> Optional[list[tuple[Any, list[Reagent]]]]:
+        """
+        The fewest plates whose `name` reagents add up to `total_quantity`.
+        Taking the fullest plates first is optimal for the plate count.
+
+        Returns:
+            [(plate_id, reagents), ...], or None if the workcell doesn't hold enough
+        """
+        plates = sorted(
+            self.plates_with(name).items(),
+            key=lambda item: sum(r.get("quantity", 0) for r in item[1]),
+            reverse=True,
+        )
+        chosen = []
+        remaining = total_quantity
+        for plate_id, reagents in plates:
+            if remaining <= 0:
+                break
+            chosen.append((plate_id, reagents))
+            remaining -= sum(r.get("quantity", 0) for r in reagents)
+        return chosen if remaining <= 0 else None
+
+
+_indexes: dict[str, ReagentIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(workcell_name: str, fetch: Callable[[str], Any]) -> ReagentIndex:
+    with _indexes_lock:
+        index = _indexes.get(workcell_name)
+        if index is None:
+            index = _indexes[workcell_name] = ReagentIndex(workcell_name, fetch)
+        return index
+
+
+def record_reagents(reagents: Iterable[Any]) -> None:
+    """
+    Apply created or updated reagents to every index that holds their plate.
+    Reagents on plates no index knows about mark all indexes for a refresh,
+    since the plate may belong to any workcell.
+    """
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for reagent in reagents:
+        if not isinstance(reagent, dict) or "id" not in reagent:
+            continue
+        known = False
+        for index in indexes:
+            existing = index.get(reagent["id"])
+            if existing is not None or index.has_plate(reagent.get("plate_id")):
+                index.upsert({**(existing or {}), **reagent})
+                known = True
+        if not known:
+            for index in indexes:
+                index.invalidate()
+
+
+def forget_reagents(reagent_ids: Iterable[Any]) -> None:
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for reagent_id in reagent_ids:
+        for index in indexes:
+            index.remove(reagent_id)
@@ -0,0 +1,200 @@
+"""
+Local SQLite replica of the galago API data needed to start and run tools.
+
+The launcher keeps DATA_DIR/replica.db in sync from a background thread
+(start_sync). Every other process only reads it: when a GET through Db can't
+reach the API, Db serves the replicated response instead and logs how old it
+is, and Config.load_workcell_config starts tools from the replicated workcell.
+
+Each replicated model is stored per request path: the list ("labware") and one
+row per item under both its id and its name ("labware/3", "labware/96 well"),
+which is what get_data and get_by_id_or_name ask for. A sync still downloads
+each list, but only rewrites items whose updated_at (or content) changed.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+import requests
+
+from tools.toolbox.db import DATA_DIR, Db
+
+REPLICA_FILE = DATA_DIR / "replica.db"
+REPLICATED_MODELS = ("workcells", "tools", "labware", "variables")
+REPLICATED_PATHS = ("settings/workcell",)
+REPLICA_SYNC_INTERVAL = 60.0  # Seconds between background syncs
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    path TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    body BLOB NOT NULL,
+    version TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_model ON responses (model);
+"""
+
+_sync_thread: Optional[threading.Thread] = None
+_stop_sync = threading.Event()
+
+
+@contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    """A connection that commits on success and is always closed."""
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(REPLICA_FILE, timeout=5)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _version(item: Any, body: bytes) -> str:
+    if isinstance(item, dict) and item.get("updated_at"):
+        return str(item["updated_at"])
+    return hashlib.sha1(body).hexdigest()
+
+
+def _store(conn: sqlite3.Connection, model: str, rows: dict[str, tuple[bytes, str]], now: float) -> int:
+    """Upsert changed rows of a model, drop rows that are gone. Returns rows written."""
+    existing = dict(conn.execute("SELECT path, version FROM responses WHERE model = ?", (model,)).fetchall())
+    changed = [
+        (path, model, body, version, now)
+        for path, (body, version) in rows.items()
+        if existing.get(path) != version
+    ]
+    conn.executemany("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", changed)
+    conn.executemany(
+        "DELETE FROM responses WHERE path = ?", [(path,) for path in existing if path not in rows]
+    )
+    # Unchanged rows are as fresh as the ones just written
+    conn.execute("UPDATE responses SET synced_at = ? WHERE model = ?", (now, model))
+    return len(changed)
+
+
+def sync_model(conn: sqlite3.Connection, model: str) -> int:
+    response = Db.request("GET", model, use_replica=False)
+    if response.status_code == 404:
+        return 0
+    response.raise_for_status()
+    items = response.json()
+    rows: dict[str, tuple[bytes, str]] = {model: (response.content, hashlib.sha1(response.content).hexdigest())}
+    if isinstance(items, list):
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            body = json.dumps(item).encode()
+            version = _version(item, body)
+            for key in (item.get("id"), item.get("name")):
+                if key is not None and key != "":
+                    rows[f"{model}/{key}"] = (body, version)
+    return _store(conn, model, rows, time.time())
+
+
+def sync_path(conn: sqlite3.Connection, path: str) -> int:
+    response = Db.request("GET", path, use_replica=False)
+    if response.status_code == 404:
+        return 0
+    response.raise_for_status()
+    return _store(conn, path, {path: (response.content, hashlib.sha1(response.content).hexdigest())}, time.time())
+
+
+def sync() -> bool:
+    """Bring the replica up to date. Returns False if the API couldn't be reached."""
+    written = 0
+    try:
+        with _connect() as conn:
+            for model in REPLICATED_MODELS:
+                written += sync_model(conn, model)
+            for path in REPLICATED_PATHS:
+                written += sync_path(conn, path)
+    except (requests.exceptions.RequestException, ValueError, sqlite3.Error) as e:
+        logging.debug(f"Replica sync failed: {e}")
+        return False
+    if written:
+        logging.debug(f"Replica sync updated {written} rows")
+    return True
+
+
+def start_sync(interval: float = REPLICA_SYNC_INTERVAL) -> threading.Thread:
+    """Sync now and then every `interval` seconds in a daemon thread."""
+    global _sync_thread
+    if _sync_thread is not None and _sync_thread.is_alive():
+        return _sync_thread
+    _stop_sync.clear()
+
+    def run() -> None:
+        while True:
+            sync()
+            if _stop_sync.wait(interval):
+                return
+
+    _sync_thread = threading.Thread(target=run, name="galago-replica-sync", daemon=True)
+    _sync_thread.start()
+    return _sync_thread
+
+
+def stop_sync() -> None:
+    _stop_sync.set()
+
+
+def lookup(path: str) -> Optional[tuple[bytes, float]]:
+    """The replicated body for a request path and its age in seconds, if any."""
+    if not REPLICA_FILE.exists():
+        return None
+    try:
+        with _connect() as conn:
+            row = conn.execute("SELECT body, synced_at FROM responses WHERE path = ?", (path,)).fetchone()
+    except sqlite3.Error as e:
+        logging.debug(f"Replica lookup failed: {e}")
+        return None
+    if row is None:
+        return None
+    return bytes(row[0]), time.time() - row[1]
+
+
+def get(path: str) -> Optional[Any]:
+    """Parsed replicated response for `path`, logging its staleness."""
+    found = lookup(path)
+    if found is None:
+        return None
+    body, age = found
+    logging.warning(f"Galago API unreachable, using local copy of {path} from {format_age(age)} ago")
+    return json.loads(body)
+
+
+def clear() -> None:
+    """Forget everything, e.g. when switching to another API server."""
+    if REPLICA_FILE.exists():
+        with _connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+
+def staleness() -> dict[str, float]:
+    """Seconds since each replicated model was last synced."""
+    if not REPLICA_FILE.exists():
+        return {}
+    now = time.time()
+    with _connect() as conn:
+        rows = conn.execute("SELECT model, MIN(synced_at) FROM responses GROUP BY model").fetchall()
+    return {model: now - synced_at for model, synced_at in rows}
+
+
+def format_age(seconds: float) -> str:
+    if seconds < 120:
+        return f"{int(seconds)}s"
+    if seconds < 2 * 3600:
+        return f"{int(seconds // 60)}m"
+    if seconds < 2 * 86400:
+        return f"{int(seconds // 3600)}h"
+    return f"{int(seconds // 86400)}d"
@@ -0,0 +1,184 @@
+"""
+Resource limits for python scripts run by the tool servers.
+
+Limits come from the tool's Config (script_* fields) and can be overridden per
+command. While a script runs, supervise() polls it every SUPERVISE_INTERVAL
+seconds and kills its whole process tree when it runs past its timeout, uses
+more memory than allowed, or the gRPC caller cancels the command. Niceness is
+applied when the interpreter starts, and max_output caps the output returned.
+
+Scripts are started in their own process group (session on POSIX), so the
+tree can be killed without touching the tool server. Memory is measured with
+psutil when it is installed, otherwise from /proc, and isn't enforced on
+platforms offering neither.
+"""
+
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, replace
+from typing import Any, Callable, Optional
+
+SUPERVISE_INTERVAL = 0.1
+
+Poll = Callable[[float], Optional[int]]
+
+
+class ScriptLimitExceeded(RuntimeError):
+    pass
+
+
+class ScriptCancelled(RuntimeError):
+    pass
+
+
+@dataclass
+class ScriptLimits:
+    timeout: Optional[float] = None  # Seconds
+    memory_mb: Optional[int] = None
+    nice: Optional[int] = None
+    max_output: Optional[int] = None  # Characters returned
+
+    @classmethod
+    def from_message(cls, message: Any, prefix: str = "") -> "ScriptLimits":
+        """Limits from a RunScript command, or a tool Config with prefix="script_"."""
+
+        def value(name: str) -> Any:
+            # 0 is the proto default, i.e. not set
+            return getattr(message, prefix + name, 0) or None
+
+        return cls(
+            timeout=value("timeout_seconds"),
+            memory_mb=value("memory_limit_mb"),
+            nice=value("nice"),
+            max_output=value("max_output_chars"),
+        )
+
+    def override(self, other: "ScriptLimits") -> "ScriptLimits":
+        """These limits with the ones set in `other` taking precedence."""
+        return replace(self, **other.to_dict())
+
+    def to_dict(self) -> dict[str, Any]:
+        return {name: value for name, value in asdict(self).items() if value is not None}
+
+
+def process_group_kwargs() -> dict[str, Any]:
+    """Popen arguments that start a process in a group of its own."""
+    if sys.platform == "win32":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def kill_tree(process: "subprocess.Popen[Any]") -> None:
+    """Kill a process started with process_group_kwargs and everything it started."""
+    try:
+        if sys.platform == "win32":
+            subprocess.run(
+                ["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        pass
+    try:
+        process.kill()
+        process.wait(timeout=5)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logging.warning(f"Failed to kill script process {process.pid}: {e}")
+
+
+def popen_poll(process: "subprocess.Popen[Any]") -> Poll:
+    """A poll function for supervise() waiting on a Popen process."""
+
+    def poll(timeout: float) -> Optional[int]:
+        try:
+            return process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return None
+
+    return poll
+
+
+def set_nice(pid: int, nice: int) -> None:
+    try:
+        if sys.platform == "win32":
+            import psutil  # type: ignore
+
+            priority = psutil.IDLE_PRIORITY_CLASS if nice >= 15 else psutil.BELOW_NORMAL_PRIORITY_CLASS
+            psutil.Process(pid).nice(priority if nice > 0 else psutil.NORMAL_PRIORITY_CLASS)
+        else:
+            os.setpriority(os.PRIO_PROCESS, pid, nice)
+    except Exception as e:
+        logging.warning(f"Failed to set script priority to {nice}: {e}")
+
+
+def tree_rss(pid: int) -> Optional[int]:
+    """Resident memory in bytes of a process and its children, if it can be measured."""
+    try:
+        import psutil  # type: ignore
+
+        process = psutil.Process(pid)
+        total = 0
+        for p in [process, *process.children(recursive=True)]:
+            try:
+                total += p.memory_info().rss
+            except psutil.Error:
+                continue
+        return total
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def supervise(
+    pid: int,
+    poll: Poll,
+    kill: Callable[[], None],
+    limits: ScriptLimits,
+    cancelled: Optional[Callable[[], bool]] = None,
+) -> int:
+    """
+    Wait for a script to exit while enforcing its limits.
+
+    Args:
+        pid: Process running the script
+        poll: Waits up to the given seconds, returns the exit code or None if still running
+        kill: Kills the process tree
+        limits: Limits to enforce
+        cancelled: Returns True once the caller no longer wants the result
+
+    Returns:
+        The script's exit code
+
+    Raises:
+        ScriptLimitExceeded, ScriptCancelled: after killing the script
+    """
+    deadline = time.monotonic() + limits.timeout if limits.timeout else None
+    while True:
+        returncode = poll(SUPERVISE_INTERVAL)
+        if returncode is not None:
+            return returncode
+        if cancelled is not None and cancelled():
+            kill()
+            raise ScriptCancelled("Script cancelled by the caller")
+        if deadline is not None and time.monotonic() > deadline:
+            kill()
+            raise ScriptLimitExceeded(f"Script timed out after {limits.timeout:g}s")
+        if limits.memory_mb:
+            rss = tree_rss(pid)
+            if rss is not None and rss > limits.memory_mb * 1024 * 1024:
+                kill()
+                raise ScriptLimitExceeded(
+                    f"Script used {rss // (1024 * 1024)} MB, more than its {limits.memory_mb} MB limit"
+                )
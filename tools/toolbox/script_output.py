@@ -0,0 +1,147 @@
+"""
+Streaming and capping of python script output.
+
+A script's stdout and stderr are written to a file by whichever interpreter
+runs it. ScriptOutput follows that file while the script runs and passes each
+line to the tool log and an optional callback as soon as it is written.
+
+Only the first MAX_OUTPUT_HEAD and last MAX_OUTPUT_TAIL characters are kept in
+memory and returned, joined by a marker saying how much was left out. The full
+output of a truncated run can be kept in SCRIPT_OUTPUT_DIR, which the web
+server serves under /script-outputs/.
+"""
+
+import collections
+import logging
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+import appdirs  # type: ignore
+
+APP_NAME = "galago"
+APP_AUTHOR = "sciencecorp"
+DATA_DIR = Path(appdirs.user_data_dir(APP_NAME, APP_AUTHOR))
+SCRIPT_OUTPUT_DIR = DATA_DIR / "script_outputs"
+MAX_OUTPUT_HEAD = 32 * 1024
+MAX_OUTPUT_TAIL = 32 * 1024
+MAX_SCRIPT_OUTPUTS = 50  # Full outputs kept in SCRIPT_OUTPUT_DIR
+POLL_INTERVAL = 0.05
+
+LineCallback = Callable[[str], None]
+
+
+class ScriptOutput:
+    def __init__(
+        self,
+        path: str,
+        on_line: Optional[LineCallback] = None,
+        head: Optional[int] = None,
+        tail: Optional[int] = None,
+    ) -> None:
+        self.path = path
+        self.on_line = on_line
+        self.head_limit = MAX_OUTPUT_HEAD if head is None else head
+        self.tail_limit = MAX_OUTPUT_TAIL if tail is None else tail
+        self._head: list[str] = []
+        self._head_size = 0
+        self._tail: "collections.deque[str]" = collections.deque()
+        self._tail_size = 0
+        self.omitted = 0
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def truncated(self) -> bool:
+        return self.omitted > 0
+
+    def start(self) -> "ScriptOutput":
+        self._thread = threading.Thread(target=self._follow, name="galago-script-output", daemon=True)
+        self._thread.start()
+        return self
+
+    def finish(self) -> str:
+        """Read whatever is left once the script has exited and return the capped output."""
+        self._done.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.text()
+
+    def _follow(self) -> None:
+        # The file may not exist yet if the script hasn't started
+        while not Path(self.path).exists():
+            if self._done.is_set():
+                if not Path(self.path).exists():
+                    return
+                break
+            self._done.wait(POLL_INTERVAL)
+        try:
+            with open(self.path, "rb") as f:
+                partial = b""
+                while True:
+                    done = self._done.is_set()
+                    line = f.readline()
+                    if line:
+                        partial += line
+                        if partial.endswith(b"\n"):
+                            self.add_line(partial.decode("utf-8", errors="replace"))
+                            partial = b""
+                        continue
+                    if done:
+                        break
+                    self._done.wait(POLL_INTERVAL)
+                if partial:
+                    self.add_line(partial.decode("utf-8", errors="replace"))
+        except OSError as e:
+            logging.warning(f"Failed to read script output: {e}")
+
+    def add_line(self, line: str) -> None:
+        text = line.rstrip("\r\n")
+        logging.info(f"Script: {text}")
+        if self.on_line is not None:
+            try:
+                self.on_line(text)
+            except Exception as e:
+                logging.warning(f"Script output callback failed: {e}")
+        if self._head_size < self.head_limit and not self._tail:
+            kept = line[: self.head_limit - self._head_size]
+            self._head.append(kept)
+            self._head_size += len(kept)
+            line = line[len(kept):]
+            if not line:
+                return
+        self._tail.append(line)
+        self._tail_size += len(line)
+        while self._tail_size > self.tail_limit:
+            dropped = self._tail.popleft()
+            excess = self._tail_size - self.tail_limit
+            if len(dropped) > excess:
+                # Keep the end of a line longer than what's left of the tail
+                self._tail.appendleft(dropped[excess:])
+                dropped = dropped[:excess]
+            self._tail_size -= len(dropped)
+            self.omitted += len(dropped)
+
+    def text(self, saved_to: Optional[Path] = None) -> str:
+        head, tail = "".join(self._head), "".join(self._tail)
+        if not self.truncated:
+            return head + tail
+        marker = f"\n... {self.omitted} characters omitted"
+        if saved_to is not None:
+            marker += f", full output in /script-outputs/{saved_to.name}"
+        return f"{head}{marker} ...\n{tail}"
+
+    def save(self) -> Optional[Path]:
+        """Keep the full output file in SCRIPT_OUTPUT_DIR, pruning the oldest ones."""
+        try:
+            SCRIPT_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+            target = SCRIPT_OUTPUT_DIR / f"script_{time.strftime('%Y%m%d_%H%M%S')}_{id(self):x}.txt"
+            shutil.copyfile(self.path, target)
+            for old in sorted(SCRIPT_OUTPUT_DIR.glob("script_*.txt"))[:-MAX_SCRIPT_OUTPUTS]:
+                old.unlink(missing_ok=True)
+            return target
+        except OSError as e:
+            logging.warning(f"Failed to keep script output: {e}")
+            return None
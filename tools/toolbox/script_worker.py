@@ -0,0 +1,248 @@
+"""
+Worker interpreter for tools.toolbox.script_workers.
+
+Started as `python script_worker.py [module ...]` with any interpreter, so it
+only uses the standard library. It imports the given modules once, then reads
+one JSON request per line from stdin and answers on the original stdout:
+
+    {"op": "run", "script": path, "output": path, "bytecode": bool}
+        -> {"returncode": int, "rss": bytes, "clean": bool, "leftovers": [str]}
+    {"op": "ping"} -> {"ok": true, "rss": bytes}
+
+Compiled scripts are kept in memory until the file's modification time or size
+changes. With "bytecode" the compiled script is also stored next to it as
+<name>.<cache tag>.pyc, so a new worker doesn't compile it again; that is only
+asked for scripts that never change under the same name.
+
+Each script runs as __main__ in a fresh namespace with stdout and stderr
+(including output of C extensions) redirected to the output file and stdin
+closed. sys.argv, sys.path, os.environ and the working directory are restored
+afterwards, and modules imported from the script's own directory (or paths it
+added) are dropped so the next script imports them fresh. Installed packages a
+script imports stay loaded, which makes later scripts faster.
+
+Some state can't be undone: threads left running, files, serial ports, USB
+devices or sockets left open (e.g. a PLR backend or pyhamilton connection
+that wasn't stopped) and changes to builtins. A run that leaves any of them
+behind reports the worker unclean, listing them in "leftovers", and the worker
+is retired. Where open descriptors can't be listed the worker is always
+reported unclean. Module-level globals of installed packages are not checked:
+a script that changes them affects the scripts after it in the same worker.
+"""
+
+from __future__ import annotations
+
+import sys
+
+# Running this file puts its directory first on sys.path, where modules like
+# toolbox/logging.py would shadow the standard library
+del sys.path[0]
+
+import builtins  # noqa: E402
+import importlib.util  # noqa: E402
+import json  # noqa: E402
+import marshal  # noqa: E402
+import os  # noqa: E402
+import threading  # noqa: E402
+import traceback  # noqa: E402
+from collections import OrderedDict  # noqa: E402
+from types import CodeType  # noqa: E402
+from typing import Any, Optional  # noqa: E402
+
+MAX_CACHED_CODE = 128
+
+# path -> ((mtime, size), code), least recently used first
+_code_cache: OrderedDict[str, tuple[tuple[int, int], CodeType]] = OrderedDict()
+
+
+def rss() -> Optional[int]:
+    """Resident memory of this process in bytes, if it can be measured."""
+    try:
+        import psutil  # type: ignore
+
+        return int(psutil.Process().memory_info().rss)
+    except Exception:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        pass
+    try:
+        import resource
+
+        # Peak rather than current usage, good enough for a recycling threshold
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return int(peak if sys.platform == "darwin" else peak * 1024)
+    except Exception:
+        return None
+
+
+def open_handles() -> Optional[set[int]]:
+    """
+    File descriptors open in this process, or on Windows a count of its
+    handles as a one-item set. None if neither can be measured.
+    """
+    for fd_dir in ("/proc/self/fd", "/dev/fd"):
+        try:
+            return {int(fd) for fd in os.listdir(fd_dir)}
+        except (OSError, ValueError):
+            continue
+    try:
+        import psutil  # type: ignore
+
+        return {int(psutil.Process().num_handles())}
+    except Exception:
+        return None
+
+
+def _handles_leaked(before: Optional[set[int]], after: Optional[set[int]]) -> bool:
+    if before is None or after is None:
+        return True
+    if sys.platform == "win32":
+        return max(after) > max(before)
+    # The descriptor used to list the others moves up when one is left open
+    return bool(after - before)
+
+
+def _bytecode_path(script: str) -> str:
+    return f"{os.path.splitext(script)[0]}.{sys.implementation.cache_tag}.pyc"
+
+
+def _read_bytecode(path: str) -> Optional[CodeType]:
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if not data.startswith(importlib.util.MAGIC_NUMBER):
+        return None
+    try:
+        code = marshal.loads(data[len(importlib.util.MAGIC_NUMBER):])
+    except (EOFError, ValueError, TypeError):
+        return None
+    return code if isinstance(code, CodeType) else None
+
+
+def _write_bytecode(path: str, code: CodeType) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(importlib.util.MAGIC_NUMBER + marshal.dumps(code))
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def load_code(script: str, bytecode: bool) -> CodeType:
+    stat = os.stat(script)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _code_cache.get(script)
+    if cached is not None and cached[0] == key:
+        _code_cache.move_to_end(script)
+        return cached[1]
+    code = _read_bytecode(_bytecode_path(script)) if bytecode else None
+    if code is None:
+        with open(script, "r", encoding="utf-8") as f:
+            code = compile(f.read(), script, "exec")
+        if bytecode:
+            _write_bytecode(_bytecode_path(script), code)
+    _code_cache[script] = (key, code)
+    if len(_code_cache) > MAX_CACHED_CODE:
+        _code_cache.popitem(last=False)
+    return code
+
+
+def exit_code(exc: SystemExit) -> int:
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    print(exc.code, file=sys.stderr)
+    return 1
+
+
+def run(script: str, output: str, bytecode: bool = False) -> dict[str, Any]:
+    argv, path, environ, cwd = list(sys.argv), list(sys.path), dict(os.environ), os.getcwd()
+    modules = set(sys.modules)
+    threads = threading.active_count()
+    builtins_before = dict(vars(builtins))
+    handles = open_handles()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = [os.dup(fd) for fd in (0, 1, 2)]
+    returncode = 0
+    with open(output, "w", encoding="utf-8") as out, open(os.devnull, "r") as devnull:
+        os.dup2(devnull.fileno(), 0)
+        os.dup2(out.fileno(), 1)
+        os.dup2(out.fileno(), 2)
+        try:
+            code = load_code(script, bytecode)
+            sys.argv = [script]
+            sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+            namespace = {"__name__": "__main__", "__file__": script, "__builtins__": builtins}
+            exec(code, namespace)
+        except SystemExit as e:
+            returncode = exit_code(e)
+        except BaseException as e:
+            # Leave this file's frames out, as a plain interpreter would
+            tb = e.__traceback__
+            while tb is not None and tb.tb_frame.f_code.co_filename == __file__:
+                tb = tb.tb_next
+            traceback.print_exception(type(e), e, tb)
+            returncode = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            for fd, saved_fd in zip((0, 1, 2), saved):
+                os.dup2(saved_fd, fd)
+                os.close(saved_fd)
+    added_paths = tuple(os.path.abspath(p) for p in sys.path if p and p not in path)
+    sys.argv, sys.path[:] = argv, path
+    os.environ.clear()
+    os.environ.update(environ)
+    os.chdir(cwd)
+    for name in set(sys.modules) - modules:
+        file = getattr(sys.modules[name], "__file__", None)
+        if file and os.path.abspath(file).startswith(added_paths):
+            del sys.modules[name]
+
+    leftovers = []
+    if threading.active_count() > threads:
+        leftovers.append("threads")
+    if _handles_leaked(handles, open_handles()):
+        leftovers.append("open files")
+    builtins_after = vars(builtins)
+    if builtins_after.keys() != builtins_before.keys() or any(
+        builtins_after[name] is not value for name, value in builtins_before.items()
+    ):
+        leftovers.append("builtins")
+    return {"returncode": returncode, "rss": rss(), "clean": not leftovers, "leftovers": leftovers}
+
+
+def main() -> None:
+    replies = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    requests = os.fdopen(os.dup(0), "r", encoding="utf-8")
+    # Anything printed outside a run must not end up in the replies
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+    for module in sys.argv[1:]:
+        try:
+            __import__(module)
+        except Exception as e:
+            print(f"Failed to preload {module}: {e}", file=sys.stderr)
+    replies.write(json.dumps({"ok": True, "rss": rss()}) + "\n")
+    replies.flush()
+    for line in requests:
+        request = json.loads(line)
+        if request.get("op") == "run":
+            reply = run(request["script"], request["output"], bool(request.get("bytecode")))
+        else:
+            reply = {"ok": True, "rss": rss()}
+        replies.write(json.dumps(reply) + "\n")
+        replies.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Warm Python interpreters for run_python_script.
+
+Starting an interpreter and importing pylabrobot or pyhamilton takes seconds,
+so blocking scripts are handed to a pool of already running workers instead
+(see script_worker.py), one pool per python executable. A worker preloads the
+modules its pool was configured with and runs each script in a fresh
+namespace, so a short script finishes in milliseconds.
+
+A worker that has been idle for HEALTH_CHECK_AFTER seconds is pinged before
+it is used again. Workers are retired after SCRIPT_WORKER_MAX_RUNS scripts,
+once they use more than SCRIPT_WORKER_MAX_RSS bytes, or when a script leaves
+threads, open files/devices/sockets or changed builtins behind, and a
+replacement is started in the background. Module-level globals of installed
+packages are shared by the scripts a worker runs, see script_worker.py.
+
+Set GALAGO_SCRIPT_WORKERS=0 to always start a new interpreter, and
+GALAGO_SCRIPT_PRELOAD to a comma separated list of modules to preload in
+pools that weren't configured explicitly.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import subprocess
+import threading
+import time
+from typing import Any, Callable, Optional, Sequence
+
+from tools.toolbox.script_limits import ScriptLimits, kill_tree, process_group_kwargs, set_nice, supervise
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "script_worker.py")
+SCRIPT_WORKER_MAX_RUNS = 50
+SCRIPT_WORKER_MAX_RSS = 1024 * 1024 * 1024
+SCRIPT_WORKER_MAX_IDLE = 2  # Idle workers kept per python executable
+HEALTH_CHECK_AFTER = 30.0  # Idle seconds before a worker is pinged before use
+START_TIMEOUT = 120.0
+PING_TIMEOUT = 5.0
+
+
+class WorkerStartError(RuntimeError):
+    """No worker could be started, the script has not been run."""
+
+
+class ScriptWorker:
+    def __init__(self, python_exe: str, preload: Sequence[str] = (), nice: Optional[int] = None) -> None:
+        self.python_exe = python_exe
+        # Priority can't be raised again without privileges, so it is fixed per worker
+        self.nice = nice
+        self.runs = 0
+        self.rss: Optional[int] = None
+        self.clean = True
+        # What the last script left behind, if it wasn't clean
+        self.leftovers: list[str] = []
+        self.last_used = time.monotonic()
+        self._replies: "queue.Queue[Optional[dict[str, Any]]]" = queue.Queue()
+        try:
+            self.process = subprocess.Popen(
+                [python_exe, "-u", WORKER_SCRIPT, *preload],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                encoding="utf-8",
+                **process_group_kwargs(),
+            )
+        except OSError as e:
+            raise WorkerStartError(f"Failed to start {python_exe}: {e}")
+        if nice is not None:
+            set_nice(self.process.pid, nice)
+        threading.Thread(target=self._read_replies, name="galago-script-worker", daemon=True).start()
+
+    def _read_replies(self) -> None:
+        assert self.process.stdout is not None
+        try:
+            for line in self.process.stdout:
+                try:
+                    self._replies.put(json.loads(line))
+                except ValueError:
+                    continue
+        finally:
+            self._replies.put(None)
+
+    def _reply(self, timeout: Optional[float]) -> Optional[dict[str, Any]]:
+        """The next reply, or None if the worker exited or didn't answer in time."""
+        try:
+            reply = self._replies.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if reply is not None and reply.get("rss") is not None:
+            self.rss = reply["rss"]
+        return reply
+
+    def _send(self, request: dict[str, Any]) -> bool:
+        assert self.process.stdin is not None
+        try:
+            self.process.stdin.write(json.dumps(request) + "\n")
+            self.process.stdin.flush()
+            return True
+        except OSError:
+            return False
+
+    def wait_ready(self, timeout: float = START_TIMEOUT) -> None:
+        if self._reply(timeout) is None:
+            self.stop()
+            raise WorkerStartError(f"{self.python_exe} worker did not start")
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def ping(self, timeout: float = PING_TIMEOUT) -> bool:
+        return self.alive() and self._send({"op": "ping"}) and self._reply(timeout) is not None
+
+    def run(
+        self,
+        script: str,
+        output: str,
+        cache_bytecode: bool = False,
+        limits: Optional[ScriptLimits] = None,
+        cancelled: Optional[Callable[[], bool]] = None,
+    ) -> int:
+        """Run a script file, writing its output to `output`. Returns its exit code."""
+        self.runs += 1
+        self.last_used = time.monotonic()
+        request = {"op": "run", "script": script, "output": output, "bytecode": cache_bytecode}
+        if not self._send(request):
+            return self.process.wait()
+
+        def poll(timeout: float) -> Optional[int]:
+            try:
+                reply = self._replies.get(timeout=timeout)
+            except queue.Empty:
+                return None
+            if reply is None:
+                # The script took the worker down with it, e.g. os._exit() or a crash
+                # in an extension, which is what a plain interpreter would report too
+                return self.process.wait()
+            if reply.get("rss") is not None:
+                self.rss = reply["rss"]
+            self.clean = bool(reply.get("clean", True))
+            self.leftovers = list(reply.get("leftovers", []))
+            return int(reply["returncode"])
+
+        return supervise(self.process.pid, poll, self.kill, limits or ScriptLimits(), cancelled)
+
+    def kill(self) -> None:
+        kill_tree(self.process)
+
+    def stop(self) -> None:
+        try:
+            if self.process.stdin is not None:
+                self.process.stdin.close()
+            self.process.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+
+
+class ScriptWorkerPool:
+    def __init__(
+        self,
+        python_exe: str,
+        preload: Sequence[str] = (),
+        max_runs: int = SCRIPT_WORKER_MAX_RUNS,
+        max_rss: int = SCRIPT_WORKER_MAX_RSS,
+        max_idle: int = SCRIPT_WORKER_MAX_IDLE,
+    ) -> None:
+        self.python_exe = python_exe
+        self.preload = tuple(preload)
+        self.max_runs = max_runs
+        self.max_rss = max_rss
+        self.max_idle = max_idle
+        self._idle: list[ScriptWorker] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _start_worker(self, nice: Optional[int] = None) -> ScriptWorker:
+        worker = ScriptWorker(self.python_exe, self.preload, nice)
+        worker.wait_ready()
+        return worker
+
+    def acquire(self, nice: Optional[int] = None) -> ScriptWorker:
+        while True:
+            with self._lock:
+                worker = next((w for w in reversed(self._idle) if w.nice == nice), None)
+                if worker is not None:
+                    self._idle.remove(worker)
+            if worker is None:
+                return self._start_worker(nice)
+            if time.monotonic() - worker.last_used < HEALTH_CHECK_AFTER and worker.alive():
+                return worker
+            if worker.ping():
+                return worker
+            logging.warning(f"Replacing unresponsive {self.python_exe} script worker")
+            worker.stop()
+
+    def release(self, worker: ScriptWorker) -> None:
+        if self._retire(worker):
+            worker.stop()
+            self.prestart()
+            return
+        with self._lock:
+            if not self._closed and len(self._idle) < self.max_idle:
+                self._idle.append(worker)
+                return
+        worker.stop()
+
+    def _retire(self, worker: ScriptWorker) -> bool:
+        if not worker.alive():
+            return True
+        if not worker.clean:
+            logging.info(f"Retiring script worker, a script left {', '.join(worker.leftovers) or 'threads'} behind")
+            return True
+        if worker.rss is not None and worker.rss > self.max_rss:
+            logging.info(f"Retiring script worker using {worker.rss // (1024 * 1024)} MB")
+            return True
+        return worker.runs >= self.max_runs
+
+    def run(
+        self,
+        script: str,
+        output: str,
+        cache_bytecode: bool = False,
+        limits: Optional[ScriptLimits] = None,
+        cancelled: Optional[Callable[[], bool]] = None,
+    ) -> int:
+        """
+        Run a script file in a worker. With cache_bytecode the compiled script
+        is also kept next to it on disk, for scripts whose content never
+        changes under the same path. A worker killed for breaking `limits` is
+        replaced; its memory includes the preloaded modules.
+        """
+        worker = self.acquire(limits.nice if limits else None)
+        try:
+            return worker.run(script, output, cache_bytecode, limits, cancelled)
+        finally:
+            self.release(worker)
+
+    def prestart(self) -> None:
+        """Start a worker in the background so the next script doesn't wait for it."""
+        if self._closed:
+            return
+
+        def start() -> None:
+            try:
+                self.release(self._start_worker())
+            except WorkerStartError as e:
+                logging.warning(f"Failed to prestart script worker: {e}")
+
+        threading.Thread(target=start, name="galago-script-worker-start", daemon=True).start()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._closed = True
+            workers, self._idle = self._idle, []
+        for worker in workers:
+            worker.stop()
+
+
+_pools: dict[str, ScriptWorkerPool] = {}
+_pools_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return os.environ.get("GALAGO_SCRIPT_WORKERS", "1") != "0"
+
+
+def _default_preload() -> tuple[str, ...]:
+    return tuple(m.strip() for m in os.environ.get("GALAGO_SCRIPT_PRELOAD", "").split(",") if m.strip())
+
+
+def get_pool(python_exe: Optional[str] = None) -> ScriptWorkerPool:
+    python_exe = python_exe or "python"
+    with _pools_lock:
+        pool = _pools.get(python_exe)
+        if pool is None:
+            pool = _pools[python_exe] = ScriptWorkerPool(python_exe, _default_preload())
+        return pool
+
+
+def configure(python_exe: Optional[str] = None, preload: Sequence[str] = (), prestart: bool = True) -> ScriptWorkerPool:
+    """Set the modules preloaded for a python executable and warm up a worker."""
+    python_exe = python_exe or "python"
+    with _pools_lock:
+        previous = _pools.get(python_exe)
+        if previous is not None and previous.preload == tuple(preload):
+            return previous
+        pool = _pools[python_exe] = ScriptWorkerPool(python_exe, preload)
+    if previous is not None:
+        previous.shutdown()
+    if prestart and enabled():
+        pool.prestart()
+    return pool
+
+
+def shutdown() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown()
+
+
+atexit.register(shutdown)
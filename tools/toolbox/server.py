@@ -1,4 +1,5 @@
 import logging
+import typing as t
 from tools.base_server import ToolServer, serve
 from tools.grpc_interfaces.toolbox_pb2 import Command, Config
 from tools.app_config import Config as GlobalConfig
@@ -8,6 +9,7 @@ from google.protobuf.struct_pb2 import Struct
 from tools.grpc_interfaces.tool_base_pb2 import  SUCCESS, ERROR_FROM_TOOL
 from tools.grpc_interfaces import tool_base_pb2
 from tools.toolbox.python_subprocess import run_python_script
+from tools.toolbox.script_limits import ScriptLimits
 
 class ToolBoxServer(ToolServer):
      toolType = "toolbox"
@@ -78,13 +80,20 @@ class ToolBoxServer(ToolServer):
           #      response.response = ERROR_FROM_TOOL
           # return response
      
+     def _script_limits(self, params: t.Any) -> ScriptLimits:
+          """Script limits from the tool config, overridden by the ones set on the command."""
+          config = getattr(self, "config", None)
+          return ScriptLimits.from_message(config, prefix="script_").override(ScriptLimits.from_message(params))
+
      def RunScript(self, params:Command.RunScript) -> ExecuteCommandReply:
           s  = Struct()
           response = ExecuteCommandReply()
           response.return_reply = True
           response.response = SUCCESS
+          limits = self._script_limits(params)
+          s.update({'limits': limits.to_dict()})
           try:
-               result = run_python_script(params.script_content,blocking=True)
+               result = run_python_script(params.script_content, blocking=True, limits=limits, cancelled=self.isCancelled)
                logging.info(f"Script result is {result}")
                if response:
                     s.update({'response':result})
@@ -95,6 +104,7 @@ class ToolBoxServer(ToolServer):
                logging.exception(exc)
                response.response = ERROR_FROM_TOOL
                response.error_message = str(exc)
+               response.meta_data.CopyFrom(s)
           return response
      
      def TextToSpeech(self, params:Command.TextToSpeech) -> None:
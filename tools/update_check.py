@@ -0,0 +1,102 @@
+"""
+Background check for newer galago-tools releases on PyPI.
+
+The result is cached in the app data directory so that most launches never
+touch the network, and offline machines only pay the request timeout once
+per UPDATE_CHECK_TTL, in a background thread.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+import appdirs  # type: ignore
+
+from tools import __version__ as galago_version
+
+APP_NAME = "galago"
+APP_AUTHOR = "sciencecorp"
+DATA_DIR = appdirs.user_data_dir(APP_NAME, APP_AUTHOR)
+CACHE_FILE = os.path.join(DATA_DIR, "update_check.json")
+
+PYPI_URL = "https://pypi.org/pypi/galago-tools/json"
+UPDATE_CHECK_TTL = 24 * 60 * 60  # Seconds between PyPI requests
+
+UpdateStatus = Tuple[bool, str, str]
+
+
+def _compare(latest_version: str) -> UpdateStatus:
+    from packaging import version
+
+    try:
+        newer = version.parse(latest_version) > version.parse(galago_version)
+    except version.InvalidVersion:
+        newer = False
+    return newer, galago_version, latest_version
+
+
+def get_cached_update_status(ttl: Optional[float] = UPDATE_CHECK_TTL) -> Optional[UpdateStatus]:
+    """
+    Return the last known update status without any network access.
+
+    Returns:
+        (update_available, current_version, latest_version), or None if there is
+        no cached result or it is older than `ttl` seconds (pass None to ignore age)
+    """
+    try:
+        with open(CACHE_FILE, "r") as f:
+            cached = json.load(f)
+        if ttl is not None and time.time() - float(cached["checked_at"]) > ttl:
+            return None
+        return _compare(str(cached["latest_version"]))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def check_for_updates(force: bool = False) -> UpdateStatus:
+    """
+    Check if there's a newer version of galago-tools on PyPI, using the cached
+    result when it is fresh enough.
+
+    Returns:
+        Tuple[bool, str, str]: (update_available, current_version, latest_version)
+    """
+    if not force:
+        cached = get_cached_update_status()
+        if cached is not None:
+            return cached
+    try:
+        import requests
+
+        response = requests.get(PYPI_URL, timeout=3)
+        if response.status_code == 200:
+            latest_version = response.json()["info"]["version"]
+            try:
+                os.makedirs(DATA_DIR, exist_ok=True)
+                with open(CACHE_FILE, "w") as f:
+                    json.dump({"checked_at": time.time(), "latest_version": latest_version}, f)
+            except OSError as e:
+                logging.debug(f"Failed to cache update check: {e}")
+            return _compare(latest_version)
+    except Exception as e:
+        logging.warning(f"Failed to check for updates: {str(e)}")
+
+    # Fall back to a stale cached value, then to the running version
+    return get_cached_update_status(ttl=None) or (False, galago_version, galago_version)
+
+
+def start_update_check(on_result: Callable[[bool, str, str], None]) -> threading.Thread:
+    """Run check_for_updates in a daemon thread and pass its result to on_result."""
+
+    def run() -> None:
+        update_available, current_version, latest_version = check_for_updates()
+        if update_available:
+            logging.info(f"Update available: {current_version} -> {latest_version}")
+        on_result(update_available, current_version, latest_version)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
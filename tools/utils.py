@@ -5,6 +5,7 @@ from enum import Enum
 from typing import Optional, Any
 import sys 
 import socket 
+from functools import lru_cache
 
 class LogType(Enum):
     ERROR = "ERROR",
@@ -16,6 +17,7 @@ class LogType(Enum):
     RUN_END = "RUN_END",
     PLATE_READ = "PLATE_READ",
 
+@lru_cache(maxsize=1)
 def get_local_ip() -> Any:
     try:
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -71,11 +73,22 @@ def write_trace_log(log_path:Optional[str], log_type:LogType, tool:str,value:str
         logging.debug(e)
         return
 
-def list_available_tools() -> list:
+def list_available_tools(live: bool = False) -> list:
+    """
+    List the tool servers shipped with galago-tools. Reads the static tool
+    manifest unless it is missing or `live` is set, in which case every
+    tools.<tool>.server module is imported and inspected.
+    """
     import os
     import importlib
     import inspect
     from pkgutil import iter_modules
+
+    if not live:
+        from tools.tool_manifest import load_manifest
+        manifest = load_manifest()
+        if manifest is not None:
+            return sorted(manifest["tools"].keys())
     
     tool_list = []
     tool_path = os.path.join(os.path.dirname(__file__))
@@ -104,25 +117,36 @@ def list_available_tools() -> list:
             if has_toolserver_subclass:
                 tool_list.append(module_name)
                 
-        except ImportError:
+        except ImportError as e:
+            logging.debug(f"Skipping {module_name}, failed to import {server_module_path}: {e}")
             continue
-        except Exception:
+        except Exception as e:
+            logging.debug(f"Skipping {module_name}: {e}")
             continue 
     return tool_list
 
 
-def get_tool_server_info(tool_name: str) -> dict:
+def get_tool_server_info(tool_name: str, live: bool = False) -> dict:
     """
     Get detailed information about a specific tool server and its commands.
     
     Args:
         tool_name: The name of the tool (e.g., 'opentrons2', 'plateloc')
+        live: Import and inspect the server module instead of reading the tool manifest
     
     Returns:
         Dictionary containing tool server information including commands and their parameters
     """
     import importlib
     import inspect
+
+    if not live:
+        from tools.tool_manifest import load_manifest
+        manifest = load_manifest()
+        if manifest is not None and tool_name in manifest["tools"]:
+            info: dict = manifest["tools"][tool_name]
+            return info
+
     from google.protobuf.message import Message
     
     try:
@@ -4,6 +4,7 @@ import json
 import logging
 import logging.handlers
 import os
+import shutil
 import signal as os_signal
 import socket
 import subprocess
@@ -16,14 +17,14 @@ from pathlib import Path
 from typing import Any, Dict, List, Optional, Set, Tuple
 
 import appdirs  # type: ignore
-import requests
 import websockets
 from colorama import Fore, Style, init
-from packaging import version
 
 from tools import __version__ as galago_version
-from tools.app_config import Config
+from tools.app_config import Config, WorkcellConfig, diff_tools
+from tools.toolbox import replica
 from tools.toolbox.db import Db
+from tools.update_check import get_cached_update_status, start_update_check
 from tools.utils import get_local_ip, get_shell_command
 
 # Add the project root to Python path
@@ -39,7 +40,7 @@ APP_AUTHOR = "sciencecorp"
 DATA_DIR = appdirs.user_data_dir(APP_NAME, APP_AUTHOR)
 
 LOG_TIME = int(time.time())
-LOCAL_IP = get_local_ip()
+CONFIG_POLL_INTERVAL = 10  # Seconds between checks for workcell changes
 
 
 # Force color output if FORCE_COLOR is set (for windows c# launcher)
@@ -98,27 +99,6 @@ def setup_logging() -> Path:
     return log_folder
 
 
-def check_for_updates() -> Tuple[bool, str, str]:
-    """Check if there's a newer version of galago-tools on PyPI"""
-    try:
-        current_version = galago_version
-        response = requests.get("https://pypi.org/pypi/galago-tools/json", timeout=3)
-        if response.status_code == 200:
-            data = response.json()
-            latest_version = data["info"]["version"]
-
-            # Compare versions using packaging.version for proper semantic versioning comparison
-            if version.parse(latest_version) > version.parse(current_version):
-                return True, current_version, latest_version
-            else:
-                return False, current_version, latest_version
-    except Exception as e:
-        logging.warning(f"Failed to check for updates: {str(e)}")
-
-    # Return default values if the check fails
-    return False, galago_version, galago_version
-
-
 def display_startup_message(
     log_folder: Path,
     update_available: bool = False,
@@ -172,9 +152,10 @@ def display_startup_message(
     print(f"{Fore.YELLOW}{computer} Platform:{Style.RESET_ALL} {os.name}")
     print("")
     print(f"{Fore.MAGENTA}{folder} URLs:{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}   Tool Server IP: {LOCAL_IP}{Style.RESET_ALL}")
+    local_ip = get_local_ip()
+    print(f"{Fore.CYAN}   Tool Server IP: {local_ip}{Style.RESET_ALL}")
     print(f"{Fore.CYAN}   Web Interface Local: http://localhost:8080/{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}   Web Interface On Network: http://{LOCAL_IP}:8080/{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}   Web Interface On Network: http://{local_ip}:8080/{Style.RESET_ALL}")
     print(f"{Fore.CYAN}   Logs Directory: {log_folder}{Style.RESET_ALL}")
     print("")
     print(f"{Fore.GREEN}{checkmark} Web Server initialized successfully{Style.RESET_ALL}")
@@ -183,6 +164,15 @@ def display_startup_message(
     print("")
 
 
+def log_update_status(update_available: bool, current_version: str, latest_version: str) -> None:
+    """Report the result of a background update check"""
+    if update_available:
+        logger.warning(
+            f"A new version ({latest_version}) is available! "
+            "Upgrade using: pip install --upgrade galago-tools"
+        )
+
+
 # Global state
 connected_clients: Set[Any] = set()
 server_processes: Dict[str, subprocess.Popen] = {}
@@ -190,6 +180,7 @@ config: Optional[Config] = None
 log_folder: Optional[Path] = None
 log_positions: Dict[str, int] = {}
 last_tool_status: Dict[str, str] = {}
+reload_lock: Optional[asyncio.Lock] = None
 logger = logging.getLogger(__name__)
 
 
@@ -305,19 +296,61 @@ async def get_tool_status() -> List[Dict[str, Any]]:
     return tools_status
 
 
-async def reload_config() -> bool:
-    """Reload the configuration from disk"""
-    global config, last_tool_status
+def get_reload_lock() -> asyncio.Lock:
+    """Lock serializing config reloads, created on the running loop"""
+    global reload_lock
+    if reload_lock is None:
+        reload_lock = asyncio.Lock()
+    return reload_lock
 
-    try:
-        logger.info("Reloading configuration...")
-        config = Config()
-        config.load_workcell_config()
 
+async def load_config() -> Tuple[bool, WorkcellConfig, WorkcellConfig]:
+    """
+    Load the selected workcell. Call with the reload lock held.
+
+    Returns:
+        (changed, old workcell, new workcell)
+    """
+    global config, last_tool_status
+    old_workcell = (config.workcell_config if config else None) or WorkcellConfig()
+    new_config = Config()
+    # Talks to the galago API, keep it off the event loop
+    changed = await asyncio.to_thread(new_config.load_workcell_config)
+    config = new_config
+    if changed:
         # Reset status tracking to force update
         last_tool_status = {}
+    return changed, old_workcell, new_config.workcell_config or WorkcellConfig()
+
+
+async def apply_tool_changes(old_workcell: WorkcellConfig, new_workcell: WorkcellConfig) -> bool:
+    """Start, stop or restart only the tools that differ. Returns whether any did."""
+    added, removed, changed = diff_tools(old_workcell, new_workcell)
+    if not (added or removed or changed):
+        return False
+    logger.info(
+        f"Workcell tools changed: added={[t.name for t in added]} "
+        f"removed={[t.name for t in removed]} changed={[t.name for t in changed]}"
+    )
+    for tool in removed + changed:
+        if is_process_running(tool.name):
+            await stop_tool(tool.name)
+    for tool in changed + added:
+        await start_tool(tool.name, tool.type, tool.port)
+    await send_tool_status()
+    return True
 
-        logger.info("Configuration reloaded successfully")
+
+async def reload_config() -> bool:
+    """Reload the configuration and start, stop or restart the tools that changed"""
+    try:
+        async with get_reload_lock():
+            changed, old_workcell, new_workcell = await load_config()
+            if not changed:
+                logger.debug("Workcell configuration unchanged")
+                return True
+            logger.info("Workcell configuration reloaded")
+            await apply_tool_changes(old_workcell, new_workcell)
         return True
 
     except Exception as e:
@@ -326,34 +359,32 @@ async def reload_config() -> bool:
 
 
 async def relaunch_all_tools() -> bool:
-    """Stop all tools, reload config, then start all tools"""
+    """Reload config, then restart all tools if it changed or start the stopped ones if not"""
     try:
         logger.info("Starting tool relaunch sequence...")
+        async with get_reload_lock():
+            changed, _, _ = await load_config()
 
-        # Step 1: Stop all running tools
-        current_tools = await get_tool_status()
-        running_tools = [tool for tool in current_tools if tool["status"] == "running"]
-
-        if running_tools:
-            logger.info(f"Stopping {len(running_tools)} running tools...")
-            for tool in running_tools:
-                await stop_tool(tool["name"])
-
-            # Wait for all tools to stop
-            await asyncio.sleep(2)
+            current_tools = await get_tool_status()
+            running_tools = [tool for tool in current_tools if tool["status"] == "running"]
+            if not changed:
+                logger.info("Workcell configuration unchanged, only starting stopped tools")
+            elif running_tools:
+                logger.info(f"Stopping {len(running_tools)} running tools...")
+                for tool in running_tools:
+                    await stop_tool(tool["name"])
 
-        # Step 2: Reload configuration
-        config_success = await reload_config()
-        if not config_success:
-            raise Exception("Failed to reload configuration")
+                # Wait for all tools to stop
+                await asyncio.sleep(2)
 
-        # Step 3: Start all tools from new config
-        logger.info("Starting all tools with new configuration...")
-        new_tools = await get_tool_status()
+            logger.info("Starting tools...")
+            new_tools = await get_tool_status()
 
         start_tasks = []
         for tool in new_tools:
-            if tool["name"] != "Tool Box":  # Skip toolbox if you don't want to auto-start it
+            if tool["name"] == "Tool Box":  # Skip toolbox if you don't want to auto-start it
+                continue
+            if changed or tool["status"] != "running":
                 start_tasks.append(start_tool(tool["name"], tool["type"], tool["port"]))
 
         # Start all tools concurrently but with small delays
@@ -384,6 +415,15 @@ async def check_for_status_changes() -> None:
         last_tool_status = current_status_dict.copy()
 
 
+async def watch_workcell_config() -> None:
+    """Poll the selected workcell and start/stop/restart only the tools that changed"""
+    while True:
+        await asyncio.sleep(CONFIG_POLL_INTERVAL)
+        if config is None:
+            continue
+        await reload_config()
+
+
 async def monitor_tool_processes() -> None:
     """Monitor tool processes and broadcast status changes"""
     while True:
@@ -873,6 +913,23 @@ class CustomHTTPRequestHandler(SimpleHTTPRequestHandler):
             self.end_headers()
             return
 
+        if self.path.startswith("/script-outputs/"):
+            output_name = Path(self.path[len("/script-outputs/"):]).name
+            output_path = Path(DATA_DIR) / "script_outputs" / output_name
+
+            if output_name and output_path.is_file():
+                self.send_response(200)
+                self.send_header("Content-type", "text/plain; charset=utf-8")
+                self.send_header("Content-Disposition", f'attachment; filename="{output_name}"')
+                self.end_headers()
+                with open(output_path, "rb") as f:
+                    shutil.copyfileobj(f, self.wfile)
+                return
+
+            self.send_response(404)
+            self.end_headers()
+            return
+
         super().do_GET()
 
 
@@ -919,15 +976,19 @@ async def main() -> None:
             current_url = Db.get_api_url()
             logger.info(f"Using API URL: {current_url}")
 
-        # Check for updates
-        update_available, current_version, latest_version = check_for_updates()
-
-        # Display startup message
-        display_startup_message(log_folder, update_available, current_version, latest_version)
+        # Use the last known update status; refresh it in the background
+        cached_update = get_cached_update_status()
+        if cached_update is not None:
+            display_startup_message(log_folder, *cached_update)
+        else:
+            display_startup_message(log_folder)
+            start_update_check(log_update_status)
 
         # Initialize config
         config = Config()
-        config.load_workcell_config()
+        await asyncio.to_thread(config.load_workcell_config)
+        # Keep a local copy of the workcell data for when the API is unreachable
+        replica.start_sync()
 
         # Initialize last_tool_status
         initial_status = await get_tool_status()
@@ -944,6 +1005,7 @@ async def main() -> None:
         # Start monitoring tasks
         asyncio.create_task(monitor_log_files())
         asyncio.create_task(monitor_tool_processes())
+        asyncio.create_task(watch_workcell_config())
 
         all_tools_started = await relaunch_all_tools()
         if all_tools_started: